@@ -0,0 +1,6 @@
+# KOOPA ENGINE 1.0A
+# Importing the package does no work: levels, thumbnails and fonts are built
+# on first use and the window only opens in main().
+from .app import main
+
+__all__ = ["main"]
@@ -0,0 +1,179 @@
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+
+import pygame
+from pygame.locals import *
+
+from .constants import SIM_HZ
+from .display import Display
+from .timing import FrameTimer, FixedStep, TIMING_MODES, MAX_CATCH_UP, MAX_FRAME_SKIP
+from .state import SCENES, push
+
+# Startup profiling
+class StartupProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - t0))
+
+    def first_frame(self):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        total = time.perf_counter() - self.start
+        print("Startup profile:")
+        for name, seconds in self.phases:
+            print(f"  {name:<16} {seconds * 1000:8.2f} ms")
+        print(f"  {'first frame':<16} {total * 1000:8.2f} ms", flush=True)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="KOOPA ENGINE 1.0A - 8 Worlds Edition")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print the time spent in each init phase and the time to first frame")
+    parser.add_argument("--timing", choices=TIMING_MODES, default="tick",
+                        help="frame pacing: sleep (tick), spin (busy) or wait for vsync")
+    parser.add_argument("--sim-hz", type=int, default=SIM_HZ,
+                        help="fixed simulation rate")
+    parser.add_argument("--max-catch-up", type=int, default=MAX_CATCH_UP,
+                        help="most sim steps run in one frame before dropping lag")
+    parser.add_argument("--max-frame-skip", type=int, default=MAX_FRAME_SKIP,
+                        help="most frames in a row that may skip rendering to catch up")
+    parser.add_argument("--sim-thread", action="store_true",
+                        help="run the simulation on its own thread and draw the frames it publishes")
+    parser.add_argument("--watch", action="store_true",
+                        help="reload level_X-Y.json and overworld.json when they change on disk")
+    parser.add_argument("--catalog", default=None,
+                        help="play the levels of a level catalog (see catalog.py)")
+    parser.add_argument("--bundle", default=None,
+                        help="play the levels and overworld of an exported bundle directory")
+    from .netplay import add_arguments
+    add_arguments(parser)
+    return parser.parse_args(argv)
+
+def close_scenes():
+    for scene in SCENES:
+        scene.close()
+
+def run_threaded(display, timer, sim, watcher, profiler):
+    # The main thread's side of --sim-thread: events and drawing only
+    sim.start(pygame.key.get_pressed())
+    while sim.running:
+        timer.tick()
+        if watcher is not None:
+            with sim.lock:
+                watcher.update()
+        events = pygame.event.get()
+        for e in events:
+            if e.type == QUIT:
+                sim.stop()
+                close_scenes()
+                pygame.quit()
+                return 0
+        sim.post(events, pygame.key.get_pressed())
+
+        frame = sim.latest()
+        if frame is None:
+            continue
+        scene, stamp, render_state = frame
+        if render_state is None:
+            # A scene without a render state is drawn live, between steps
+            with sim.lock:
+                if not SCENES:
+                    break
+                SCENES[-1].draw(display.screen)
+        else:
+            scene.draw_state(display.screen, render_state, sim.alpha(stamp))
+
+        display.present()
+        profiler.first_frame()
+
+    sim.stop()
+    close_scenes()
+    pygame.quit()
+    if sim.error is not None:
+        raise sim.error
+    return 0
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    profiler = StartupProfiler(args.profile_startup)
+
+    # Only the modules we use; pygame.init() also starts audio/joystick
+    with profiler.phase("pygame init"):
+        pygame.display.init()
+        pygame.font.init()
+    with profiler.phase("display"):
+        display = Display(vsync=args.timing == "vsync")
+        timer = FrameTimer(args.timing)
+        sim = FixedStep(args.sim_hz, args.max_catch_up, args.max_frame_skip)
+    if args.bundle:
+        with profiler.phase("bundle"):
+            from .bundle import install
+            install(args.bundle)
+    if args.catalog:
+        from .catalog import LevelCatalog, use_catalog
+        from .levels import LEVELS
+        catalog = LevelCatalog(args.catalog)
+        LEVELS.attach(catalog)
+        use_catalog(catalog)
+    with profiler.phase("scenes"):
+        if args.versus:
+            from .netplay import create_scene
+            push(create_scene(args))
+        else:
+            from .scenes import TitleScreen
+
+            # Start with title screen
+            push(TitleScreen())
+
+    watcher = None
+    if args.watch:
+        from .hotreload import FileWatcher
+        watcher = FileWatcher()
+    if args.sim_thread:
+        from .simthread import SimThread
+        return run_threaded(display, timer, SimThread(args.sim_hz), watcher, profiler)
+
+    while SCENES:
+        sim.add_time(timer.tick())
+        if watcher is not None:
+            watcher.update()
+        events = pygame.event.get()
+        keys = pygame.key.get_pressed()
+
+        # Handle quit events
+        for e in events:
+            if e.type == QUIT:
+                close_scenes()
+                pygame.quit()
+                return 0
+
+        # Update current scene in fixed steps
+        SCENES[-1].handle(events, keys)
+        for _ in range(sim.steps()):
+            if not SCENES:
+                break
+            SCENES[-1].update(sim.dt)
+        if not SCENES or not sim.should_render():
+            continue
+
+        scene = SCENES[-1]
+        scene.alpha = sim.alpha
+        scene.draw(display.screen)
+
+        display.present()
+        profiler.first_frame()
+
+    pygame.quit()
+    return 0
@@ -0,0 +1,11 @@
+import functools
+
+import pygame
+
+# Fonts are created the first time a size is asked for and then reused,
+# instead of calling SysFont on every draw.
+@functools.lru_cache(maxsize=None)
+def get_font(size):
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.SysFont(None, size)
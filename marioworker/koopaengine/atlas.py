@@ -0,0 +1,186 @@
+import pygame
+
+from .constants import TILE, NES_PALETTE, WORLD_THEMES
+
+# Indexed-colour tile and sprite atlases
+# Everything here is baked once into 8-bit surfaces. Tiles store colour
+# *slots* rather than colours, so one atlas serves all 8 worlds and a theme
+# is applied by swapping the surface palette instead of re-rendering.
+# Animated tiles get one atlas cell per frame (see ANIMATED_TILES).
+KEY_INDEX = 0
+KEY_COLOR = (255, 0, 255)
+
+TILE_SLOTS = [
+    None,  # KEY_INDEX, transparent
+    ("ground", 0), ("ground", -1), ("ground", -2),
+    ("block", 0), ("block", -1),
+    ("pipe", 0), ("pipe", -1),
+    39, 31, 33,  # fixed NES colours
+    ("water", 0), ("lava", 0), 28, 35,
+]
+SLOT = {slot: i for i, slot in enumerate(TILE_SLOTS) if slot is not None}
+DEFAULT_COLOURS = {"water": 29, "lava": 20}  # for worlds without their own
+
+def theme_colour(theme, key):
+    # NES palette index of a theme colour
+    index = theme.get(key)
+    return DEFAULT_COLOURS[key] if index is None else index
+
+def theme_palette(theme):
+    palette = [(0, 0, 0)] * 256
+    palette[KEY_INDEX] = KEY_COLOR
+    for i, slot in enumerate(TILE_SLOTS):
+        if isinstance(slot, tuple):
+            key, offset = slot
+            palette[i] = NES_PALETTE[theme_colour(theme, key) + offset]
+        elif slot is not None:
+            palette[i] = NES_PALETTE[slot]
+    return palette
+
+# char -> frame sequence, advancing every FRAME_TIME seconds. Chunks leave
+# these cells empty and tilemap.py draws the current frame over them.
+ANIMATED_TILES = {
+    "?": (0, 0, 0, 1, 2, 1),  # shimmer
+    "~": (0, 1, 2, 3),        # water
+    "L": (0, 1, 2, 1),        # lava
+}
+FRAME_TIME = 0.15
+
+def paint_tile(surf, char, x, y, frame=0):
+    ground, ground_dark, ground_shade = SLOT["ground", 0], SLOT["ground", -1], SLOT["ground", -2]
+    block, block_dark = SLOT["block", 0], SLOT["block", -1]
+    pipe, pipe_dark = SLOT["pipe", 0], SLOT["pipe", -1]
+
+    if char == "G":  # Green ground top
+        pygame.draw.rect(surf, ground, (x, y, TILE, TILE))
+        pygame.draw.rect(surf, ground_dark, (x, y+8, TILE, TILE-8))
+        pygame.draw.rect(surf, ground_shade, (x+4, y+4, TILE-8, 4))
+    elif char == "B":  # Brown block
+        pygame.draw.rect(surf, block, (x, y, TILE, TILE))
+        pygame.draw.rect(surf, block_dark, (x+2, y+2, TILE-4, TILE-4))
+    elif char == "P":  # Platform
+        pygame.draw.rect(surf, ground, (x, y, TILE, TILE))
+    elif char == "T":  # Pipe
+        pygame.draw.rect(surf, pipe, (x, y, TILE, TILE))
+        pygame.draw.rect(surf, pipe_dark, (x+2, y+2, TILE-4, TILE-4))
+    elif char == "?":  # Question block
+        mark = (SLOT[39], SLOT[28], block_dark)[frame]
+        pygame.draw.rect(surf, block, (x, y, TILE, TILE))
+        pygame.draw.rect(surf, mark, (x+4, y+4, 8, 4))
+        pygame.draw.rect(surf, mark, (x+4, y+8, 2, 2))
+        pygame.draw.rect(surf, mark, (x+10, y+8, 2, 2))
+    elif char == "U":  # Used ? block
+        pygame.draw.rect(surf, block_dark, (x, y, TILE, TILE))
+        pygame.draw.rect(surf, block, (x, y, TILE, TILE), 1)
+    elif char == "~":  # Water; the crests move along a cell a frame
+        pygame.draw.rect(surf, SLOT["water", 0], (x, y, TILE, TILE))
+        for crest in (frame * 4, frame * 4 + 8):
+            pygame.draw.rect(surf, SLOT[28], (x + crest % TILE, y+1, 4, 2))
+    elif char == "L":  # Lava; bubbles rise and pop
+        pygame.draw.rect(surf, SLOT["lava", 0], (x, y, TILE, TILE))
+        pygame.draw.rect(surf, SLOT[35], (x+2, y+10 - frame*4, 4, 3))
+        pygame.draw.rect(surf, SLOT[35], (x+9, y+2 + frame*4, 3, 3))
+    elif char == "F":  # Flag
+        pygame.draw.rect(surf, SLOT[31], (x+6, y, 4, TILE*4))
+        pygame.draw.rect(surf, SLOT[33], (x, y, 10, 6))
+    elif char == "cloud":
+        pygame.draw.ellipse(surf, SLOT[31], (x, y+5, 30, 15))
+        pygame.draw.ellipse(surf, SLOT[31], (x+15, y, 25, 15))
+
+# name -> (width, height) of its atlas cell
+ATLAS_CELLS = {
+    "G": (TILE, TILE),
+    "B": (TILE, TILE),
+    "P": (TILE, TILE),
+    "T": (TILE, TILE),
+    "?": (TILE, TILE),
+    "U": (TILE, TILE),
+    "~": (TILE, TILE),
+    "L": (TILE, TILE),
+    "F": (TILE, TILE*4),
+    "cloud": (40, 20),  # drawn 5px above its position
+}
+
+class TileAtlas:
+    def __init__(self):
+        self.surface = None
+        self.rects = {}  # name, or (char, frame) for animated tiles
+        self.theme = None
+        self.step = None
+        self.frames = {}
+
+    def bake(self):
+        extra = [(char, frame) for char, seq in ANIMATED_TILES.items() for frame in range(1, max(seq) + 1)]
+        width = sum(w for w, h in ATLAS_CELLS.values()) + TILE * len(extra)
+        height = max(h for w, h in ATLAS_CELLS.values())
+        self.surface = pygame.Surface((width, height), 0, 8)
+        self.surface.set_palette(theme_palette(WORLD_THEMES[1]))
+        self.surface.fill(KEY_INDEX)
+        self.surface.set_colorkey(KEY_INDEX)
+
+        x = 0
+        for name, (w, h) in ATLAS_CELLS.items():
+            paint_tile(self.surface, name, x, 0)
+            self.rects[name] = pygame.Rect(x, 0, w, h)
+            x += w
+        for char in ANIMATED_TILES:
+            self.rects[char, 0] = self.rects[char]
+        for char, frame in extra:
+            paint_tile(self.surface, char, x, 0, frame)
+            self.rects[char, frame] = pygame.Rect(x, 0, TILE, TILE)
+            x += TILE
+
+    def use(self, theme):
+        # Baked on first use; switching theme only swaps the palette
+        if self.surface is None:
+            self.bake()
+            self.theme = WORLD_THEMES[1]
+        if theme is not self.theme:
+            self.surface.set_palette(theme_palette(theme))
+            self.theme = theme
+        return self.surface
+
+    def frame_rects(self, now=None):
+        # char -> atlas rect of its current frame. Every map shares this
+        # clock, so all ? blocks shimmer together; only worked out again
+        # when the frame steps
+        if now is None:
+            now = pygame.time.get_ticks() / 1000
+        step = int(now / FRAME_TIME)
+        if step != self.step:
+            self.step = step
+            self.frames = {char: self.rects[char, seq[step % len(seq)]] for char, seq in ANIMATED_TILES.items()}
+        return self.frames
+
+TILE_ATLAS = TileAtlas()
+
+# Entity sprites use the NES palette directly, so paint() code can keep
+# drawing with NES_PALETTE colours and they land on the matching index.
+SPRITE_PAD = 8
+SPRITE_KEY_INDEX = 255
+
+def sprite_palette():
+    palette = list(NES_PALETTE) + [(0, 0, 0)] * (256 - len(NES_PALETTE))
+    palette[SPRITE_KEY_INDEX] = KEY_COLOR
+    return palette
+
+class SpriteCache:
+    def __init__(self):
+        self.sprites = {}
+        self.palette = None
+
+    def get(self, entity):
+        key = (type(entity).__name__,) + entity.sprite_key()
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            if self.palette is None:
+                self.palette = sprite_palette()
+            sprite = pygame.Surface((TILE + SPRITE_PAD*2, TILE*2 + SPRITE_PAD*2), 0, 8)
+            sprite.set_palette(self.palette)
+            sprite.fill(SPRITE_KEY_INDEX)
+            sprite.set_colorkey(SPRITE_KEY_INDEX)
+            entity.paint(sprite, SPRITE_PAD, SPRITE_PAD)
+            self.sprites[key] = sprite
+        return sprite, (SPRITE_PAD, SPRITE_PAD)
+
+SPRITES = SpriteCache()
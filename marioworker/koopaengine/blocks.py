@@ -0,0 +1,90 @@
+import struct
+
+# Interactive blocks
+# ? blocks and bricks react to being hit from below (TileGrid.bump). The
+# level rows are never edited: the table keeps what changed per tile, its
+# char now and the coins it has left, and each change goes straight to the
+# collision grid and, once its frame is drawn, to the one baked cell that
+# draws it (TileMap.set_tile), so a bump costs the same however big the
+# level is. Snapshots carry the table as a tail of (col, row, char, coins)
+# records, and restoring one only touches the tiles that differ from what
+# is on screen.
+BLOCK_COINS = 1
+MUSHROOM_EVERY = 5  # about one ? block in five holds a mushroom instead
+COUNT_RECORD = struct.Struct("<I")
+BLOCK_RECORD = struct.Struct("<iiBB")
+
+def holds_mushroom(col, row):
+    # Fixed by position, so every run (and every netplay peer) agrees
+    return (col * 7 + row * 3) % MUSHROOM_EVERY == 0
+
+class BlockTable:
+    def __init__(self, tilemap):
+        self.map = tilemap
+        self.changes = {}   # (col, row) -> (char, coins left)
+        self.original = {}  # (col, row) -> char in the level
+
+    def state(self, col, row):
+        change = self.changes.get((col, row))
+        if change is not None:
+            return change
+        char = self.map.tile(col, row)
+        return char, BLOCK_COINS if char == "?" and not holds_mushroom(col, row) else 0
+
+    def set(self, col, row, char, coins):
+        key = (col, row)
+        if key not in self.original:
+            self.original[key] = self.map.tile(col, row)
+        if self.map.tile(col, row) != char:
+            self.map.set_tile(col, row, char)
+        self.changes[key] = (char, coins)
+
+    def bump(self, col, row, big):
+        # Returns what came out: "coin", "mushroom", "break", "bump" or None
+        char, coins = self.state(col, row)
+        if char == "?":
+            if coins > 1:
+                self.set(col, row, "?", coins - 1)
+            else:
+                self.set(col, row, "U", 0)
+            return "coin" if coins else "mushroom"
+        elif char == "B":
+            if big:
+                self.set(col, row, " ", 0)
+                return "break"
+            return "bump"
+        return None
+
+    def size(self):
+        return COUNT_RECORD.size + BLOCK_RECORD.size * len(self.changes)
+
+    def pack_into(self, buf, offset):
+        COUNT_RECORD.pack_into(buf, offset, len(self.changes))
+        offset += COUNT_RECORD.size
+        for col, row in sorted(self.changes):  # same bytes for the same state
+            char, coins = self.changes[col, row]
+            BLOCK_RECORD.pack_into(buf, offset, col, row, ord(char), coins)
+            offset += BLOCK_RECORD.size
+
+    @staticmethod
+    def saved_size(buf, offset):
+        # Size of the tail at offset, or None if there isn't one
+        if len(buf) < offset + COUNT_RECORD.size:
+            return None
+        return COUNT_RECORD.size + BLOCK_RECORD.size * COUNT_RECORD.unpack_from(buf, offset)[0]
+
+    def restore(self, buf, offset):
+        (count,) = COUNT_RECORD.unpack_from(buf, offset)
+        offset += COUNT_RECORD.size
+        saved = {}
+        for i in range(count):
+            col, row, char, coins = BLOCK_RECORD.unpack_from(buf, offset)
+            saved[col, row] = (chr(char), coins)
+            offset += BLOCK_RECORD.size
+        for key in [key for key in self.changes if key not in saved]:
+            del self.changes[key]
+            if self.map.tile(*key) != self.original[key]:
+                self.map.set_tile(*key, self.original[key])
+        for (col, row), (char, coins) in saved.items():
+            if self.changes.get((col, row)) != (char, coins):
+                self.set(col, row, char, coins)
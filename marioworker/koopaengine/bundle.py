@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import zlib
+
+import pygame
+
+from .levels import as_level, level_json
+
+# Game bundles
+# An exported game is the engine plus a bundle directory: every level, the
+# overworld and the baked level thumbnails are stored as zlib-compressed
+# blobs named by the hash of their content, and manifest.json maps level ids
+# to blob keys. Blobs that already exist are never written again, and baked
+# assets are looked up in a build cache keyed by their source blob, so
+# re-exporting after a one-tile edit writes one level blob, one thumbnail
+# and the manifest. The runtime reads the manifest at startup and each level
+# only when it is first played.
+BUNDLE_FORMAT = 1
+MANIFEST = "manifest.json"
+BUILD_CACHE = "build-cache.json"
+ENGINE_IGNORE = ("__pycache__",)
+LAUNCHER = """import os
+import sys
+
+# Runs the engine next to this file on the bundle next to this file
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from koopaengine import main
+
+if __name__ == "__main__":
+    sys.exit(main(["--bundle", os.path.join(HERE, "bundle")] + sys.argv[1:]))
+"""
+
+def encode(obj):
+    # Canonical JSON, so equal content always hashes to the same key
+    return json.dumps(obj, separators=(",", ":"), sort_keys=True).encode()
+
+def blob_key(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def write_if_changed(path, data):
+    # Returns True if the file was (re)written
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+class BundleWriter:
+    def __init__(self, path):
+        self.path = path
+        self.blob_dir = os.path.join(path, "blobs")
+        self.written = 0
+        self.reused = 0
+        os.makedirs(self.blob_dir, exist_ok=True)
+        try:
+            with open(os.path.join(path, BUILD_CACHE)) as f:
+                self.cache = json.load(f)  # "kind:source key" -> baked blob key
+        except (OSError, ValueError):
+            self.cache = {}
+
+    def blob_path(self, key):
+        return os.path.join(self.blob_dir, key[:2], key)
+
+    def put(self, data):
+        key = blob_key(data)
+        path = self.blob_path(key)
+        if os.path.exists(path):
+            self.reused += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_if_changed(path, zlib.compress(data, 9))
+            self.written += 1
+        return key
+
+    def bake(self, kind, source, make):
+        # make() -> bytes; only called when source has no baked blob yet
+        name = f"{kind}:{source}"
+        key = self.cache.get(name)
+        if key is not None and os.path.exists(self.blob_path(key)):
+            self.reused += 1
+            return key
+        key = self.put(make())
+        self.cache[name] = key
+        return key
+
+    def write(self, levels, overworld):
+        from .thumbnails import THUMBNAILS
+
+        manifest = {"format": BUNDLE_FORMAT, "levels": {}, "thumbnails": {}}
+        for level_id, level_data in levels.items():
+            key = self.put(encode(level_json(level_data)))
+            manifest["levels"][level_id] = key
+            manifest["thumbnails"][level_id] = self.bake(
+                "thumbnail", key, lambda: png_bytes(THUMBNAILS.render(level_id, level_data)))
+        manifest["overworld"] = self.put(encode(overworld.to_json()))
+
+        write_if_changed(os.path.join(self.path, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode())
+        self.prune(manifest)
+        write_if_changed(os.path.join(self.path, BUILD_CACHE), encode(self.cache))
+        return manifest
+
+    def prune(self, manifest):
+        # Drop blobs the manifest no longer uses, and cache entries for them
+        live = set(manifest["levels"].values()) | set(manifest["thumbnails"].values()) | {manifest["overworld"]}
+        for sub in os.listdir(self.blob_dir):
+            for key in os.listdir(os.path.join(self.blob_dir, sub)):
+                if key not in live:
+                    os.remove(os.path.join(self.blob_dir, sub, key))
+        self.cache = {name: key for name, key in self.cache.items() if key in live}
+
+def png_bytes(surface):
+    out = io.BytesIO()
+    pygame.image.save(surface, out, "thumb.png")
+    return out.getvalue()
+
+def sync_tree(src, dst):
+    # Copies the files that differ; returns how many were copied
+    copied = 0
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [d for d in dirs if d not in ENGINE_IGNORE]
+        target = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            if name.endswith(".pyc"):
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                copied += write_if_changed(os.path.join(target, name), f.read())
+    return copied
+
+def export_game(levels, overworld, path="export"):
+    # Writes path/bundle, path/koopaengine and path/game.py; returns the stats
+    started = time.perf_counter()
+    writer = BundleWriter(os.path.join(path, "bundle"))
+    writer.write(levels, overworld)
+    engine = sync_tree(os.path.dirname(os.path.abspath(__file__)), os.path.join(path, "koopaengine"))
+    engine += write_if_changed(os.path.join(path, "game.py"), LAUNCHER.encode())
+    return {"written": writer.written, "reused": writer.reused, "engine files": engine,
+            "seconds": time.perf_counter() - started}
+
+# Runtime side
+class Bundle:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported bundle format {self.manifest.get('format')}")
+
+    def blob(self, key):
+        with open(os.path.join(self.path, "blobs", key[:2], key), "rb") as f:
+            data = zlib.decompress(f.read())
+        if blob_key(data) != key:
+            raise ValueError(f"Bundle blob {key} is corrupt")
+        return data
+
+    def keys(self):
+        return self.manifest["levels"].keys()
+
+    def load(self, level_id):
+        return as_level(level_id, json.loads(self.blob(self.manifest["levels"][level_id])))
+
+    def thumbnail(self, level_id):
+        key = self.manifest["thumbnails"].get(level_id)
+        if key is None:
+            return None
+        return pygame.image.load(io.BytesIO(self.blob(key)), "thumb.png")
+
+    def overworld(self):
+        from .overworld import Overworld
+        return Overworld.from_json(json.loads(self.blob(self.manifest["overworld"])))
+
+def install(path):
+    # Points LEVELS, THUMBNAILS and the overworld at a bundle
+    from .levels import LEVELS
+    from .state import state
+    from .thumbnails import THUMBNAILS
+
+    bundle = Bundle(path)
+    LEVELS.attach(bundle)
+    THUMBNAILS.attach(bundle)
+    state.overworld_map = bundle.overworld()
+    return bundle
+
+def main(argv=None):
+    from .levels import LEVELS
+    from .state import state
+
+    parser = argparse.ArgumentParser(description="Export the game as an engine plus a level bundle")
+    parser.add_argument("path", nargs="?", default="export")
+    parser.add_argument("--level-seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.level_seed is not None:
+        LEVELS.set_seed(args.level_seed)
+    stats = export_game(LEVELS, state.overworld_map, args.path)
+    print(f"Exported to {args.path}: {stats['written']} blobs written, {stats['reused']} reused, "
+          f"{stats['engine files']} engine files copied in {stats['seconds'] * 1000:.0f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import zlib
+
+from .collision import TILE_SHAPES
+from .constants import WORLD_THEMES
+from .levels import as_level, level_json
+
+# Level catalog
+# A SQLite file indexing any number of levels by id, pack and world, with
+# metrics worked out once when a level is added: enemy count, gaps in the
+# floor, floating block density and an estimated difficulty. Queries only
+# read the index columns; a level's rows are decompressed when it is asked
+# for by id, so browsing thousands of levels keeps none of them in memory.
+# Ids keep the "world-name" form the rest of the engine parses ("3-2",
+# "3-c1042"), and a catalog can stand in for LEVELS via LEVELS.attach().
+CATALOG_PATH = "levels.db"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS levels (
+    id TEXT PRIMARY KEY,
+    pack TEXT NOT NULL,
+    world INTEGER NOT NULL,
+    theme TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    enemies INTEGER NOT NULL,
+    gaps INTEGER NOT NULL,
+    block_density REAL NOT NULL,
+    solvable INTEGER NOT NULL,
+    difficulty REAL NOT NULL,
+    content_key TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS levels_world ON levels (world, difficulty);
+CREATE INDEX IF NOT EXISTS levels_pack ON levels (pack, id);
+CREATE INDEX IF NOT EXISTS levels_difficulty ON levels (difficulty);
+"""
+INFO_COLUMNS = "id, pack, world, theme, width, height, enemies, gaps, block_density, solvable, difficulty"
+SORT_KEYS = ("id", "difficulty", "enemies", "gaps", "width", "block_density")
+
+def world_of(level_id):
+    return int(level_id.split("-")[0])
+
+def level_metrics(level_id, rows, reachability=True):
+    # The index columns for a level (everything but id, pack and data).
+    # Without the reachability check, solvable is -1 (unknown) and the
+    # difficulty leaves out dead ends
+    from .reachability import ANALYSIS
+
+    rows = as_level(level_id, rows)  # enemies come from its entity layer
+    world = world_of(level_id)
+    theme = WORLD_THEMES[world]
+    height = len(rows)
+    width = len(rows[0]) if rows else 0
+    enemies = len(rows.entities)
+
+    def at(col, row):
+        if row >= height:
+            return ""  # below the level: not open space
+        return rows[row][col] if col < len(rows[row]) else " "
+
+    blocks = 0
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row[:width]):
+            if char in "B?" and at(x, y + 1) == " ":
+                blocks += 1
+
+    # Runs of columns with no floor in the bottom row
+    gaps = 0
+    floor = rows[-1].ljust(width) if rows else ""
+    for x in range(width):
+        if floor[x] not in TILE_SHAPES and (x == 0 or floor[x - 1] in TILE_SHAPES):
+            gaps += 1
+
+    screens = max(1.0, width / 19)
+    difficulty = 0.35 * min(1.0, enemies / screens / 3) + 0.35 * min(1.0, gaps / screens)
+    solvable = -1
+    if reachability:
+        report = ANALYSIS.analyze(rows)
+        solvable = int(report.solvable)
+        if report.solvable:
+            difficulty += 0.3 * len(report.dead_ends) / max(1, len(report.reachable))
+        else:
+            difficulty = 1.0
+    return {
+        "world": world,
+        "theme": theme["name"],
+        "width": width,
+        "height": height,
+        "enemies": enemies,
+        "gaps": gaps,
+        "block_density": blocks / max(1, width * height),
+        "solvable": solvable,
+        "difficulty": round(min(1.0, difficulty), 3),
+    }
+
+def content_key(level):
+    # The tiles' key, extended by the entity layer when there is one
+    from .reachability import ANALYSIS
+    key = ANALYSIS.content_key(level)
+    if level.entities:
+        key = hashlib.blake2b(f"{key}{level.entities}".encode(), digest_size=16).hexdigest()
+    return key
+
+class LevelCatalog:
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self.batching = False
+
+    def add(self, level_id, rows, pack=None, reachability=True):
+        # Returns False when the stored level is already this content. With
+        # no pack, a level already in the catalog stays in its pack
+        rows = as_level(level_id, rows)
+        key = content_key(rows)
+        row = self.db.execute("SELECT content_key, pack FROM levels WHERE id = ?", (level_id,)).fetchone()
+        if pack is None:
+            pack = row["pack"] if row is not None else "default"
+        if row is not None and row["content_key"] == key and row["pack"] == pack:
+            return False
+        metrics = level_metrics(level_id, rows, reachability)
+        metrics.update(id=level_id, pack=pack, content_key=key,
+                       data=zlib.compress(json.dumps(level_json(rows), separators=(",", ":")).encode()))
+        columns = ", ".join(metrics)
+        self.db.execute(f"INSERT OR REPLACE INTO levels ({columns}) VALUES ({', '.join(':' + c for c in metrics)})",
+                        metrics)
+        if not self.batching:
+            self.db.commit()
+        return True
+
+    def add_pack(self, pack, levels, reachability=True):
+        # levels: iterable of (level_id, rows); one transaction for the lot
+        added = 0
+        self.batching = True
+        try:
+            with self.db:
+                for level_id, rows in levels:
+                    added += self.add(level_id, rows, pack, reachability)
+        finally:
+            self.batching = False
+        return added
+
+    def remove(self, level_id):
+        with self.db:
+            self.db.execute("DELETE FROM levels WHERE id = ?", (level_id,))
+
+    def load(self, level_id):
+        row = self.db.execute("SELECT data FROM levels WHERE id = ?", (level_id,)).fetchone()
+        if row is None:
+            raise KeyError(level_id)
+        return as_level(level_id, json.loads(zlib.decompress(row["data"])))
+
+    def info(self, level_id):
+        # The metrics row for a level, or None
+        return self.db.execute(f"SELECT {INFO_COLUMNS} FROM levels WHERE id = ?", (level_id,)).fetchone()
+
+    def where(self, world=None, pack=None, min_difficulty=None, max_difficulty=None, solvable=None):
+        clauses, params = [], []
+        for column, op, value in (("world", "=", world), ("pack", "=", pack),
+                                  ("difficulty", ">=", min_difficulty), ("difficulty", "<=", max_difficulty),
+                                  ("solvable", "=", solvable)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, sort="id", limit=50, offset=0, **filters):
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Can't sort levels by {sort!r}")
+        where, params = self.where(**filters)
+        return self.db.execute(f"SELECT {INFO_COLUMNS} FROM levels{where} ORDER BY {sort}, id LIMIT ? OFFSET ?",
+                               params + [limit, offset]).fetchall()
+
+    def count(self, **filters):
+        where, params = self.where(**filters)
+        return self.db.execute(f"SELECT COUNT(*) FROM levels{where}", params).fetchone()[0]
+
+    def neighbour(self, level_id, step, **filters):
+        # The next (step 1) or previous (step -1) id in id order, wrapping
+        where, params = self.where(**filters)
+        op, order = (">", "ASC") if step > 0 else ("<", "DESC")
+        cond = (where + " AND" if where else " WHERE") + f" id {op} ?"
+        row = self.db.execute(f"SELECT id FROM levels{cond} ORDER BY id {order} LIMIT 1",
+                              params + [level_id]).fetchone()
+        if row is None:
+            row = self.db.execute(f"SELECT id FROM levels{where} ORDER BY id {order} LIMIT 1", params).fetchone()
+        return row["id"] if row else None
+
+    def keys(self):
+        return [row[0] for row in self.db.execute("SELECT id FROM levels ORDER BY id")]
+
+    def close(self):
+        self.db.close()
+
+_catalog = None
+
+def use_catalog(catalog):
+    # Makes catalog (the one attached with app.py --catalog) the one
+    # get_catalog() returns
+    global _catalog
+    _catalog = catalog
+
+def get_catalog(create=True):
+    # The catalog the editor and world map share: the attached one, or
+    # CATALOG_PATH opened on first use; None if there is no catalog file
+    # yet and create is False
+    global _catalog
+    if _catalog is None:
+        if not create and not os.path.exists(CATALOG_PATH):
+            return None
+        _catalog = LevelCatalog(CATALOG_PATH)
+    return _catalog
+
+def main(argv=None):
+    from .levels import LEVELS
+
+    parser = argparse.ArgumentParser(description="Index and query the level catalog")
+    parser.add_argument("--db", default=CATALOG_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    index = commands.add_parser("index", help="add the built-in levels, or level packs, to the catalog")
+    index.add_argument("files", nargs="*", help="level packs (see importer.py)")
+    index.add_argument("--pack", default="default")
+    index.add_argument("--level-seed", type=int, default=None)
+    query = commands.add_parser("query", help="list levels matching filters")
+    query.add_argument("--world", type=int)
+    query.add_argument("--pack")
+    query.add_argument("--min-difficulty", type=float)
+    query.add_argument("--max-difficulty", type=float)
+    query.add_argument("--sort", choices=SORT_KEYS, default="id")
+    query.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    catalog = LevelCatalog(args.db)
+    if args.command == "index":
+        if args.level_seed is not None:
+            LEVELS.set_seed(args.level_seed)
+        if args.files:
+            # Packs go through the streaming importer
+            from .importer import import_pack
+            read = added = 0
+            for path in args.files:
+                stats = import_pack(path, catalog, args.pack)
+                read += stats["read"]
+                added += stats["imported"]
+        else:
+            levels = list(LEVELS.items())
+            read = len(levels)
+            added = catalog.add_pack(args.pack, levels)
+        print(f"Indexed {read} levels ({added} new or changed), {catalog.count()} in {args.db}")
+    else:
+        filters = dict(world=args.world, pack=args.pack, min_difficulty=args.min_difficulty,
+                       max_difficulty=args.max_difficulty)
+        for row in catalog.query(args.sort, args.limit, **filters):
+            print(f"{row['id']:>10}  {row['pack']:<12} {row['theme']:<14} {row['width']:4}x{row['height']:<3}"
+                  f" enemies {row['enemies']:3}  gaps {row['gaps']:2}  blocks {row['block_density']:.3f}"
+                  f"  difficulty {row['difficulty']:.2f}{'  (unsolvable)' if row['solvable'] == 0 else ''}")
+        print(f"{catalog.count(**filters)} matching")
+    catalog.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
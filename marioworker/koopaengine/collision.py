@@ -0,0 +1,150 @@
+import math
+
+from .constants import TILE
+
+# Tile shapes
+# A shape says whether a tile blocks sideways/upward movement and where
+# its floor is across the tile (pixels down from the tile top at the left
+# and right edge). Every current tile is a full block; a slope is just a
+# shape with different floor heights and open sides.
+class TileShape:
+    def __init__(self, name, floor_left=0, floor_right=0, solid_sides=True):
+        self.name = name
+        self.floor_left = floor_left
+        self.floor_right = floor_right
+        self.solid_sides = solid_sides
+
+    def floor(self, fx):
+        # fx: 0..1 across the tile
+        return self.floor_left + (self.floor_right - self.floor_left) * min(max(fx, 0.0), 1.0)
+
+FULL = TileShape("full")
+SLOPE_UP = TileShape("slope_up", TILE, 0, solid_sides=False)
+SLOPE_DOWN = TileShape("slope_down", 0, TILE, solid_sides=False)
+
+TILE_SHAPES = {
+    "G": FULL,
+    "B": FULL,
+    "P": FULL,
+    "T": FULL,
+    "?": FULL,
+    "U": FULL,  # a used ? block
+}
+HAZARDS = set("L")  # not solid, but they hurt
+
+EPS = 1e-6
+
+# Swept AABB against the tile grid
+# Movement is resolved one axis at a time. Each sweep walks every tile
+# column (or row) the moving edge crosses, nearest first, and stops at the
+# first blocking one, so nothing tunnels however far it moves in a step.
+#
+# The grid keeps its tiles in one bytearray, a byte per tile (tile chars
+# are ASCII), row after row, cut or padded with sky to the first row's
+# width. shape() is then an index into cells and one into a 256-entry
+# table, with no strings or dict lookups on the hot path.
+def shape_table(shapes):
+    table = [None] * 256
+    for char, shape in shapes.items():
+        table[ord(char)] = shape
+    return table
+
+class TileGrid:
+    def __init__(self, level_data, shapes=TILE_SHAPES):
+        self.shapes = shapes
+        self.table = shape_table(shapes)
+        self.height = len(level_data)
+        self.width = len(level_data[0]) if level_data else 0
+        self.cells = bytearray(b" " * (self.width * self.height))
+        for row, text in enumerate(level_data):
+            self.set_row(row, text)
+        self.bump_listeners = []  # called with (col, row, entity); see blocks.py
+
+    def shape(self, col, row):
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return self.table[self.cells[row * self.width + col]]
+        return None
+
+    def tile(self, col, row):
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return chr(self.cells[row * self.width + col])
+        return " "
+
+    def set_row(self, row, text):
+        start = row * self.width
+        self.cells[start:start + self.width] = text[:self.width].ljust(self.width).encode("latin-1")
+
+    def set_tile(self, col, row, char):
+        if 0 <= row < self.height and 0 <= col < self.width:
+            self.cells[row * self.width + col] = ord(char)
+
+    def row_text(self, row, col0=0, col1=None):
+        start = row * self.width
+        end = start + (self.width if col1 is None else min(col1, self.width))
+        return self.cells[start + col0:end].decode("latin-1")
+
+    def bump(self, col, row, entity):
+        # Something moving up hit this tile
+        for listener in self.bump_listeners:
+            listener(col, row, entity)
+
+    def solid_at(self, px, py):
+        return self.shape(math.floor(px / TILE), math.floor(py / TILE)) is not None
+
+    def sweep_x(self, x, y, w, h, dx):
+        # Returns (new_x, hit_tile or None)
+        if dx == 0:
+            return x, None
+        row0 = math.floor(y / TILE)
+        row1 = math.floor((y + h - EPS) / TILE)
+        if dx > 0:
+            first = math.floor((x + w - EPS) / TILE) + 1
+            last = math.floor((x + w + dx - EPS) / TILE)
+            cols = range(first, last + 1)
+        else:
+            first = math.floor((x + EPS) / TILE) - 1
+            last = math.floor((x + dx) / TILE)
+            cols = range(first, last - 1, -1)
+
+        for col in cols:
+            for row in range(row0, row1 + 1):
+                shape = self.shape(col, row)
+                if shape is not None and shape.solid_sides:
+                    if dx > 0:
+                        return col * TILE - w, (col, row)
+                    return (col + 1) * TILE, (col, row)
+        return x + dx, None
+
+    def sweep_y(self, x, y, w, h, dy):
+        # Returns (new_y, hit_tile or None); floors follow the tile shape
+        if dy == 0:
+            return y, None
+        col0 = math.floor(x / TILE)
+        col1 = math.floor((x + w - EPS) / TILE)
+        if dy > 0:
+            bottom = y + h
+            first = math.floor((bottom - EPS) / TILE)
+            last = math.floor((bottom + dy - EPS) / TILE)
+            for row in range(first, last + 1):
+                best = None
+                for col in range(col0, col1 + 1):
+                    shape = self.shape(col, row)
+                    if shape is None:
+                        continue
+                    fx = (x + w / 2 - col * TILE) / TILE
+                    floor_y = row * TILE + shape.floor(fx)
+                    # Only floors at or below where the feet start count
+                    if floor_y >= bottom - EPS and floor_y <= bottom + dy and (best is None or floor_y < best[0]):
+                        best = (floor_y, (col, row))
+                if best is not None:
+                    return best[0] - h, best[1]
+            return y + dy, None
+
+        first = math.floor((y + EPS) / TILE) - 1
+        last = math.floor((y + dy) / TILE)
+        for row in range(first, last - 1, -1):
+            for col in range(col0, col1 + 1):
+                shape = self.shape(col, row)
+                if shape is not None and shape.solid_sides:
+                    return (row + 1) * TILE, (col, row)
+        return y + dy, None
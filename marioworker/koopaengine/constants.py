@@ -0,0 +1,34 @@
+# Constants
+SCALE = 2
+TILE = 16
+WIDTH = int(300 * SCALE)
+HEIGHT = int(200 * SCALE)
+FPS = 60
+SIM_HZ = 60  # fixed simulation rate, independent of FPS
+
+# NES Palette
+NES_PALETTE = [
+    (84, 84, 84), (0, 30, 116), (8, 16, 144), (48, 0, 136), 
+    (68, 0, 100), (92, 0, 48), (84, 4, 0), (60, 24, 0), 
+    (32, 42, 0), (8, 58, 0), (0, 64, 0), (0, 60, 0), 
+    (0, 50, 60), (0, 0, 0), (152, 150, 152), (8, 76, 196), 
+    (48, 50, 236), (92, 30, 228), (136, 20, 176), (160, 20, 100), 
+    (152, 34, 32), (120, 60, 0), (84, 90, 0), (40, 114, 0), 
+    (8, 124, 0), (0, 118, 40), (0, 102, 120), (0, 0, 0), 
+    (236, 238, 236), (76, 154, 236), (120, 124, 236), (176, 98, 236), 
+    (228, 84, 236), (236, 88, 180), (236, 106, 100), (212, 136, 32), 
+    (160, 170, 0), (116, 196, 0), (76, 208, 32), (56, 204, 108), 
+    (56, 180, 204), (60, 60, 60), (0, 0, 0), (0, 0, 0)
+]
+
+# World themes
+WORLD_THEMES = {
+    1: {"sky": 27, "ground": 20, "pipe": 14, "block": 33, "water": None, "lava": None, "enemy": "G", "name": "GRASS LAND"},
+    2: {"sky": 26, "ground": 21, "pipe": 15, "block": 34, "water": None, "lava": None, "enemy": "K", "name": "DESERT HILL"},
+    3: {"sky": 25, "ground": 22, "pipe": 16, "block": 35, "water": 40, "lava": None, "enemy": "F", "name": "AQUA SEA"},
+    4: {"sky": 24, "ground": 23, "pipe": 17, "block": 36, "water": None, "lava": None, "enemy": "B", "name": "GIANT FOREST"},
+    5: {"sky": 23, "ground": 24, "pipe": 18, "block": 37, "water": None, "lava": None, "enemy": "S", "name": "SKY HEIGHTS"},
+    6: {"sky": 22, "ground": 25, "pipe": 19, "block": 38, "water": None, "lava": None, "enemy": "P", "name": "ICE CAVERN"},
+    7: {"sky": 21, "ground": 26, "pipe": 20, "block": 39, "water": None, "lava": 20, "enemy": "M", "name": "LAVA CASTLE"},
+    8: {"sky": 20, "ground": 27, "pipe": 21, "block": 40, "water": None, "lava": None, "enemy": "W", "name": "FINAL FORTRESS"}
+}
@@ -0,0 +1,25 @@
+import pygame
+from pygame.locals import *
+
+from .constants import WIDTH, HEIGHT
+
+# Window
+# Scenes draw straight into the WIDTH x HEIGHT window. With vsync the window
+# needs an SDL renderer, which pygame only gives with SCALED; otherwise it is
+# a plain window.
+class Display:
+    def __init__(self, caption="KOOPA ENGINE 1.0A - 8 Worlds Edition", vsync=False):
+        self.vsync = vsync
+        self.screen = None
+        if vsync:
+            try:
+                self.screen = pygame.display.set_mode((WIDTH, HEIGHT), SCALED, vsync=1)
+            except pygame.error as e:
+                print(f"Vsync not available, using a normal window: {e}")
+                self.vsync = False
+        if self.screen is None:
+            self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption(caption)
+
+    def present(self):
+        pygame.display.flip()
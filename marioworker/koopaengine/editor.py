@@ -0,0 +1,460 @@
+import json
+
+import pygame
+from pygame.locals import *
+
+from . import scenes
+from .assets import get_font
+from .bundle import export_game
+from .catalog import get_catalog
+from .constants import WIDTH, HEIGHT, TILE, NES_PALETTE, WORLD_THEMES
+from .atlas import SPRITES
+from .enemies import ENEMY_TYPES, Enemy
+from .levels import LEVELS, LEVEL_TILE_TYPES, Level, as_level, level_json
+from .overworld import Overworld, OverworldRenderer, TILE_COLORS
+from .reachability import ANALYSIS
+from .state import state, push, Scene
+from .thumbnails import THUMBNAILS
+from .widgets import Menu
+
+# Editor Scenes
+class OverworldEditor(Scene):
+    def __init__(self):
+        self.cam_x = 0
+        self.cam_y = 0
+        self.selected_tile = "grass"
+        self.tile_size = 24
+        self.tile_types = ["empty", "grass", "desert", "water", "level", "castle", "pipe", "path", "start"]
+        self.tile_colors = TILE_COLORS
+        self.showing_menu = False
+        self.menu_option = 0
+        self.menu_options = ["Save Overworld", "Load Overworld", "Level Editor", "Export Game", "Map Size", "Return to Title"]
+        self.menu = Menu("EDITOR MENU", self.menu_options)
+        self.level_to_edit = None
+        self.renderer = OverworldRenderer(self.tile_colors, self.tile_size)
+        
+    def handle(self, events, keys):
+        for e in events:
+            if e.type == KEYDOWN:
+                if e.key == K_ESCAPE:
+                    self.showing_menu = not self.showing_menu
+                    if not self.showing_menu:
+                        self.menu_option = 0
+                elif self.showing_menu:
+                    if e.key == K_UP:
+                        self.menu_option = (self.menu_option - 1) % len(self.menu_options)
+                    elif e.key == K_DOWN:
+                        self.menu_option = (self.menu_option + 1) % len(self.menu_options)
+                    elif e.key == K_RETURN:
+                        if self.menu_option == 0:  # Save
+                            self.save_overworld()
+                        elif self.menu_option == 1:  # Load
+                            self.load_overworld()
+                        elif self.menu_option == 2:  # Level Editor
+                            self.enter_level_editor()
+                        elif self.menu_option == 3:  # Export
+                            self.export_game()
+                        elif self.menu_option == 4:  # Map Size
+                            self.next_map_size()
+                        elif self.menu_option == 5:  # Return to Title
+                            state.editor_mode = False
+                            push(scenes.TitleScreen())
+                else:
+                    # Tile selection
+                    if e.key in [K_1, K_2, K_3, K_4, K_5, K_6, K_7, K_8, K_9]:
+                        idx = e.key - K_1
+                        if idx < len(self.tile_types):
+                            self.selected_tile = self.tile_types[idx]
+            
+            elif e.type == MOUSEBUTTONDOWN and not self.showing_menu:
+                # Get grid position
+                grid_x = (e.pos[0] + self.cam_x) // self.tile_size
+                grid_y = (e.pos[1] + self.cam_y) // self.tile_size
+                if e.button == 1:  # Left click
+                    self.place_tile(grid_x, grid_y)
+                elif e.button == 3 and state.overworld_map.in_bounds(grid_x, grid_y):  # Right click
+                    # Clear tile
+                    state.overworld_map.clear(grid_x, grid_y)
+            
+            elif e.type == MOUSEMOTION and not self.showing_menu:
+                if pygame.mouse.get_pressed()[0]:  # Left mouse button held
+                    grid_x = (e.pos[0] + self.cam_x) // self.tile_size
+                    grid_y = (e.pos[1] + self.cam_y) // self.tile_size
+                    self.place_tile(grid_x, grid_y)
+        
+        # Camera panning; hold shift to pan faster across big maps
+        if not self.showing_menu:
+            speed = 40 if keys[K_LSHIFT] or keys[K_RSHIFT] else 5
+            max_x = max(0, state.overworld_map.width * self.tile_size - WIDTH)
+            max_y = max(0, state.overworld_map.height * self.tile_size - HEIGHT + 40)  # room for the palette
+            if keys[K_LEFT]:
+                self.cam_x = max(0, self.cam_x - speed)
+            if keys[K_RIGHT]:
+                self.cam_x = min(max_x, self.cam_x + speed)
+            if keys[K_UP]:
+                self.cam_y = max(0, self.cam_y - speed)
+            if keys[K_DOWN]:
+                self.cam_y = min(max_y, self.cam_y + speed)
+    
+    def place_tile(self, grid_x, grid_y):
+        world = state.overworld_map
+        if not world.in_bounds(grid_x, grid_y):
+            return
+        if world.type_at(grid_x, grid_y) == self.selected_tile:
+            return  # dragging over the same tile
+        world.set_type(grid_x, grid_y, self.selected_tile)
+        
+        # If placing a level, assign a default level ID
+        if self.selected_tile == "level":
+            world.set_level(grid_x, grid_y, "1-1")
+    
+    def next_map_size(self):
+        # Grow (or wrap back down) the map, keeping what fits
+        sizes = (8, 64, 256, 1000)
+        world = state.overworld_map
+        size = next((s for s in sizes if s > max(world.width, world.height)), sizes[0])
+        state.overworld_map = world.resized(size, size)
+        self.cam_x = self.cam_y = 0
+    
+    def save_overworld(self):
+        try:
+            with open("overworld.json", "w") as f:
+                json.dump(state.overworld_map.to_json(), f)
+        except Exception as e:
+            print(f"Error saving overworld: {e}")
+    
+    def load_overworld(self):
+        try:
+            with open("overworld.json", "r") as f:
+                state.overworld_map = Overworld.from_json(json.load(f))
+        except Exception as e:
+            print(f"Error loading overworld: {e}")
+    
+    def enter_level_editor(self):
+        # Find the first level tile
+        for x, y, level in state.overworld_map.levels():
+            self.level_to_edit = level
+            state.editing_level = self.level_to_edit
+            push(LevelEditor())
+            return
+        
+        # If no level found, create a new one
+        self.level_to_edit = "1-1"
+        state.editing_level = self.level_to_edit
+        push(LevelEditor())
+    
+    def export_game(self):
+        try:
+            stats = export_game(LEVELS, state.overworld_map)
+            print(f"Game exported to export/ ({stats['written']} blobs written, {stats['reused']} reused, "
+                  f"{stats['engine files']} engine files copied); run it with python export/game.py")
+        except Exception as e:
+            print(f"Error exporting game: {e}")
+    
+    def update(self, dt):
+        pass
+    
+    def draw(self, surf):
+        surf.fill(NES_PALETTE[27])
+        
+        # Draw overworld tiles
+        world = state.overworld_map
+        self.renderer.draw(surf, world, self.cam_x, self.cam_y)
+        
+        # Draw grid over the visible part of the map
+        if state.show_grid:
+            ts = self.tile_size
+            right = min(WIDTH, world.width * ts - self.cam_x)
+            bottom = min(HEIGHT, world.height * ts - self.cam_y)
+            for x in range(-(self.cam_x % ts), right, ts):
+                pygame.draw.line(surf, NES_PALETTE[0], (x, 0), (x, bottom), 1)
+            for y in range(-(self.cam_y % ts), bottom, ts):
+                pygame.draw.line(surf, NES_PALETTE[0], (0, y), (right, y), 1)
+        
+        # Draw tile palette
+        palette_y = HEIGHT - 30
+        for i, tile_type in enumerate(self.tile_types):
+            rect = pygame.Rect(10 + i * 30, palette_y, 25, 25)
+            pygame.draw.rect(surf, self.tile_colors[tile_type], rect)
+            pygame.draw.rect(surf, NES_PALETTE[0], rect, 1)
+            
+            # Highlight selected tile
+            if tile_type == self.selected_tile:
+                pygame.draw.rect(surf, NES_PALETTE[39], rect, 3)
+            
+            # Draw key indicator
+            font = get_font(14)
+            text = font.render(str((i+1) % 10), True, NES_PALETTE[0])
+            surf.blit(text, (rect.x + 2, rect.y + 2))
+        
+        # Draw instructions
+        font = get_font(14)
+        text = font.render("1-9: Select Tile  LMB: Place  RMB: Remove  ESC: Menu", True, NES_PALETTE[0])
+        surf.blit(text, (10, palette_y - 20))
+        text = font.render(f"{world.width}x{world.height}", True, NES_PALETTE[0])
+        surf.blit(text, (WIDTH - text.get_width() - 10, palette_y - 20))
+        
+        # Draw menu if showing
+        if self.showing_menu:
+            self.draw_menu(surf)
+    
+    def draw_menu(self, surf):
+        self.menu.select(self.menu_option)
+        self.menu.draw(surf)
+
+class LevelEditor(Scene):
+    def __init__(self):
+        self.level_id = state.editing_level or "1-1"
+        self.level_data = LEVELS.get(self.level_id, Level([" " * 100 for _ in range(20)]))
+        self.cam = 0
+        self.selected_tile = "G"
+        self.selected_enemy = None  # E cycles through the enemy kinds
+        self.enemy_icons = {char: Enemy(kind, 0, 0) for char, kind in ENEMY_TYPES.items()}
+        self.tile_types = LEVEL_TILE_TYPES
+        self.tile_colors = {
+            "G": NES_PALETTE[20],
+            "B": NES_PALETTE[33],
+            "P": NES_PALETTE[21],
+            "T": NES_PALETTE[14],
+            "?": NES_PALETTE[39],
+            "~": NES_PALETTE[40],
+            "L": NES_PALETTE[20],
+            "S": NES_PALETTE[33],
+            "F": NES_PALETTE[31],
+            " ": NES_PALETTE[27]
+        }
+        self.showing_menu = False
+        self.menu_option = 0
+        self.menu_options = ["Save Level", "Load Level", "Back to Overworld"]
+        self.menu = Menu("LEVEL EDITOR", self.menu_options)
+        self.analyze()
+        
+    def handle(self, events, keys):
+        for e in events:
+            if e.type == KEYDOWN:
+                if e.key == K_ESCAPE:
+                    self.showing_menu = not self.showing_menu
+                    if not self.showing_menu:
+                        self.menu_option = 0
+                elif self.showing_menu:
+                    if e.key == K_UP:
+                        self.menu_option = (self.menu_option - 1) % len(self.menu_options)
+                    elif e.key == K_DOWN:
+                        self.menu_option = (self.menu_option + 1) % len(self.menu_options)
+                    elif e.key == K_RETURN:
+                        if self.menu_option == 0:  # Save
+                            self.save_level()
+                        elif self.menu_option == 1:  # Load
+                            self.load_level()
+                        elif self.menu_option == 2:  # Back to Overworld
+                            state.editing_level = None
+                            push(OverworldEditor())
+                else:
+                    # Browse the level catalog
+                    if e.key in (K_PAGEUP, K_PAGEDOWN):
+                        self.browse(1 if e.key == K_PAGEDOWN else -1)
+                    # Tile selection
+                    elif e.key in [K_1, K_2, K_3, K_4, K_5, K_6, K_7, K_8, K_9, K_0]:
+                        keys = list(self.tile_types.keys())
+                        idx = 9 if e.key == K_0 else e.key - K_1
+                        if idx < len(keys):
+                            self.selected_tile = keys[idx]
+                            self.selected_enemy = None
+                    elif e.key == K_e:
+                        self.cycle_enemy()
+            
+            elif e.type == MOUSEBUTTONDOWN and not self.showing_menu:
+                # Get tile position
+                tile_x = (e.pos[0] + self.cam) // TILE
+                tile_y = e.pos[1] // TILE
+                
+                if 0 <= tile_y < len(self.level_data) and 0 <= tile_x < len(self.level_data[0]):
+                    if self.selected_enemy is not None:
+                        self.toggle_enemy(tile_x, tile_y)
+                    else:
+                        # Place tile
+                        row = list(self.level_data[tile_y])
+                        row[tile_x] = self.selected_tile
+                        self.level_data[tile_y] = "".join(row)
+            
+            elif e.type == MOUSEMOTION and not self.showing_menu and self.selected_enemy is None:
+                if pygame.mouse.get_pressed()[0]:  # Left mouse button held
+                    # Get tile position
+                    tile_x = (e.pos[0] + self.cam) // TILE
+                    tile_y = e.pos[1] // TILE
+                    
+                    if 0 <= tile_y < len(self.level_data) and 0 <= tile_x < len(self.level_data[0]):
+                        # Place tile
+                        row = list(self.level_data[tile_y])
+                        row[tile_x] = self.selected_tile
+                        self.level_data[tile_y] = "".join(row)
+            
+            elif e.type == MOUSEBUTTONUP and not self.showing_menu:
+                self.analyze()  # once per stroke
+        
+        # Camera panning
+        if not self.showing_menu:
+            if keys[K_LEFT]:
+                self.cam = max(0, self.cam - 10)
+            if keys[K_RIGHT]:
+                self.cam = min(len(self.level_data[0]) * TILE - WIDTH, self.cam + 10)
+    
+    def cycle_enemy(self):
+        # Off -> this world's enemy -> every other kind -> off
+        world_enemy = WORLD_THEMES[int(self.level_id.split("-")[0])]["enemy"]
+        order = [None, world_enemy] + [char for char in ENEMY_TYPES if char != world_enemy]
+        self.selected_enemy = order[(order.index(self.selected_enemy) + 1) % len(order)]
+
+    def toggle_enemy(self, x, y):
+        # Enemies live in the level's entity layer, not in its tiles
+        entities = self.level_data.entities
+        here = [entity for entity in entities if entity[1:] == (x, y)]
+        if here:
+            entities.remove(here[0])
+        else:
+            entities.append((self.selected_enemy, x, y))
+
+    def analyze(self):
+        self.report = ANALYSIS.analyze(self.level_data)
+        catalog = get_catalog(create=False)
+        self.info = catalog.info(self.level_id) if catalog is not None else None
+
+    def browse(self, step):
+        # Open the next/previous level in the catalog; only that one is loaded
+        try:
+            catalog = get_catalog(create=False)
+            level_id = catalog.neighbour(self.level_id, step) if catalog is not None else None
+            if level_id is None:
+                return
+            if level_id not in LEVELS:
+                LEVELS[level_id] = catalog.load(level_id)
+            self.level_id = state.editing_level = level_id
+            self.level_data = LEVELS[level_id]
+            self.cam = 0
+            self.analyze()
+        except Exception as e:
+            print(f"Error browsing catalog: {e}")
+
+    def level_changed(self, level_id, changes):
+        # Changed rows land in self.level_data already (it is the LEVELS list)
+        if level_id == self.level_id:
+            self.level_data = LEVELS[level_id]
+            self.analyze()
+
+    def save_level(self):
+        LEVELS[self.level_id] = self.level_data
+        THUMBNAILS.invalidate(self.level_id)
+        try:
+            with open(f"level_{self.level_id}.json", "w") as f:
+                json.dump(level_json(self.level_data), f)
+            # Indexed only into a catalog that is already there
+            catalog = get_catalog(create=False)
+            if catalog is not None:
+                catalog.add(self.level_id, self.level_data)
+            self.analyze()
+        except Exception as e:
+            print(f"Error saving level: {e}")
+    
+    def load_level(self):
+        try:
+            with open(f"level_{self.level_id}.json", "r") as f:
+                self.level_data = as_level(self.level_id, json.load(f))
+                LEVELS[self.level_id] = self.level_data
+                THUMBNAILS.invalidate(self.level_id)
+                self.analyze()
+        except Exception as e:
+            print(f"Error loading level: {e}")
+    
+    def update(self, dt):
+        pass
+    
+    def draw(self, surf):
+        # Draw sky
+        world = int(self.level_id.split("-")[0])
+        theme = WORLD_THEMES[world]
+        surf.fill(NES_PALETTE[theme["sky"]])
+        
+        # Draw level tiles
+        for y, row in enumerate(self.level_data):
+            for x, char in enumerate(row):
+                rect = pygame.Rect(
+                    x * TILE - self.cam,
+                    y * TILE,
+                    TILE,
+                    TILE
+                )
+                
+                # Draw tile
+                if char != " ":
+                    pygame.draw.rect(surf, self.tile_colors.get(char, NES_PALETTE[0]), rect)
+                
+                # Draw grid
+                if state.show_grid:
+                    pygame.draw.rect(surf, NES_PALETTE[0], rect, 1)
+        
+        # Draw the entity layer
+        for char, x, y in self.level_data.entities:
+            if -TILE < x * TILE - self.cam < WIDTH and char in self.enemy_icons:
+                sprite, (ox, oy) = SPRITES.get(self.enemy_icons[char])
+                surf.blit(sprite, (x * TILE - self.cam - ox, y * TILE - oy))
+        
+        # Draw reachability: dead ends in red, route to the flag as dots
+        for x, y in self.report.dead_ends:
+            if -TILE < x * TILE - self.cam < WIDTH:
+                pygame.draw.rect(surf, NES_PALETTE[33], (x * TILE - self.cam + 4, y * TILE + 4, TILE - 8, TILE - 8), 1)
+        for x, y in self.report.route:
+            if -TILE < x * TILE - self.cam < WIDTH:
+                pygame.draw.circle(surf, NES_PALETTE[39], (x * TILE - self.cam + TILE // 2, y * TILE + TILE // 2), 3)
+        
+        # Draw tile palette
+        palette_y = HEIGHT - 30
+        tiles = list(self.tile_types.keys())
+        for i, tile in enumerate(tiles):
+            rect = pygame.Rect(10 + i * 30, palette_y, 25, 25)
+            pygame.draw.rect(surf, self.tile_colors[tile], rect)
+            pygame.draw.rect(surf, NES_PALETTE[0], rect, 1)
+            
+            # Highlight selected tile
+            if tile == self.selected_tile:
+                pygame.draw.rect(surf, NES_PALETTE[39], rect, 3)
+            
+            # Draw key indicator
+            font = get_font(14)
+            text = font.render(str(i+1), True, NES_PALETTE[0])
+            surf.blit(text, (rect.x + 2, rect.y + 2))
+        
+        # Draw level info
+        font = get_font(16)
+        text = font.render(f"Editing: {self.level_id}", True, NES_PALETTE[0])
+        surf.blit(text, (10, 10))
+        color = NES_PALETTE[0] if self.report.solvable else NES_PALETTE[33]
+        text = font.render(self.report.summary(), True, color)
+        surf.blit(text, (10, 30))
+        if self.info is not None:
+            text = font.render(f"{self.info['pack']}: difficulty {self.info['difficulty']:.2f}, "
+                               f"{self.info['enemies']} enemies, {self.info['gaps']} gaps", True, NES_PALETTE[0])
+            surf.blit(text, (10, 50))
+        
+        # Draw instructions
+        text = font.render("0-9: Tile  E: Enemy  LMB: Place  PgUp/PgDn: Catalog  ESC: Menu", True, NES_PALETTE[0])
+        surf.blit(text, (10, palette_y - 20))
+        
+        # Draw selected tile info
+        if self.selected_enemy is not None:
+            selected = f"Enemy: {ENEMY_TYPES[self.selected_enemy].name}"
+        else:
+            selected = self.tile_types[self.selected_tile]
+        text = font.render(f"Selected: {selected}", True, NES_PALETTE[0])
+        surf.blit(text, (WIDTH - text.get_width() - 10, 10))
+        
+        # Draw camera position
+        text = font.render(f"Camera: {self.cam}", True, NES_PALETTE[0])
+        surf.blit(text, (WIDTH - text.get_width() - 10, 30))
+        
+        # Draw menu if showing
+        if self.showing_menu:
+            self.draw_menu(surf)
+    
+    def draw_menu(self, surf):
+        self.menu.select(self.menu_option)
+        self.menu.draw(surf)
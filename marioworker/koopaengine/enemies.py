@@ -0,0 +1,192 @@
+import math
+
+import pygame
+
+from .constants import TILE, NES_PALETTE
+from .entities import Entity
+
+# Enemy registry
+# Every enemy is an Enemy whose kind is an EnemyType: a spawn char (the
+# letter WORLD_THEMES and level entity layers use) with a behaviour, its
+# physics parameters and a sprite painter. Scenes keep enemies grouped by
+# kind and run each behaviour once over its whole group, so adding an enemy
+# is one more entry in ENEMY_TYPES rather than a class and a spawn branch.
+class EnemyType:
+    def __init__(self, char, name, behavior, paint, speed=0.5, stompable=True,
+                 turn_at_edges=True, hop=None, frames=2, frame_time=0.2):
+        self.char = char
+        self.name = name
+        self.behavior = behavior  # behavior(kind, enemies, grid, dt)
+        self.paint = paint        # paint(surf, x, y, enemy)
+        self.speed = speed
+        self.stompable = stompable
+        self.turn_at_edges = turn_at_edges
+        self.hop = hop            # (seconds between hops, jump speed) or None
+        self.frames = frames
+        self.frame_time = frame_time
+
+class Enemy(Entity):
+    __slots__ = ("kind", "animation_frame", "timer", "phase")
+    SNAPSHOT_TIMERS = ("timer", "phase")
+
+    def __init__(self, kind, x, y):
+        super().__init__(x, y)
+        self.kind = kind
+        self.facing_right = False
+        self.vx = -kind.speed
+        self.animation_frame = 0
+        self.timer = 0.0  # animation
+        self.phase = 0.0  # behaviour clock (swim wave, hops)
+
+    @property
+    def stompable(self):
+        return self.kind.stompable
+
+    def update(self, grid, dt):
+        self.kind.behavior(self.kind, (self,), grid, dt)
+
+    def sprite_key(self):
+        return (self.kind.char, self.animation_frame, self.facing_right)
+
+    def paint(self, surf, x, y):
+        self.kind.paint(surf, x, y, self)
+
+# Behaviours
+def step(kind, enemy, grid, dt):
+    # Move at the kind's speed, turning around at walls, and animate
+    enemy.vx = kind.speed if enemy.facing_right else -kind.speed
+    hit_x, hit_y = Entity.update(enemy, grid, dt)
+    if hit_x:
+        enemy.facing_right = not enemy.facing_right
+    enemy.timer += dt
+    if enemy.timer > kind.frame_time:
+        enemy.timer = 0
+        enemy.animation_frame = (enemy.animation_frame + 1) % kind.frames
+
+def walk(kind, enemies, grid, dt):
+    for enemy in enemies:
+        if not enemy.active:
+            continue
+        if enemy.on_ground:
+            if kind.turn_at_edges:
+                edge_x = enemy.x + (enemy.width if enemy.facing_right else -1)
+                if not grid.solid_at(edge_x, enemy.y + enemy.height):
+                    enemy.facing_right = not enemy.facing_right
+            if kind.hop is not None:
+                enemy.phase += dt
+                if enemy.phase >= kind.hop[0]:
+                    enemy.phase = 0
+                    enemy.vy = -kind.hop[1]
+        step(kind, enemy, grid, dt)
+
+def swim(kind, enemies, grid, dt):
+    # Bobs along a sine wave
+    for enemy in enemies:
+        if not enemy.active:
+            continue
+        enemy.phase += dt
+        enemy.y += math.sin(enemy.phase * 5) * 0.5
+        step(kind, enemy, grid, dt)
+
+# Sprites
+def paint_goomba(surf, x, y, enemy):
+    # Body
+    pygame.draw.ellipse(surf, NES_PALETTE[21], (x+2, y+4, 12, 12))  # Brown body
+
+    # Feet
+    foot_offset = 2 if enemy.animation_frame == 0 else -2
+    pygame.draw.rect(surf, NES_PALETTE[21], (x+2, y+14, 4, 2))  # Left foot
+    pygame.draw.rect(surf, NES_PALETTE[21], (x+10, y+14+foot_offset, 4, 2))  # Right foot
+
+    # Eyes
+    eye_dir = 0 if enemy.facing_right else 2
+    pygame.draw.rect(surf, NES_PALETTE[0], (x+4+eye_dir, y+6, 2, 2))  # Left eye
+    pygame.draw.rect(surf, NES_PALETTE[0], (x+10-eye_dir, y+6, 2, 2))  # Right eye
+
+def paint_koopa(surf, x, y, enemy):
+    # Shell
+    pygame.draw.ellipse(surf, NES_PALETTE[14], (x+2, y+4, 12, 12))  # Green shell
+
+    # Head and feet
+    pygame.draw.rect(surf, NES_PALETTE[39], (x+4, y, 8, 4))  # Head
+    pygame.draw.rect(surf, NES_PALETTE[14], (x+2, y+14, 4, 2))  # Left foot
+    pygame.draw.rect(surf, NES_PALETTE[14], (x+10, y+14, 4, 2))  # Right foot
+
+def paint_fish(surf, x, y, enemy):
+    # Body
+    pygame.draw.ellipse(surf, NES_PALETTE[31], (x, y, 16, 8))  # Blue fish
+
+    # Tail
+    pygame.draw.polygon(surf, NES_PALETTE[31], [(x, y+4), (x-5, y), (x-5, y+8)])
+
+    # Eye
+    pygame.draw.circle(surf, NES_PALETTE[0], (x+12, y+4), 2)
+
+def paint_spike(surf, x, y, enemy):
+    # Spike base
+    pygame.draw.rect(surf, NES_PALETTE[33], (x, y, TILE, TILE))
+
+    # Spike
+    pygame.draw.polygon(surf, NES_PALETTE[39], [
+        (x + TILE//2, y),
+        (x, y + TILE),
+        (x + TILE, y + TILE)
+    ])
+
+def paint_beetle(surf, x, y, enemy):
+    # Dark shell on little legs
+    pygame.draw.ellipse(surf, NES_PALETTE[1], (x+1, y+3, 14, 11))
+    pygame.draw.rect(surf, NES_PALETTE[30], (x+4, y+5, 6, 2))  # Shine
+    leg = 1 if enemy.animation_frame == 0 else -1
+    pygame.draw.rect(surf, NES_PALETTE[13], (x+3+leg, y+14, 3, 2))
+    pygame.draw.rect(surf, NES_PALETTE[13], (x+10-leg, y+14, 3, 2))
+
+def paint_penguin(surf, x, y, enemy):
+    # Body and belly
+    pygame.draw.ellipse(surf, NES_PALETTE[13], (x+2, y+1, 12, 15))
+    pygame.draw.ellipse(surf, NES_PALETTE[28], (x+5, y+5, 6, 9))
+
+    # Beak
+    beak = x+13 if enemy.facing_right else x
+    pygame.draw.rect(surf, NES_PALETTE[35], (beak, y+4, 3, 2))
+
+def paint_magma(surf, x, y, enemy):
+    # A ball of lava, flickering between two shades
+    outer = NES_PALETTE[20] if enemy.animation_frame == 0 else NES_PALETTE[35]
+    pygame.draw.circle(surf, outer, (x + TILE//2, y + TILE//2), 7)
+    pygame.draw.circle(surf, NES_PALETTE[36], (x + TILE//2, y + TILE//2 - 1), 3)
+
+def paint_wizard(surf, x, y, enemy):
+    # Robe and pointed hat
+    pygame.draw.rect(surf, NES_PALETTE[3], (x+3, y+6, 10, 10))
+    pygame.draw.polygon(surf, NES_PALETTE[17], [(x+8, y-4), (x+2, y+6), (x+14, y+6)])
+
+    # Face
+    eye = x+9 if enemy.facing_right else x+5
+    pygame.draw.rect(surf, NES_PALETTE[39], (eye, y+8, 2, 2))
+
+ENEMY_TYPES = {kind.char: kind for kind in (
+    EnemyType("G", "Goomba", walk, paint_goomba),
+    EnemyType("K", "Koopa", walk, paint_koopa),
+    EnemyType("F", "Fish", swim, paint_fish),
+    EnemyType("S", "Spike", walk, paint_spike, speed=0, stompable=False),
+    EnemyType("B", "Beetle", walk, paint_beetle, speed=0.4),
+    EnemyType("P", "Penguin", walk, paint_penguin, speed=1.0, turn_at_edges=False),
+    EnemyType("M", "Magma", walk, paint_magma, speed=0, stompable=False, hop=(1.2, 7), frame_time=0.1),
+    EnemyType("W", "Wizard", walk, paint_wizard, speed=0.4, hop=(2.0, 5)),
+)}
+
+def spawn_enemy(char, x, y):
+    # None for a char that isn't an enemy
+    kind = ENEMY_TYPES.get(char)
+    return Enemy(kind, x, y) if kind is not None else None
+
+def group_by_kind(enemies):
+    groups = {}
+    for enemy in enemies:
+        groups.setdefault(enemy.kind, []).append(enemy)
+    return groups
+
+def update_enemies(groups, grid, dt):
+    for kind, enemies in groups.items():
+        kind.behavior(kind, enemies, grid, dt)
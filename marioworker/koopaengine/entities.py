@@ -0,0 +1,266 @@
+import pygame
+from pygame.locals import *
+
+from .atlas import SPRITES
+from .collision import HAZARDS
+from .constants import TILE, WIDTH, HEIGHT, NES_PALETTE
+from .state import state, push
+
+# Player buttons, packed into one byte so inputs can be stored and sent cheaply
+BUTTON_LEFT = 1
+BUTTON_RIGHT = 2
+BUTTON_JUMP = 4
+
+def read_buttons(keys):
+    return ((BUTTON_LEFT if keys[K_LEFT] else 0)
+            | (BUTTON_RIGHT if keys[K_RIGHT] else 0)
+            | (BUTTON_JUMP if keys[K_SPACE] else 0))
+
+# Entity classes; enemies are in enemies.py
+# Entities are slotted (no per-instance __dict__) and each keeps one rect
+# that get_rect() moves in place, so collision checks allocate nothing.
+# Subclasses declare __slots__ for whatever state they add.
+class Entity:
+    __slots__ = ("x", "y", "prev_x", "prev_y", "vx", "vy", "width", "height",
+                 "on_ground", "facing_right", "active", "rect")
+    SNAPSHOT_TIMERS = ()  # float attributes saved by snapshot.py (max 2)
+    stompable = True  # enemies; see enemies.py
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.prev_x = x  # position at the start of the last sim step
+        self.prev_y = y
+        self.vx = 0
+        self.vy = 0
+        self.width = TILE
+        self.height = TILE
+        self.on_ground = False
+        self.facing_right = True
+        self.active = True
+        self.rect = pygame.Rect(x, y, TILE, TILE)
+
+    def get_rect(self):
+        # The entity's own rect, moved to where it is now; copy it to keep it
+        self.rect.update(self.x, self.y, self.width, self.height)
+        return self.rect
+        
+    def remember_position(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    def check_collision(self, other):
+        return self.get_rect().colliderect(other.get_rect())
+        
+    def update(self, grid, dt):
+        # Apply gravity; resting entities push into the floor every step,
+        # which is what keeps on_ground set
+        self.vy += 0.5 * dt * 60
+
+        # Sweep each axis against the tile grid
+        self.x, hit_x = grid.sweep_x(self.x, self.y, self.width, self.height, self.vx * dt * 60)
+        if hit_x:
+            self.vx = 0
+        self.on_ground = False
+        dy = self.vy * dt * 60
+        self.y, hit_y = grid.sweep_y(self.x, self.y, self.width, self.height, dy)
+        if hit_y:
+            self.on_ground = dy > 0
+            self.vy = 0
+            if dy < 0:
+                grid.bump(hit_y[0], hit_y[1], self)
+        return hit_x, hit_y
+
+    def sprite_key(self):
+        # Everything paint() depends on; each distinct key is baked once
+        return ()
+
+    def paint(self, surf, x, y):
+        pass
+
+    def render_state(self):
+        # What draw needs, as plain values that later steps don't change,
+        # so it can be drawn after the fact (see simthread.py); None when
+        # there is nothing to draw
+        if not self.active:
+            return None
+        sprite, (ox, oy) = SPRITES.get(self)
+        return (sprite, ox, oy, self.prev_x, self.prev_y, self.x, self.y)
+
+    def draw(self, surf, cam, alpha=1.0, cam_y=0):
+        draw_sprite(surf, self.render_state(), cam, alpha, cam_y)
+
+def draw_sprite(surf, sprite_state, cam, alpha=1.0, cam_y=0):
+    # Draws an Entity.render_state()
+    if sprite_state is None:
+        return
+    sprite, ox, oy, prev_x, prev_y, x, y = sprite_state
+    # Interpolate between the last two sim steps
+    x = prev_x + (x - prev_x) * alpha - cam
+    y = prev_y + (y - prev_y) * alpha - cam_y
+    if x < -2 * TILE or x > WIDTH + TILE or y < -3 * TILE or y > HEIGHT + TILE:
+        return  # off screen
+    surf.blit(sprite, (int(x) - ox, int(y) - oy))
+
+class Player(Entity):
+    __slots__ = ("jump_power", "move_speed", "invincible", "animation_frame", "walk_timer")
+    SNAPSHOT_TIMERS = ("invincible", "walk_timer")
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.jump_power = -5
+        self.move_speed = 2
+        self.invincible = 0
+        self.animation_frame = 0
+        self.walk_timer = 0
+        
+    @property
+    def size(self):
+        return state.mario_size
+
+    def update(self, grid, dt, enemies, buttons=None):
+        # Handle input; netplay passes buttons in, local play reads the keyboard
+        if buttons is None:
+            buttons = read_buttons(pygame.key.get_pressed())
+        
+        # Horizontal movement
+        self.vx = 0
+        if buttons & BUTTON_LEFT:
+            self.vx = -self.move_speed
+            self.facing_right = False
+        if buttons & BUTTON_RIGHT:
+            self.vx = self.move_speed
+            self.facing_right = True
+            
+        # Jumping
+        if buttons & BUTTON_JUMP and self.on_ground:
+            self.vy = self.jump_power
+            self.on_ground = False
+            
+        # Update walk animation
+        if self.vx != 0:
+            self.walk_timer += dt
+            if self.walk_timer > 0.1:
+                self.walk_timer = 0
+                self.animation_frame = (self.animation_frame + 1) % 3
+        else:
+            self.animation_frame = 0
+            
+        # Update invincibility
+        if self.invincible > 0:
+            self.invincible -= dt
+            
+        super().update(grid, dt)
+        
+        # Check collision with enemies
+        for enemy in enemies:
+            if enemy.active and self.check_collision(enemy):
+                # Jumped on enemy
+                if self.vy > 0 and self.y + self.height - 5 < enemy.y and enemy.stompable:
+                    enemy.active = False
+                    self.vy = self.jump_power / 2
+                    state.score += 100
+                # Hit by enemy
+                elif self.invincible <= 0:
+                    self.hurt()
+
+        # Standing in lava
+        feet = grid.tile(int((self.x + self.width / 2) // TILE), int((self.y + self.height - 1) // TILE))
+        if feet in HAZARDS and self.invincible <= 0:
+            self.hurt()
+
+    def hurt(self):
+        if state.mario_size == "big":
+            state.mario_size = "small"
+            self.invincible = 2
+        else:
+            state.lives -= 1
+            if state.lives <= 0:
+                # Game over
+                from .scenes import GameOverScene  # scenes imports this module
+                push(GameOverScene())
+            else:
+                # Reset position
+                self.respawn(50, 100)
+
+    def respawn(self, x, y):
+        self.x = x
+        self.y = y
+        self.remember_position()  # don't interpolate the jump back
+        self.vx = 0
+        self.vy = 0
+                    
+    def render_state(self):
+        if self.invincible > 0 and int(self.invincible * 10) % 2 == 0:
+            return None  # Blink during invincibility
+        return super().render_state()
+
+    def sprite_key(self):
+        moving = self.vx != 0
+        return (self.size, self.animation_frame if moving else 0, self.facing_right if moving else True)
+
+    def paint(self, surf, x, y):
+        # Draw Mario based on size
+        if self.size == "big":
+            # Body
+            pygame.draw.rect(surf, NES_PALETTE[33], (x+4, y+8, 8, 16))  # Red overalls
+            
+            # Head
+            pygame.draw.rect(surf, NES_PALETTE[39], (x+4, y+4, 8, 4))  # Face
+            
+            # Hat
+            pygame.draw.rect(surf, NES_PALETTE[33], (x+2, y, 12, 4))  # Red hat
+            
+            # Arms
+            arm_offset = 0
+            if self.animation_frame == 1 and self.vx != 0:
+                arm_offset = 2 if self.facing_right else -2
+                
+            pygame.draw.rect(surf, NES_PALETTE[39], (x+arm_offset, y+10, 4, 6))  # Left arm
+            pygame.draw.rect(surf, NES_PALETTE[39], (x+12-arm_offset, y+10, 4, 6))  # Right arm
+            
+            # Legs
+            leg_offset = 0
+            if self.animation_frame == 2 and self.vx != 0:
+                leg_offset = 2 if self.facing_right else -2
+                
+            pygame.draw.rect(surf, NES_PALETTE[21], (x+2, y+24, 4, 8))  # Left leg
+            pygame.draw.rect(surf, NES_PALETTE[21], (x+10, y+24-leg_offset, 4, 8+leg_offset))  # Right leg
+        else:
+            # Small Mario
+            # Body
+            pygame.draw.rect(surf, NES_PALETTE[33], (x+4, y+8, 8, 8))  # Red overalls
+            
+            # Head
+            pygame.draw.rect(surf, NES_PALETTE[39], (x+4, y, 8, 8))  # Face
+            
+            # Hat
+            pygame.draw.rect(surf, NES_PALETTE[33], (x+2, y, 12, 2))  # Red hat
+
+class Mushroom(Entity):
+    # Waits inside its ? block until bumped out, then slides along
+    __slots__ = ()
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.active = False
+
+    def emerge(self):
+        self.active = True
+        self.y -= TILE
+        self.remember_position()
+
+    def update(self, grid, dt):
+        self.vx = 1 if self.facing_right else -1
+        hit_x, hit_y = super().update(grid, dt)
+        if hit_x:
+            self.facing_right = not self.facing_right
+
+    def paint(self, surf, x, y):
+        # Cap
+        pygame.draw.ellipse(surf, NES_PALETTE[33], (x, y, TILE, 10))
+        pygame.draw.rect(surf, NES_PALETTE[39], (x+4, y+2, 3, 3))
+        pygame.draw.rect(surf, NES_PALETTE[39], (x+10, y+3, 3, 3))
+
+        # Stalk
+        pygame.draw.rect(surf, NES_PALETTE[39], (x+4, y+9, 8, 7))
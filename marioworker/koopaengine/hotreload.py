@@ -0,0 +1,107 @@
+import json
+import os
+import re
+import time
+
+from .levels import LEVELS, as_level
+from .overworld import Overworld
+from .state import state, SCENES
+from .thumbnails import THUMBNAILS
+
+# Hot reload
+# Polls the directory the editor saves into for level_X-Y.json and
+# overworld.json. A file is only read when its mtime or size moved, and only
+# the rows (or overworld cells) that differ from what's loaded are pushed to
+# the running scenes through Scene.level_changed / overworld_changed, so a
+# level being played keeps its enemies, camera and baked chunks.
+POLL_INTERVAL = 0.5
+LEVEL_FILE = re.compile(r"level_(\d+-\d+)\.json$")
+OVERWORLD_FILE = "overworld.json"
+
+def diff_rows(old, new):
+    # [(row, text)] for the rows that differ, or None if the size changed
+    # (the first row sets a level's width, as in TileMap)
+    if len(old) != len(new) or not new or len(new[0]) != len(old[0]):
+        return None
+    return [(y, text) for y, (was, text) in enumerate(zip(old, new)) if was != text]
+
+class FileWatcher:
+    def __init__(self, directory=".", interval=POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.next_poll = 0.0
+        self.stats = {}  # file name -> (mtime_ns, size)
+        self.scan()      # files already there aren't changes
+
+    def scan(self):
+        changed = []
+        seen = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return changed
+        for entry in entries:
+            if entry.name != OVERWORLD_FILE and not LEVEL_FILE.match(entry.name):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            seen[entry.name] = (stat.st_mtime_ns, stat.st_size)
+            if self.stats.get(entry.name) != seen[entry.name]:
+                changed.append(entry.name)
+        self.stats = seen
+        return changed
+
+    def update(self):
+        # Call once a frame; only touches the disk every `interval` seconds
+        now = time.monotonic()
+        if now < self.next_poll:
+            return
+        self.next_poll = now + self.interval
+        for name in self.scan():
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+                if name == OVERWORLD_FILE:
+                    self.reload_overworld(data)
+                else:
+                    self.reload_level(LEVEL_FILE.match(name).group(1), data)
+            except Exception as e:
+                # Often a half-written file; it is read again when it changes
+                print(f"Error reloading {name}: {e}")
+
+    def reload_level(self, level_id, data):
+        rows = as_level(level_id, data)
+        if not all(isinstance(row, str) for row in rows):
+            raise ValueError("a level is a list of row strings")
+        old = LEVELS.get(level_id)
+        changes = diff_rows(old, rows) if old else None
+        if changes == [] and rows.entities == old.entities:
+            return
+        if changes is None:
+            LEVELS[level_id] = rows
+        else:
+            # In place, so scenes sharing the level see the same rows; a
+            # running level keeps the enemies it already spawned
+            for y, text in changes:
+                old[y] = text
+            old.entities = rows.entities
+        THUMBNAILS.invalidate(level_id)
+        print(f"Reloaded level {level_id} ({'resized' if changes is None else f'{len(changes)} rows'})")
+        for scene in SCENES:
+            scene.level_changed(level_id, changes)
+
+    def reload_overworld(self, data):
+        world = Overworld.from_json(data)
+        current = state.overworld_map
+        if (world.width, world.height) != (current.width, current.height):
+            state.overworld_map = world
+            changed = world.width * world.height
+        else:
+            changed = current.patch(world)
+            if not changed:
+                return
+        print(f"Reloaded overworld ({changed} cells)")
+        for scene in SCENES:
+            scene.overworld_changed()
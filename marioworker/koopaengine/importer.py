@@ -0,0 +1,275 @@
+import argparse
+import gzip
+import json
+import sys
+import time
+
+from .catalog import LevelCatalog, CATALOG_PATH, world_of
+from .constants import WORLD_THEMES
+from .enemies import ENEMY_TYPES
+from .levels import LEVEL_TILE_TYPES, Level, split_entities
+
+# Level pack import
+# Packs are read one record at a time, so memory stays at one batch of
+# levels however big the file is. Accepted files (optionally .gz):
+#   JSONL  one record per line
+#   JSON   an array of records, or an object of {level id: rows}
+# A record is {"id", "rows", "entities"?, "world"?} or a bare list of rows.
+# Rows may be strings, lists of single chars, or one string with newlines;
+# entities are [enemy char, col, row], and levels without them have their
+# enemies split out of the rows (levels.split_entities). Each level is
+# checked (size, known tiles and enemies, a world the id can name), made
+# rectangular, and valid ones are added to the catalog in batches; rejects
+# are written to an error report as JSONL.
+BATCH_SIZE = 256
+READ_SIZE = 1 << 16
+CUT_SLACK = 8  # a cut-off literal or escape fails this close to the end
+LEVEL_CHARS = set(LEVEL_TILE_TYPES) | set(ENEMY_TYPES)  # enemies: older levels
+MAX_WIDTH = 100000
+MAX_HEIGHT = 1000
+
+class PackError(ValueError):
+    pass
+
+class JSONStream:
+    # Yields the elements of a top-level JSON array, or (key, value) pairs of
+    # a top-level object, decoding one element at a time from a read buffer
+    def __init__(self, f, read_size=READ_SIZE):
+        self.f = f
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+
+    def fill(self):
+        more = self.f.read(self.read_size)
+        if not more:
+            return False
+        self.buf = self.buf[self.pos:] + more
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # Next non-whitespace char, or "" at the end of the file
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars or not char:
+            raise PackError(f"Expected one of {chars!r}, found {char or 'end of file'!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Only text cut off by the end of the buffer is worth
+                # reading on for; anything else fails here rather than
+                # after pulling in the rest of the file. A cut string is
+                # reported where it starts
+                cut = e.pos >= len(self.buf) - CUT_SLACK or e.msg.startswith("Unterminated string")
+                if not cut or not self.fill():
+                    raise PackError(f"Bad JSON: {e}")
+                continue
+            if end >= len(self.buf) - CUT_SLACK and not isinstance(value, (dict, list, str)):
+                # A number may go on in the next read ("1." then "5")
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        opener = self.expect("[{")
+        closer = "]" if opener == "[" else "}"
+        if self.peek() == closer:
+            self.pos += 1
+            return
+        while True:
+            if opener == "[":
+                yield self.value()
+            else:
+                key = self.value()
+                self.expect(":")
+                yield key, self.value()
+            if self.expect("," + closer) == closer:
+                return
+
+def open_pack(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+def read_records(path):
+    # Yields (record number, record or raw text, error or None)
+    with open_pack(path) as f:
+        name = path[:-3] if path.endswith(".gz") else path
+        if name.endswith((".jsonl", ".ndjson")):
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line), None
+                    except ValueError as e:
+                        yield number, line[:200], f"Bad JSON: {e}"
+        else:
+            for number, item in enumerate(JSONStream(f), 1):
+                yield number, item, None
+
+def normalize(record, number, pack):
+    # -> (level id, rows); raises PackError if the level can't be used
+    if isinstance(record, tuple):  # an entry of a {level id: rows} object
+        level_id, record = record
+        record = {"id": level_id, "rows": record}
+    if isinstance(record, list):
+        record = {"rows": record}
+    if not isinstance(record, dict):
+        raise PackError("A record is an object or a list of rows")
+
+    rows = record.get("rows", record.get("level"))
+    if isinstance(rows, str):
+        rows = rows.split("\n")
+    if not isinstance(rows, list) or not rows:
+        raise PackError("No rows")
+    clean = []
+    for row in rows:
+        if isinstance(row, list) and all(isinstance(c, str) and len(c) == 1 for c in row):
+            row = "".join(row)
+        if not isinstance(row, str):
+            raise PackError("Rows are strings or lists of single chars")
+        clean.append(row.rstrip("\r"))
+    while len(clean) > 1 and clean[-1] == "":
+        clean.pop()  # trailing newline of a text level
+
+    # The first row sets the width, as in TileGrid; the engine never reads
+    # past it, so longer rows are cut and shorter ones padded with sky
+    width = len(clean[0])
+    if not 0 < width <= MAX_WIDTH or len(clean) > MAX_HEIGHT:
+        raise PackError(f"Bad size {width}x{len(clean)}")
+    for y, row in enumerate(clean):
+        if len(row) != width:
+            row = clean[y] = row[:width].ljust(width)
+        unknown = set(row) - LEVEL_CHARS
+        if unknown:
+            raise PackError(f"Unknown tiles {''.join(sorted(unknown))!r} in row {y}")
+
+    level_id = record.get("id")
+    world = record.get("world")
+    if world is not None:
+        try:
+            world = int(world)
+        except (TypeError, ValueError):
+            raise PackError(f"Bad world {world!r}")
+    if level_id is None:
+        level_id = f"{world or 1}-{pack}{number}"
+    level_id = str(level_id)
+    try:
+        id_world = world_of(level_id)
+    except ValueError:
+        # Ids the engine can't read a world from get one prefixed
+        level_id = f"{world or 1}-{level_id}"
+        id_world = world_of(level_id)
+    if id_world not in WORLD_THEMES:
+        raise PackError(f"No world {id_world}")
+    if world is not None and world != id_world:
+        raise PackError(f"Id {level_id} is not in world {world}")
+
+    entities = record.get("entities")
+    if entities is None:
+        return level_id, split_entities(level_id, clean)
+    if not isinstance(entities, list):
+        raise PackError("Entities are a list of [enemy, col, row]")
+    for entity in entities:
+        if (not isinstance(entity, list) or len(entity) != 3 or entity[0] not in ENEMY_TYPES
+                or not all(isinstance(n, int) for n in entity[1:])):
+            raise PackError(f"Bad entity {entity!r}")
+        if not (0 <= entity[1] < width and 0 <= entity[2] < len(clean)):
+            raise PackError(f"Entity {entity!r} is outside the level")
+    return level_id, Level(clean, entities)
+
+def import_pack(path, catalog, pack, errors=None, batch_size=BATCH_SIZE, reachability=True, progress=None):
+    # Returns {"read", "imported", "unchanged", "rejected"}; errors is a
+    # text file that gets one JSON line per rejected record
+    stats = {"read": 0, "imported": 0, "unchanged": 0, "rejected": 0}
+    batch = []
+
+    def flush():
+        added = catalog.add_pack(pack, batch, reachability)
+        stats["imported"] += added
+        stats["unchanged"] += len(batch) - added
+        batch.clear()
+        if progress is not None:
+            progress(stats)
+
+    def reject(number, record, reason):
+        stats["rejected"] += 1
+        if errors is not None:
+            level_id = record.get("id") if isinstance(record, dict) else record[0] if isinstance(record, tuple) else None
+            errors.write(json.dumps({"record": number, "id": level_id, "error": reason}) + "\n")
+
+    try:
+        for number, record, error in read_records(path):
+            stats["read"] += 1
+            if error is not None:
+                reject(number, record, error)
+                continue
+            try:
+                batch.append(normalize(record, number, pack))
+            except PackError as e:
+                reject(number, record, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush()
+    finally:
+        # Whatever was read before a fatal error still goes in
+        if batch:
+            flush()
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import level packs (JSON or JSONL, optionally gzipped) into the catalog")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--db", default=CATALOG_PATH)
+    parser.add_argument("--pack", default=None, help="pack name (default: the file name)")
+    parser.add_argument("--errors", default=None, help="write rejected records here as JSONL")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--no-reachability", action="store_true",
+                        help="skip the solvability check (much faster; solvable is stored as unknown)")
+    args = parser.parse_args(argv)
+
+    catalog = LevelCatalog(args.db)
+    errors = open(args.errors, "w") if args.errors else None
+    started = time.perf_counter()
+
+    def progress(stats):
+        print(f"\r{stats['read']} read, {stats['imported']} imported, {stats['rejected']} rejected",
+              end="", file=sys.stderr, flush=True)
+
+    failed = False
+    try:
+        for path in args.files:
+            pack = args.pack or path.rsplit("/", 1)[-1].split(".")[0]
+            try:
+                stats = import_pack(path, catalog, pack, errors, args.batch, not args.no_reachability, progress)
+            except (OSError, PackError) as e:
+                print(f"\nError importing {path}: {e}", file=sys.stderr)
+                failed = True
+                continue
+            print(f"\r{path}: {stats['read']} read, {stats['imported']} imported, "
+                  f"{stats['unchanged']} unchanged, {stats['rejected']} rejected", file=sys.stderr)
+    finally:
+        if errors is not None:
+            errors.close()
+        catalog.close()
+    print(f"Done in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
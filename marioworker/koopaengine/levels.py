@@ -0,0 +1,227 @@
+import random
+
+from .constants import WORLD_THEMES
+
+# A level is its tile rows plus an entity layer of (enemy char, col, row)
+# spawns; enemy chars are the keys of enemies.ENEMY_TYPES. The rows stay a
+# plain list of strings, so everything that only reads tiles is unchanged.
+# Files, bundles and the catalog store {"rows": [...], "entities": [...]};
+# a bare list of rows is an older level with its enemies among the tiles.
+SURFACES = set("GPT?")  # tiles an enemy can stand on; terrain G sits on B
+
+# Level tiles the editor places (importer.py validates against these too)
+LEVEL_TILE_TYPES = {
+    "G": "Ground",
+    "B": "Block",
+    "P": "Platform",
+    "T": "Pipe",
+    "?": "Question Block",
+    "~": "Water",
+    "L": "Lava",
+    "S": "Player Start",
+    "F": "Flag",
+    " ": "Empty"
+}
+
+class Level(list):
+    def __init__(self, rows=(), entities=()):
+        super().__init__(rows)
+        self.entities = [tuple(entity) for entity in entities]
+
+def split_entities(level_id, rows):
+    # Old levels put enemy letters in the rows, and most of those letters
+    # are tiles too (G ground, B block, P platform, S start, F flag). A
+    # letter that is only an enemy (K, M, W) always counts; the world's own
+    # enemy letter counts where it stands on a surface, except the first S
+    # (the start) and the last F (the flag)
+    from .collision import TILE_SHAPES
+    from .enemies import ENEMY_TYPES
+
+    world_enemy = WORLD_THEMES[int(level_id.split("-")[0])]["enemy"]
+    markers = {}
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row):
+            if char == "S" and "S" not in markers:
+                markers["S"] = (x, y)
+            elif char == "F":
+                markers["F"] = (x, y)
+    tiles, entities = [], []
+    for y, row in enumerate(rows):
+        below = rows[y + 1] if y + 1 < len(rows) else ""
+        chars = list(row)
+        for x, char in enumerate(chars):
+            if char not in ENEMY_TYPES or markers.get(char) == (x, y):
+                continue
+            if ((char not in TILE_SHAPES and char not in "SF")
+                    or (char == world_enemy and x < len(below) and below[x] in SURFACES)):
+                entities.append((char, x, y))
+                chars[x] = " "
+        tiles.append("".join(chars))
+    return Level(tiles, entities)
+
+def as_level(level_id, level_data):
+    if isinstance(level_data, Level):
+        return level_data
+    if isinstance(level_data, dict):
+        return Level(level_data["rows"], level_data.get("entities", ()))
+    return split_entities(level_id, level_data)
+
+def level_json(level):
+    return {"rows": list(level), "entities": [list(entity) for entity in getattr(level, "entities", ())]}
+
+# Generate 32 levels (8 worlds * 4 levels)
+# The same seed always gives the same layouts (netplay peers rely on this)
+def generate_level_data(seed=None):
+    rng = random.Random(seed)
+    levels = {}
+    for world in range(1, 9):
+        for level in range(1, 5):
+            level_id = f"{world}-{level}"
+            theme = WORLD_THEMES[world]
+            
+            # Create a unique level pattern for each level
+            level_data = Level()
+            
+            # Sky
+            for i in range(10):
+                level_data.append(" " * 100)
+                
+            # Platforms
+            for i in range(10, 15):
+                level_data.append(" " * 100)
+                
+            # Ground
+            for i in range(15, 20):
+                if i == 15:
+                    row = "G" * 100
+                else:
+                    row = "B" * 100
+                level_data.append(row)
+            
+            # Add platforms
+            for i in range(5 + level):  # More platforms in later levels
+                platform_y = rng.randint(8, 12)
+                platform_x = rng.randint(10 + i*20, 15 + i*20)
+                length = rng.randint(4, 8)
+                for j in range(length):
+                    level_data[platform_y] = level_data[platform_y][:platform_x+j] + "P" + level_data[platform_y][platform_x+j+1:]
+            
+            # Add pipes
+            for i in range(2 + level//2):  # More pipes in later levels
+                pipe_x = rng.randint(20 + i*30, 25 + i*30)
+                pipe_height = rng.randint(2, 4)
+                for j in range(pipe_height):
+                    level_data[19-j] = level_data[19-j][:pipe_x] + "T" + level_data[19-j][pipe_x+1:]
+                    level_data[19-j] = level_data[19-j][:pipe_x+1] + "T" + level_data[19-j][pipe_x+2:]
+            
+            # Add bricks and question blocks
+            for i in range(8 + level):  # More blocks in later levels
+                block_y = rng.randint(5, 10)
+                block_x = rng.randint(5 + i*10, 8 + i*10)
+                block_type = "?" if rng.random() > 0.5 else "B"
+                level_data[block_y] = level_data[block_y][:block_x] + block_type + level_data[block_y][block_x+1:]
+            
+            # Pools of water or lava set into the ground. They have their own
+            # rng, so the rest of every layout is what it was without them;
+            # lava pools are narrow enough to jump
+            liquid = "~" if theme["water"] is not None else "L" if theme["lava"] is not None else None
+            if liquid is not None:
+                pool_rng = random.Random(f"{seed}:{level_id}:pools")
+                for i in range(1 + level // 2):
+                    pool_x = pool_rng.randint(15 + i*25, 25 + i*25)
+                    for x in range(pool_x, pool_x + pool_rng.randint(2, 4 if liquid == "~" else 2)):
+                        if level_data[15][x] == "G":
+                            level_data[15] = level_data[15][:x] + liquid + level_data[15][x+1:]
+            
+            # Add player start
+            level_data[14] = level_data[14][:5] + "S" + level_data[14][6:]
+            
+            # Add flag at end
+            level_data[14] = level_data[14][:95] + "F" + level_data[14][96:]
+            
+            # Add enemies, to the entity layer; any past the end of the
+            # level are dropped
+            for i in range(5 + level):  # More enemies in later levels
+                enemy_y = 14
+                enemy_x = rng.randint(20 + i*15, 25 + i*15)
+                enemy = (theme["enemy"], enemy_x, enemy_y)
+                if enemy_x < len(level_data[enemy_y]) and enemy not in level_data.entities:
+                    level_data.entities.append(enemy)
+            
+            levels[level_id] = level_data
+    
+    return levels
+
+UNLOADED = object()  # placeholder for a bundle level not read yet
+
+# Level data is generated the first time anything reads it, not at import
+class LazyLevels(dict):
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self.seed = None
+        self.source = None  # a bundle to read levels from instead
+        self.loaded = False
+
+    def set_seed(self, seed):
+        # Only meaningful before the first load
+        if self.loaded:
+            raise RuntimeError("Levels are already generated")
+        self.seed = seed
+
+    def attach(self, source):
+        # Levels come from source.load(level_id), each the first time it's read
+        if self.loaded:
+            raise RuntimeError("Levels are already generated")
+        self.source = source
+
+    def load(self):
+        if not self.loaded:
+            self.loaded = True
+            if self.source is not None:
+                for level_id in self.source.keys():
+                    super().setdefault(level_id, UNLOADED)
+                return self
+            for level_id, level_data in self.factory(self.seed).items():
+                # Keep anything assigned before the first load (e.g. a loaded file)
+                super().setdefault(level_id, level_data)
+        return self
+
+    def __getitem__(self, key):
+        level_data = super(LazyLevels, self.load()).__getitem__(key)
+        if level_data is UNLOADED:
+            level_data = as_level(key, self.source.load(key))
+            super().__setitem__(key, level_data)
+        return level_data
+
+    def __setitem__(self, key, level_data):
+        # Bare rows (an older level file) get their entity layer split out
+        super().__setitem__(key, as_level(key, level_data))
+
+    def __contains__(self, key):
+        return super(LazyLevels, self.load()).__contains__(key)
+
+    def __iter__(self):
+        return super(LazyLevels, self.load()).__iter__()
+
+    def __len__(self):
+        return super(LazyLevels, self.load()).__len__()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return super(LazyLevels, self.load()).keys()
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __repr__(self):
+        if not self.loaded:
+            return "LazyLevels(<not loaded>)"
+        return super().__repr__()
+
+LEVELS = LazyLevels(generate_level_data)
@@ -0,0 +1,149 @@
+import argparse
+import random
+import sys
+import tracemalloc
+
+import pygame
+
+from .constants import WIDTH, HEIGHT, SIM_HZ
+from .entities import Player, BUTTON_LEFT, BUTTON_RIGHT, BUTTON_JUMP
+from .levels import LEVELS
+from .scenes import LevelScene
+from .snapshot import REWIND_SECONDS
+from .state import state
+
+# Memory report
+# Runs a level headless with scripted input and reports what it costs to
+# hold: bytes per entity (object plus its rect), bytes per level (rows,
+# entity layer, collision grid and its drawn copy, baked chunks, rewind
+# buffers) and, under tracemalloc, what each frame allocates. Gameplay should allocate next to
+# nothing per frame: "transient" is the most a frame had live on top of
+# what was there before it, "retained" is what the run kept, and the top
+# sites say where the retained memory came from.
+#
+#   python -m koopaengine.memstats 3-1 --frames 600 --draw
+SCRIPT_BUTTONS = (BUTTON_RIGHT, BUTTON_RIGHT | BUTTON_JUMP, 0, BUTTON_LEFT, BUTTON_RIGHT, BUTTON_JUMP)
+WARMUP = REWIND_SECONDS * SIM_HZ + SIM_HZ  # the rewind ring fills in the first REWIND_SECONDS
+TOP_SITES = 8
+
+class ScriptedPlayer(Player):
+    __slots__ = ("buttons",)
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.buttons = 0
+
+    def update(self, grid, dt, enemies, buttons=None):
+        super().update(grid, dt, enemies, self.buttons if buttons is None else buttons)
+
+    def hurt(self):
+        # Keep running rather than end the game
+        self.invincible = 2
+
+def entity_size(entity):
+    size = sys.getsizeof(entity) + sys.getsizeof(entity.rect)
+    if hasattr(entity, "__dict__"):
+        size += sys.getsizeof(entity.__dict__)
+    return size
+
+def surface_size(surf):
+    return surf.get_height() * surf.get_pitch()
+
+def level_sizes(scene):
+    # (part, bytes) for what the scene holds for its level
+    level = LEVELS[scene.level_id]
+    chunks = scene.map.chunks.values()
+    ring = [buf for buf in scene.history.slots if buf is not None]
+    return [
+        ("rows", sys.getsizeof(level) + sum(sys.getsizeof(row) for row in level)),
+        ("entity layer", sys.getsizeof(level.entities) + sum(sys.getsizeof(e) for e in level.entities)),
+        ("collision grid", sys.getsizeof(scene.map.grid.cells)),
+        ("drawn tiles", sys.getsizeof(scene.map.drawn.cells)),
+        (f"baked chunks ({len(chunks)})", sum(surface_size(s) + sys.getsizeof(a) for s, a in chunks)),
+        (f"rewind ring ({len(ring)})", sys.getsizeof(scene.history.slots) + sum(sys.getsizeof(b) for b in ring)),
+        ("entities", sum(entity_size(e) for e in scene.entities)),
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report entity and level memory and allocations per frame")
+    parser.add_argument("level", nargs="?", default="1-1")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="frames run before measuring")
+    parser.add_argument("--draw", action="store_true", help="draw every frame too")
+    parser.add_argument("--level-seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    LEVELS.set_seed(args.level_seed)
+    state.lives = 3
+    state.mario_size = "small"
+    scene = LevelScene(args.level)
+    player = ScriptedPlayer(scene.player.x, scene.player.y)
+    scene.player = scene.entities[0] = player
+    spawn = (player.x, player.y)
+    screen = pygame.Surface((WIDTH, HEIGHT)) if args.draw else None
+    scene.alpha = 1.0
+    rng = random.Random(args.level_seed)
+    dt = 1 / SIM_HZ
+    frame = 0
+
+    def step():
+        nonlocal frame
+        if frame % 8 == 0:
+            player.buttons = rng.choice(SCRIPT_BUTTONS)
+        scene.update(dt)
+        if player.y > scene.map.height or player.x > scene.map.width - 120:
+            player.respawn(*spawn)  # never fall out or finish the level
+        if screen is not None:
+            scene.draw(screen)
+        frame += 1
+
+    for _ in range(args.warmup):
+        step()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    transient = worst = 0
+    for _ in range(args.frames):
+        tracemalloc.reset_peak()
+        live = tracemalloc.get_traced_memory()[0]
+        step()
+        peak = tracemalloc.get_traced_memory()[1] - live
+        transient += peak
+        worst = max(worst, peak)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # Filtered only now, so compiling the filters isn't counted
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+
+    print("Entities (object + rect):")
+    kinds = {}
+    for entity in scene.entities:
+        name = getattr(getattr(entity, "kind", None), "name", type(entity).__name__)
+        kinds.setdefault(name, []).append(entity_size(entity))
+    for name, sizes in kinds.items():
+        print(f"  {name:<12} {len(sizes):4} x {max(sizes):4} B")
+
+    level = LEVELS[args.level]
+    print(f"Level {args.level} ({len(level[0])}x{len(level)}):")
+    sizes = level_sizes(scene)
+    for part, size in sizes:
+        print(f"  {part:<20} {size:10,} B")
+    print(f"  {'total':<20} {sum(size for part, size in sizes):10,} B")
+
+    frames = max(1, args.frames)
+    retained = sum(stat.size_diff for stat in diff)
+    blocks = sum(stat.count_diff for stat in diff)
+    print(f"{args.frames} frames{' with drawing' if args.draw else ''} after {args.warmup} warmup:")
+    print(f"  transient  {transient / frames:10,.0f} B/frame (worst {worst:,} B)")
+    print(f"  retained   {retained / frames:10,.1f} B/frame ({blocks:+,} blocks over the run)")
+    print("Top allocation sites:")
+    for stat in diff[:TOP_SITES]:
+        if stat.size_diff == 0 and stat.count_diff == 0:
+            break
+        where = stat.traceback[-1]
+        print(f"  {stat.size_diff:+9,} B {stat.count_diff:+6} blocks  {where.filename}:{where.lineno}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+import argparse
+import hashlib
+import random
+import socket
+import struct
+import sys
+import time
+import zlib
+
+import pygame
+from pygame.locals import *
+
+from .assets import get_font
+from .constants import WIDTH, HEIGHT, TILE, SIM_HZ, NES_PALETTE
+from .enemies import update_enemies
+from .entities import Player, BUTTON_LEFT, BUTTON_RIGHT, BUTTON_JUMP, read_buttons, draw_sprite
+from .levels import LEVELS
+from .scenes import LevelScene, TitleScreen, interpolate_view
+from .snapshot import save_level, restore_level, CAMERA_SIZE
+from .state import push
+
+# Two-player races over UDP with input delay + rollback
+#
+# Each peer simulates both players. Local input is scheduled input_delay
+# frames ahead and sent every tick; remote input that hasn't arrived yet is
+# predicted by repeating the last one received. When a real remote input
+# differs from the prediction used, the scene is restored from the snapshot
+# of that frame and re-simulated up to the present. A peer stalls instead of
+# running more than max_rollback frames ahead of what it has confirmed.
+INPUT_DELAY = 2
+MAX_ROLLBACK = 8
+INPUT_RING = 256  # must be larger than any in-flight window
+MAX_PACKET_INPUTS = 64
+DEFAULT_PORT = 7001
+
+HELLO_PACKET = struct.Struct("<c16sBB")  # b"H", level hash, player index, input delay
+INPUT_PACKET = struct.Struct("<ciIB")    # b"I", ack, last frame, count; then count input bytes
+
+class NetplayError(Exception):
+    pass
+
+def level_hash(level_data):
+    digest = hashlib.blake2b(digest_size=16)
+    for row in level_data:
+        digest.update(row.encode())
+        digest.update(b"\n")
+    for char, col, row in level_data.entities:
+        digest.update(f"{char}{col},{row};".encode())
+    return digest.digest()
+
+def parse_address(text, default_port=DEFAULT_PORT):
+    host, _, port = text.rpartition(":")
+    if not host:
+        return text, default_port
+    return host, int(port)
+
+class UdpTransport:
+    def __init__(self, port, peer):
+        self.peer = peer
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("", port))
+        self.sock.setblocking(False)
+        self.buffer = bytearray(2048)
+
+    def send(self, data):
+        try:
+            self.sock.sendto(data, self.peer)
+        except OSError:
+            pass  # peer not up yet; the next tick resends
+
+    def receive(self):
+        while True:
+            try:
+                n, addr = self.sock.recvfrom_into(self.buffer)
+            except (BlockingIOError, ConnectionResetError):
+                return
+            yield memoryview(self.buffer)[:n]
+
+    def close(self):
+        self.sock.close()
+
+class RollbackSession:
+    def __init__(self, scene, transport, local_index, input_delay=INPUT_DELAY, max_rollback=MAX_ROLLBACK):
+        self.scene = scene
+        self.transport = transport
+        self.local_index = local_index
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        self.level_hash = level_hash(LEVELS[scene.level_id])
+
+        self.frame = 0  # next frame to simulate
+        self.local_inputs = bytearray(INPUT_RING)
+        self.remote_inputs = bytearray(INPUT_RING)
+        self.predicted = bytearray(INPUT_RING)
+        # Frames before the input delay have no input on either side
+        self.local_latest = input_delay - 1
+        self.remote_confirmed = input_delay - 1
+        self.peer_ack = -1  # last of our frames the peer has confirmed
+
+        self.snapshots = [None] * (max_rollback + 1)
+        self.buttons = [0, 0]
+        self.packet = bytearray(INPUT_PACKET.size + MAX_PACKET_INPUTS)
+        self.hello = HELLO_PACKET.pack(b"H", self.level_hash, local_index, input_delay)
+        self.peer_ready = False
+        self.peer_heard_us = False
+
+        # Stats
+        self.rollbacks = 0
+        self.resimulated = 0
+        self.stalls = 0
+
+    def tick(self, local_buttons, advance=True):
+        # Returns True if a new frame was simulated
+        rollback_to = self.receive()
+        if rollback_to is not None:
+            self.rollback(rollback_to)
+
+        # Inputs only go out once we've accepted the peer's hello, so an
+        # input packet from the peer means it has accepted ours
+        if not self.peer_heard_us:
+            self.transport.send(self.hello)
+        if not self.peer_ready:
+            return False
+        if not advance:
+            self.send_inputs()
+            return False
+
+        if self.frame - self.remote_confirmed > self.max_rollback:
+            # Too far ahead of the peer; wait for its inputs
+            self.stalls += 1
+            self.send_inputs()
+            return False
+
+        frame = self.frame + self.input_delay
+        self.local_inputs[frame % INPUT_RING] = local_buttons
+        self.local_latest = frame
+        self.send_inputs()
+
+        self.simulate(self.frame)
+        self.frame += 1
+        return True
+
+    def simulate(self, frame):
+        i = frame % len(self.snapshots)
+        self.snapshots[i] = save_level(self.scene, self.snapshots[i])
+
+        if frame <= self.remote_confirmed:
+            remote = self.remote_inputs[frame % INPUT_RING]
+        else:
+            remote = self.remote_inputs[self.remote_confirmed % INPUT_RING]
+        self.predicted[frame % INPUT_RING] = remote
+        self.buttons[self.local_index] = self.local_inputs[frame % INPUT_RING]
+        self.buttons[1 - self.local_index] = remote
+        self.scene.step(self.buttons)
+
+    def rollback(self, frame):
+        self.rollbacks += 1
+        self.resimulated += self.frame - frame
+        restore_level(self.scene, self.snapshots[frame % len(self.snapshots)])
+        for f in range(frame, self.frame):
+            self.simulate(f)
+
+    def receive(self):
+        # Returns the earliest mispredicted frame, if any
+        rollback_to = None
+        for data in self.transport.receive():
+            kind = data[:1]
+            if kind == b"H" and len(data) == HELLO_PACKET.size:
+                _, peer_hash, peer_index, peer_delay = HELLO_PACKET.unpack(data)
+                if peer_hash != self.level_hash:
+                    raise NetplayError("Peer is running a different level layout (check --level and --level-seed)")
+                if peer_index == self.local_index:
+                    raise NetplayError("Both peers chose the same player number")
+                if peer_delay != self.input_delay:
+                    raise NetplayError("Peers must use the same input delay")
+                self.peer_ready = True
+            elif kind == b"I" and len(data) >= INPUT_PACKET.size:
+                self.peer_heard_us = True
+                _, ack, last, count = INPUT_PACKET.unpack_from(data)
+                self.peer_ack = max(self.peer_ack, ack)
+                first = last - count + 1
+                if first > self.remote_confirmed + 1 or last <= self.remote_confirmed:
+                    continue  # gap (resent later) or nothing new
+                for f in range(self.remote_confirmed + 1, last + 1):
+                    b = data[INPUT_PACKET.size + f - first]
+                    self.remote_inputs[f % INPUT_RING] = b
+                    if rollback_to is None and f < self.frame and b != self.predicted[f % INPUT_RING]:
+                        rollback_to = f
+                self.remote_confirmed = last
+        return rollback_to
+
+    def send_inputs(self):
+        last = self.local_latest
+        first = max(self.peer_ack + 1, last - MAX_PACKET_INPUTS + 1, 0)
+        count = last - first + 1
+        if count <= 0:
+            count = 0
+        INPUT_PACKET.pack_into(self.packet, 0, b"I", self.remote_confirmed, last, count)
+        for k in range(count):
+            self.packet[INPUT_PACKET.size + k] = self.local_inputs[(first + k) % INPUT_RING]
+        self.transport.send(memoryview(self.packet)[:INPUT_PACKET.size + count])
+
+    def checksum(self):
+        # Skip the camera (it follows the local player, so differs per peer)
+        return zlib.crc32(save_level(self.scene)[CAMERA_SIZE:])
+
+class RacePlayer(Player):
+    __slots__ = ("index", "start")
+
+    def __init__(self, x, y, index):
+        super().__init__(x, y)
+        self.index = index
+        self.start = (x, y)
+
+    @property
+    def size(self):
+        return "small"
+
+    def hurt(self):
+        # Races have no lives: back to the start
+        self.respawn(*self.start)
+        self.invincible = 2
+
+class VersusScene(LevelScene):
+    def __init__(self, level_id, transport, local_index, input_delay=INPUT_DELAY, max_rollback=MAX_ROLLBACK):
+        super().__init__(level_id)
+        x, y = self.player.x, self.player.y
+        self.players = [RacePlayer(x, y, 0), RacePlayer(x + TILE, y, 1)]
+        self.player = self.players[local_index]
+        self.entities = self.players + self.enemies + self.mushrooms
+        self.winner = None
+        self.session = RollbackSession(self, transport, local_index, input_delay, max_rollback)
+
+    def step(self, buttons):
+        # One deterministic frame; only called by the session
+        dt = 1 / SIM_HZ
+        self.time -= dt
+        self.prev_cam = self.cam
+        self.prev_cam_y = self.cam_y
+        for entity in self.entities:
+            entity.remember_position()
+
+        for player, b in zip(self.players, buttons):
+            player.update(self.map.grid, dt, self.enemies, b)
+        update_enemies(self.enemy_groups, self.map.grid, dt)
+        self.update_mushrooms(dt, self.players)
+
+        self.follow_camera()
+
+        if not self.end_level:
+            for player in self.players:
+                if player.x > self.map.width - 100:
+                    self.end_level = True
+                    self.winner = player.index
+                    self.end_timer = 3
+                    break
+        elif self.end_timer > 0:
+            self.end_timer -= dt
+
+    def handle(self, evts, keys):
+        for e in evts:
+            if e.type == KEYDOWN and e.key == K_ESCAPE:
+                self.session.transport.close()
+                push(TitleScreen())
+
+    def update(self, dt):
+        try:
+            self.session.tick(read_buttons(pygame.key.get_pressed()))
+        except NetplayError as e:
+            print(f"Netplay error: {e}")
+            self.session.transport.close()
+            push(TitleScreen())
+            return
+        if self.end_level and self.end_timer <= 0:
+            self.session.transport.close()
+            push(TitleScreen())
+
+    def render_state(self):
+        other = self.players[1 - self.player.index]
+        message = None
+        if not self.session.peer_ready:
+            message = ("WAITING FOR PLAYER...", 24, NES_PALETTE[39], HEIGHT//2)
+        elif self.end_level:
+            result = "YOU WIN!" if self.winner == self.player.index else f"P{self.winner + 1} WINS"
+            message = (result, 40, NES_PALETTE[33], HEIGHT//2 - 20)
+        return (super().render_state(), other.render_state(),
+                tuple((player.index, player.x, player.y) for player in self.players), message)
+
+    def draw_state(self, s, frame, alpha):
+        level_frame, other, labels, message = frame
+        super().draw_state(s, level_frame, alpha)
+        cam, cam_y = interpolate_view(level_frame[1], alpha)
+        draw_sprite(s, other, cam, alpha, cam_y)
+
+        font = get_font(16)
+        for index, x, y in labels:
+            label = font.render(f"P{index + 1}", True, NES_PALETTE[39])
+            s.blit(label, (int(x - cam) + TILE//2 - label.get_width()//2, int(y - cam_y) - 14))
+
+        if message is not None:
+            text, size, color, y = message
+            text = get_font(size).render(text, True, color)
+            s.blit(text, (WIDTH//2 - text.get_width()//2, y))
+
+def add_arguments(parser):
+    parser.add_argument("--versus", metavar="HOST:PORT",
+                        help="race another player; address of the other peer")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="local UDP port for --versus")
+    parser.add_argument("--player", type=int, choices=(1, 2), default=1, help="which player this peer controls")
+    parser.add_argument("--level", default="1-1", help="level to race on")
+    parser.add_argument("--level-seed", type=int, default=0,
+                        help="seed for generated levels; both peers must match")
+    parser.add_argument("--input-delay", type=int, default=INPUT_DELAY)
+
+def create_scene(args):
+    LEVELS.set_seed(args.level_seed)
+    transport = UdpTransport(args.port, parse_address(args.versus))
+    return VersusScene(args.level, transport, args.player - 1, args.input_delay)
+
+# Headless loopback runner
+# Runs a race with scripted inputs and no window, then prints a checksum of
+# the final confirmed state. Two processes must print the same checksum:
+#   python -m koopaengine.netplay --player 1 --port 7001 --versus 127.0.0.1:7002
+#   python -m koopaengine.netplay --player 2 --port 7002 --versus 127.0.0.1:7001
+SCRIPT_BUTTONS = (BUTTON_RIGHT, BUTTON_RIGHT | BUTTON_JUMP, 0, BUTTON_LEFT, BUTTON_RIGHT, BUTTON_JUMP)
+
+def run_headless(args):
+    scene = create_scene(args)
+    session = scene.session
+    rng = random.Random(args.level_seed * 2 + args.player)
+    buttons = 0
+    tick = 1 / SIM_HZ
+    deadline = time.perf_counter()
+    started = time.perf_counter()
+
+    while session.frame < args.frames:
+        if session.frame % 8 == 0:
+            buttons = rng.choice(SCRIPT_BUTTONS)
+        session.tick(buttons)
+        deadline += tick
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        if time.perf_counter() - started > args.timeout:
+            raise NetplayError("Timed out waiting for the other peer")
+
+    # Wait until every remote input up to the last frame is confirmed, and
+    # keep sending for a moment so the peer gets ours too
+    grace_end = None
+    while True:
+        session.tick(0, advance=False)
+        if session.remote_confirmed >= args.frames - 1:
+            if grace_end is None:
+                grace_end = time.perf_counter() + 0.5
+            elif time.perf_counter() > grace_end:
+                break
+        if time.perf_counter() - started > args.timeout:
+            raise NetplayError("Timed out waiting for the other peer")
+        time.sleep(0.005)
+
+    scene.session.transport.close()
+    print(f"player {args.player} frames {session.frame} rollbacks {session.rollbacks} "
+          f"resimulated {session.resimulated} stalls {session.stalls} checksum {session.checksum():08x}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless rollback race over UDP")
+    add_arguments(parser)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args(argv)
+    if not args.versus:
+        parser.error("--versus HOST:PORT is required")
+    return run_headless(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+import base64
+import itertools
+import zlib
+from collections import OrderedDict
+
+import pygame
+
+from .assets import get_font
+from .constants import NES_PALETTE
+
+# Overworld storage
+# Tile types live in one byte per cell; the few tiles that carry more (a
+# level id, enemies) keep it in a sparse dict keyed by (x, y). A 1000x1000
+# map is a 1 MB bytearray instead of a million dicts, and saves as a
+# compressed blob that loads without touching cells one by one.
+TILE_TYPES = ("empty", "grass", "desert", "water", "level", "castle", "pipe", "path", "start")
+TYPE_CODES = {name: i for i, name in enumerate(TILE_TYPES)}
+CHUNK = 16  # cells per side of a render chunk / revision counter
+FORMAT = 2
+TILE_COLORS = {
+    "empty": NES_PALETTE[27],
+    "grass": NES_PALETTE[20],
+    "desert": NES_PALETTE[21],
+    "water": NES_PALETTE[25],
+    "level": NES_PALETTE[33],
+    "castle": NES_PALETTE[28],
+    "pipe": NES_PALETTE[14],
+    "path": NES_PALETTE[21],
+    "start": NES_PALETTE[39]
+}
+SERIALS = itertools.count()
+
+class Overworld:
+    def __init__(self, width, height):
+        self.serial = next(SERIALS)  # identifies this map in render caches
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)  # TYPE_CODES, row by row
+        self.payloads = {}   # (x, y) -> {"level": ..., "enemies": [...]}
+        self.revisions = {}  # (chunk x, chunk y) -> edit count, for caches
+        self.listeners = []  # called with (x, y) after each edit
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def type_at(self, x, y):
+        return TILE_TYPES[self.cells[y * self.width + x]]
+
+    def level_at(self, x, y):
+        payload = self.payloads.get((x, y))
+        return payload.get("level") if payload else None
+
+    def tile(self, x, y):
+        # The old per-cell dict, built on demand
+        payload = self.payloads.get((x, y), {})
+        return {"type": self.type_at(x, y), "level": payload.get("level"), "enemies": list(payload.get("enemies", []))}
+
+    def touch(self, x, y):
+        key = (x // CHUNK, y // CHUNK)
+        self.revisions[key] = self.revisions.get(key, 0) + 1
+        for listener in self.listeners:
+            listener((x, y))
+
+    def set_type(self, x, y, tile_type):
+        self.cells[y * self.width + x] = TYPE_CODES[tile_type]
+        self.touch(x, y)
+
+    def set_level(self, x, y, level):
+        payload = self.payloads.setdefault((x, y), {})
+        payload["level"] = level
+        if not level and not payload.get("enemies"):
+            del self.payloads[x, y]
+        self.touch(x, y)
+
+    def clear(self, x, y):
+        self.set_type(x, y, "empty")
+        self.payloads.pop((x, y), None)
+
+    def patch(self, other):
+        # Takes other's tiles (same size) through set_type/touch, so caches
+        # and listeners see each changed cell; returns how many changed
+        changed = 0
+        for y in range(self.height):
+            row = slice(y * self.width, (y + 1) * self.width)
+            if self.cells[row] != other.cells[row]:
+                for x in range(self.width):
+                    code = other.cells[y * self.width + x]
+                    if self.cells[y * self.width + x] != code:
+                        self.set_type(x, y, TILE_TYPES[code])
+                        changed += 1
+        for key in set(self.payloads) | set(other.payloads):
+            if self.payloads.get(key) != other.payloads.get(key):
+                if key in other.payloads:
+                    self.payloads[key] = other.payloads[key]
+                else:
+                    del self.payloads[key]
+                self.touch(*key)
+                changed += 1
+        return changed
+
+    def levels(self):
+        # (x, y, level id) for every level tile, top to bottom
+        return sorted((x, y, payload["level"]) for (x, y), payload in self.payloads.items()
+                      if payload.get("level") and self.type_at(x, y) == "level")
+
+    def resized(self, width, height):
+        world = Overworld(width, height)
+        w = min(width, self.width)
+        for y in range(min(height, self.height)):
+            world.cells[y * width:y * width + w] = self.cells[y * self.width:y * self.width + w]
+        world.payloads = {(x, y): dict(p) for (x, y), p in self.payloads.items() if x < width and y < height}
+        return world
+
+    def to_json(self):
+        return {
+            "format": FORMAT,
+            "width": self.width,
+            "height": self.height,
+            "types": list(TILE_TYPES),
+            "cells": base64.b64encode(zlib.compress(bytes(self.cells), 6)).decode("ascii"),
+            "tiles": {f"{x},{y}": payload for (x, y), payload in self.payloads.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if isinstance(data, list):
+            return cls.from_rows(data)
+        world = cls(data["width"], data["height"])
+        cells = zlib.decompress(base64.b64decode(data["cells"]))
+        if len(cells) != len(world.cells):
+            raise ValueError("Overworld cells don't match its size")
+        # Files may list the types in another order
+        table = bytearray(range(256))
+        for code, name in enumerate(data["types"]):
+            table[code] = TYPE_CODES[name]
+        world.cells[:] = cells.translate(table)
+        for key, payload in data.get("tiles", {}).items():
+            x, y = map(int, key.split(","))
+            world.payloads[x, y] = payload
+        return world
+
+    @classmethod
+    def from_rows(cls, rows):
+        # The original format: rows of {"type", "level", "enemies"} dicts
+        world = cls(len(rows[0]) if rows else 0, len(rows))
+        for y, row in enumerate(rows):
+            for x, tile in enumerate(row):
+                world.cells[y * world.width + x] = TYPE_CODES[tile["type"]]
+                if tile.get("level") or tile.get("enemies"):
+                    world.payloads[x, y] = {"level": tile.get("level"), "enemies": tile.get("enemies", [])}
+        return world
+
+# Chunked rendering
+# Cells are drawn CHUNK x CHUNK at a time into cached surfaces; only chunks
+# in view are drawn, and an edited chunk is re-baked when its revision moves.
+CHUNK_CACHE_SIZE = 64
+
+class OverworldRenderer:
+    def __init__(self, tile_colors, tile_size):
+        self.tile_colors = tile_colors
+        self.tile_size = tile_size
+        self.chunks = OrderedDict()  # (world serial, cx, cy) -> (revision, surface)
+
+    def bake(self, world, cx, cy):
+        ts = self.tile_size
+        surf = pygame.Surface((CHUNK * ts, CHUNK * ts))
+        surf.fill(self.tile_colors["empty"])
+        font = get_font(12)
+        for y in range(cy * CHUNK, min(world.height, (cy + 1) * CHUNK)):
+            row = y * world.width
+            for x in range(cx * CHUNK, min(world.width, (cx + 1) * CHUNK)):
+                rect = ((x - cx * CHUNK) * ts, (y - cy * CHUNK) * ts, ts, ts)
+                tile_type = TILE_TYPES[world.cells[row + x]]
+                pygame.draw.rect(surf, self.tile_colors[tile_type], rect)
+                pygame.draw.rect(surf, NES_PALETTE[0], rect, 1)
+
+                # Draw level indicator
+                level = world.level_at(x, y) if tile_type == "level" else None
+                if level:
+                    surf.blit(font.render(level, True, NES_PALETTE[0]), (rect[0] + 2, rect[1] + 2))
+        return surf
+
+    def draw(self, surf, world, cam_x, cam_y):
+        span = CHUNK * self.tile_size
+        view_w, view_h = surf.get_size()
+        for cy in range(max(0, cam_y // span), (min(world.height * self.tile_size, cam_y + view_h) - 1) // span + 1):
+            for cx in range(max(0, cam_x // span), (min(world.width * self.tile_size, cam_x + view_w) - 1) // span + 1):
+                key = (world.serial, cx, cy)
+                revision = world.revisions.get((cx, cy), 0)
+                cached = self.chunks.get(key)
+                if cached is None or cached[0] != revision:
+                    cached = (revision, self.bake(world, cx, cy))
+                    self.chunks[key] = cached
+                    if len(self.chunks) > CHUNK_CACHE_SIZE:
+                        self.chunks.popitem(last=False)
+                else:
+                    self.chunks.move_to_end(key)
+                surf.blit(cached[1], (cx * span - cam_x, cy * span - cam_y))
@@ -0,0 +1,112 @@
+import functools
+import hashlib
+import io
+import os
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:  # surfaces are quantized pixel by pixel without NumPy
+    np = None
+
+from .constants import NES_PALETTE
+
+# Nearest NES colour lookup
+# Colours are bucketed into a 32x32x32 RGB cube (5 bits per channel); every
+# cell stores the index of the palette entry closest to the cell centre.
+LUT_BITS = 5
+LUT_SIZE = 1 << LUT_BITS
+LUT_SHIFT = 8 - LUT_BITS
+QUANT_CACHE_DIR = os.path.join("cache", "quantized")
+
+def palette_key():
+    return hashlib.blake2b(repr(NES_PALETTE).encode(), digest_size=8).hexdigest()
+
+@functools.lru_cache(maxsize=4096)
+def palette_index(color):
+    r, g, b = (int(c) for c in color[:3])
+    best = 0
+    best_dist = None
+    for i, (pr, pg, pb) in enumerate(NES_PALETTE):
+        dist = (r - pr) ** 2 + (g - pg) ** 2 + (b - pb) ** 2
+        if best_dist is None or dist < best_dist:
+            best = i
+            best_dist = dist
+    return best
+
+def palette_nearest(color):
+    return NES_PALETTE[palette_index(tuple(color[:3]))]
+
+N = palette_nearest
+
+@functools.lru_cache(maxsize=1)
+def palette_array():
+    return np.array(NES_PALETTE, dtype=np.uint8)
+
+@functools.lru_cache(maxsize=1)
+def palette_lut():
+    # Built once on first use: (32, 32, 32) array of palette indices
+    centers = (np.arange(LUT_SIZE, dtype=np.int32) << LUT_SHIFT) + (1 << (LUT_SHIFT - 1))
+    r, g, b = np.meshgrid(centers, centers, centers, indexing="ij")
+    cube = np.stack((r, g, b), axis=-1).reshape(-1, 1, 3)
+    pal = palette_array().astype(np.int32).reshape(1, -1, 3)
+    dist = ((cube - pal) ** 2).sum(axis=-1)
+    # argmin keeps the first of equal entries, same as palette_index
+    return dist.argmin(axis=1).astype(np.uint8).reshape(LUT_SIZE, LUT_SIZE, LUT_SIZE)
+
+def as_rgb_surface(surf):
+    if surf.get_bitsize() in (24, 32):
+        return surf.copy()
+    out = pygame.Surface(surf.get_size(), 0, 32)
+    out.blit(surf, (0, 0))
+    return out
+
+def cube_cells(px):
+    # Flat LUT cell number (r5 << 10 | g5 << 5 | b5) for a (w, h, 3) array
+    cells = (px[..., 0] >> LUT_SHIFT).astype(np.uint16) << (2 * LUT_BITS)
+    cells |= (px[..., 1] >> LUT_SHIFT).astype(np.uint16) << LUT_BITS
+    cells |= px[..., 2] >> LUT_SHIFT
+    return cells
+
+def quantize_surface(surf):
+    out = as_rgb_surface(surf)
+    if np is None:
+        pixels = pygame.PixelArray(out)
+        mapped = {}
+        for x in range(out.get_width()):
+            for y in range(out.get_height()):
+                raw = pixels[x, y]
+                if raw not in mapped:
+                    mapped[raw] = out.map_rgb(palette_nearest(out.unmap_rgb(raw)))
+                pixels[x, y] = mapped[raw]
+        pixels.close()
+        return out
+
+    px = pygame.surfarray.pixels3d(out)
+    px[...] = palette_array()[palette_lut().ravel()[cube_cells(px)]]
+    del px  # unlock the surface
+    return out
+
+def load_quantized(path, cache_dir=QUANT_CACHE_DIR):
+    # Quantized images are cached on disk keyed by source bytes and palette
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.blake2b(data, digest_size=16)
+    digest.update(palette_key().encode())
+    cached = os.path.join(cache_dir, digest.hexdigest() + ".png")
+
+    if os.path.exists(cached):
+        try:
+            return pygame.image.load(cached)
+        except Exception as e:
+            print(f"Error loading quantized cache {cached}: {e}")
+
+    image = pygame.image.load(io.BytesIO(data), os.path.basename(path))
+    quantized = quantize_surface(image)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        pygame.image.save(quantized, cached)
+    except Exception as e:
+        print(f"Error saving quantized cache {cached}: {e}")
+    return quantized
@@ -0,0 +1,208 @@
+import heapq
+import re
+
+from .overworld import TYPE_CODES
+
+# Overworld travel graph
+# Walkable tiles collapse into a graph: nodes are the tiles where something
+# happens or the way splits (levels, castles, pipes, the start, and path
+# junctions or dead ends); edges are the runs of plain path between them,
+# kept as the list of cells walked. Routes between nodes come from A* over
+# that graph and are cached until the graph changes.
+#
+# An edit only changes the tile and its neighbours' degree, so the graph is
+# patched locally: edges through those cells are dropped and re-traced from
+# their end nodes. Edits are queued and applied on the next query, so an
+# editor stroke costs one patch however many tiles it paints.
+WALKABLE = ("path", "level", "castle", "pipe", "start")
+STOPS = ("level", "castle", "pipe", "start")
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+class Edge:
+    def __init__(self, cells):
+        self.cells = cells  # node, corridor..., node
+        self.a = cells[0]
+        self.b = cells[-1]
+        self.cost = len(cells) - 1
+
+    def walk_from(self, node):
+        return self.cells if node == self.a else self.cells[::-1]
+
+class PathGraph:
+    def __init__(self, world):
+        self.world = world
+        self.walkable = bytes(1 if name in WALKABLE else 0 for name in sorted(TYPE_CODES, key=TYPE_CODES.get))
+        self.stops = {TYPE_CODES[name] for name in STOPS}
+        self.nodes = {}      # cell -> [Edge]
+        self.corridor = {}   # cell -> the Edge running through it
+        self.routes = {}     # (from node, to node) -> cells, or None
+        self.dirty = set()
+        self.build()
+        self.listener = self.dirty.add
+        world.listeners.append(self.listener)
+
+    def close(self):
+        # Stop following the world's edits
+        if self.listener in self.world.listeners:
+            self.world.listeners.remove(self.listener)
+
+    def is_walkable(self, x, y):
+        world = self.world
+        return 0 <= x < world.width and 0 <= y < world.height and self.walkable[world.cells[y * world.width + x]]
+
+    def degree(self, x, y):
+        return sum(self.is_walkable(x + dx, y + dy) for dx, dy in DIRECTIONS)
+
+    def is_node(self, x, y):
+        if not self.is_walkable(x, y):
+            return False
+        return self.world.cells[y * self.world.width + x] in self.stops or self.degree(x, y) != 2
+
+    def build(self):
+        self.nodes.clear()
+        self.corridor.clear()
+        self.routes.clear()
+        # Scan the byte grid for walkable tiles without a Python loop per cell
+        width = self.world.width
+        pattern = re.compile(b"[" + b"".join(re.escape(bytes([code])) for code in range(len(self.walkable))
+                                             if self.walkable[code]) + b"]")
+        for match in pattern.finditer(self.world.cells):
+            x, y = match.start() % width, match.start() // width
+            if self.is_node(x, y):
+                self.nodes[x, y] = []
+        for node in list(self.nodes):
+            self.trace_all(node)
+
+    def trace_all(self, node):
+        # Follow every way out of node that isn't already an edge
+        x, y = node
+        taken = {edge.cells[1] for edge in self.nodes[node] if edge.a == node}
+        taken.update(edge.cells[-2] for edge in self.nodes[node] if edge.b == node)
+        for dx, dy in DIRECTIONS:
+            step = (x + dx, y + dy)
+            if step not in taken and self.is_walkable(*step):
+                edge = self.trace(node, step)
+                if edge is not None:
+                    self.add_edge(edge)
+
+    def trace(self, node, step):
+        cells = [node, step]
+        prev, cell = node, step
+        while cell not in self.nodes:
+            if cell in self.corridor:
+                return None  # already part of an edge
+            x, y = cell
+            nxt = next((c for c in ((x + dx, y + dy) for dx, dy in DIRECTIONS)
+                        if c != prev and self.is_walkable(*c)), None)
+            if nxt is None:
+                return None
+            prev, cell = cell, nxt
+            cells.append(cell)
+        return Edge(tuple(cells))
+
+    def add_edge(self, edge):
+        self.nodes[edge.a].append(edge)
+        if edge.b != edge.a:
+            self.nodes[edge.b].append(edge)
+        for cell in edge.cells[1:-1]:
+            self.corridor[cell] = edge
+
+    def remove_edge(self, edge):
+        for end in (edge.a, edge.b):
+            if end in self.nodes and edge in self.nodes[end]:
+                self.nodes[end].remove(edge)
+        for cell in edge.cells[1:-1]:
+            if self.corridor.get(cell) is edge:
+                del self.corridor[cell]
+
+    def update(self):
+        if not self.dirty:
+            return
+        affected = set()
+        for x, y in self.dirty:
+            affected.add((x, y))
+            affected.update((x + dx, y + dy) for dx, dy in DIRECTIONS)
+        self.dirty.clear()
+
+        # Drop everything running through the affected cells
+        retrace = set()
+        for cell in affected:
+            edges = list(self.nodes.pop(cell, ()))
+            if cell in self.corridor:
+                edges.append(self.corridor[cell])
+            for edge in edges:
+                self.remove_edge(edge)
+                retrace.update((edge.a, edge.b))
+
+        # Work out which affected cells are nodes now, then re-trace
+        for cell in affected:
+            if self.is_node(*cell):
+                self.nodes[cell] = []
+                retrace.add(cell)
+        for node in retrace:
+            if node in self.nodes:
+                self.trace_all(node)
+        self.routes.clear()
+
+    def step(self, node, direction):
+        # The edge leaving node in direction, walked from node, or None
+        self.update()
+        x, y = node
+        first = (x + direction[0], y + direction[1])
+        for edge in self.nodes.get(node, ()):
+            if edge.a == node and edge.cells[1] == first:
+                return edge.cells
+            if edge.b == node and edge.cells[-2] == first:
+                return edge.cells[::-1]
+        return None
+
+    def route(self, start, goal):
+        # Cells to walk from start to goal (both nodes), or None
+        self.update()
+        key = (start, goal)
+        if key not in self.routes:
+            self.routes[key] = self.astar(start, goal)
+        return self.routes[key]
+
+    def astar(self, start, goal):
+        if start not in self.nodes or goal not in self.nodes:
+            return None
+        gx, gy = goal
+        frontier = [(0, 0, start)]
+        best = {start: 0}
+        came = {start: None}
+        while frontier:
+            f, g, node = heapq.heappop(frontier)
+            if node == goal:
+                break
+            if g > best[node]:
+                continue
+            for edge in self.nodes[node]:
+                nxt = edge.walk_from(node)[-1]
+                cost = g + edge.cost
+                if cost < best.get(nxt, cost + 1):
+                    best[nxt] = cost
+                    came[nxt] = (node, edge)
+                    heapq.heappush(frontier, (cost + abs(nxt[0] - gx) + abs(nxt[1] - gy), cost, nxt))
+        if goal not in came:
+            return None
+
+        cells = [goal]
+        node = goal
+        while came[node] is not None:
+            prev, edge = came[node]
+            cells.extend(edge.walk_from(node)[1:])
+            node = prev
+        cells.reverse()
+        return cells
+
+_graph = None
+
+def graph_for(world):
+    # One graph for the overworld in use, patched as it is edited
+    global _graph
+    if _graph is None or _graph.world is not world:
+        if _graph is not None:
+            _graph.close()
+        _graph = PathGraph(world)
+    return _graph
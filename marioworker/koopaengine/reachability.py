@@ -0,0 +1,373 @@
+import argparse
+import functools
+import hashlib
+import math
+import sys
+import time
+from collections import OrderedDict, deque
+
+from .collision import TILE_SHAPES
+from .constants import TILE
+
+# Level reachability
+# Answers "can this level be finished?" without running the game. The
+# player's movement is boiled down to arc templates: the same physics as
+# Entity.update (gravity 0.5 per step, jump_power -5, move_speed 2) played
+# out from a standing position and recorded as the tile cells the 16x16
+# body covers each step. A jump starts either tile-aligned or from the
+# ledge edge, the last step at which a player walking that way is still
+# standing on the tile; the extra distance is what clears a three-tile gap.
+# Templates depend only on the physics, so they are built once and reused
+# for every level and every tile.
+#
+# A level is a graph of standing positions (col, row): the body cell is
+# empty and the tile below is solid. Edges are the templates that land
+# somewhere without the body hitting a tile on the way. Arcs that bump a
+# wall or ceiling are simply dropped rather than slid along; the delayed
+# and short-steer variants cover the same moves, so the answer errs on the
+# side of "unreachable".
+#
+# The edges out of a position only depend on the tiles within the templates'
+# reach, so they are memoized by that neighbourhood: after an editor stroke
+# only the positions near the changed tiles are worked out again.
+GRAVITY = 0.5
+JUMP_POWER = -5
+MOVE_SPEED = 2
+BODY = TILE
+MAX_FALL_STEPS = 120
+AIR_DELAYS = range(0, 11)        # steps before steering after take-off
+STEER_STEPS = (4, 8, 12, 16)     # steer for this many steps, then let go
+
+LEDGE_EDGE = TILE - MOVE_SPEED   # x offset of the last step still on the tile
+
+ROW_BIAS = 4                     # templates reach at most this many rows up
+
+REPORT_CACHE_SIZE = 64
+EDGE_CACHE_SIZE = 20000
+
+def body_cells(x, y):
+    col0, col1 = int(x // TILE), int((x + BODY - 1e-6) // TILE)
+    row0, row1 = int(y // TILE), int((y + BODY - 1e-6) // TILE)
+    return tuple((c, r) for r in range(row0, row1 + 1) for c in range(col0, col1 + 1))
+
+def trace_arc(vy, x0, steer, ceiling=None):
+    # steer(step) -> horizontal speed. Returns (requires, steps). Each step
+    # is (cells, floors): the body cells at the end of the step, and for
+    # each tile top the feet passed while falling, (floor row, cols to
+    # stand on, best first). With a ceiling the head bumps at that height
+    # like sweep_y does, and `requires` lists the cells, one of which must
+    # be solid for the bump to happen.
+    x, y = x0, 0.0
+    requires = ()
+    steps = [(body_cells(x, y), ())]
+    for step in range(MAX_FALL_STEPS):
+        vy += GRAVITY
+        bottom = y + BODY
+        x += steer(step)
+        y += vy
+        if ceiling is not None and y < ceiling:
+            y, vy = ceiling, 0.0
+            if not requires:
+                row = int(ceiling // TILE) - 1
+                requires = tuple((c, row) for c, r in body_cells(x, y) if r == row + 1)
+        floors = []
+        if vy > 0:
+            centre = int((x + BODY / 2) // TILE)
+            cols = tuple(sorted({int(x // TILE), int((x + BODY - 1e-6) // TILE)}, key=lambda c: c != centre))
+            floor = math.ceil(bottom / TILE)
+            while floor * TILE <= y + BODY:
+                floors.append((floor, cols))
+                floor += 1
+        steps.append((body_cells(x, y), tuple(floors)))
+    return requires, tuple(steps)
+
+@functools.lru_cache(maxsize=None)
+def arc_templates():
+    # (take-off x, steer): every jump from tile-aligned, and the ones
+    # steering one way from that side's ledge edge too
+    jumps = [(0.0, lambda step: 0)]
+    for speed in (-MOVE_SPEED, MOVE_SPEED):
+        steers = []
+        # Jumps steering after a delay, or steering briefly and letting go
+        for delay in AIR_DELAYS:
+            steers.append(lambda step, d=delay, s=speed: s if step >= d else 0)
+        for steer in STEER_STEPS:
+            steers.append(lambda step, n=steer, s=speed: s if step < n else 0)
+        for x0 in (0.0, math.copysign(LEDGE_EDGE, speed)):
+            jumps.extend((x0, steer) for steer in steers)
+
+    templates = []
+    for x0, steer in jumps:
+        templates.append(trace_arc(JUMP_POWER, x0, steer))
+        # Head bumping the tile two rows up; one row up means no jump at all
+        templates.append(trace_arc(JUMP_POWER, x0, steer, ceiling=-TILE))
+    for direction in (-1, 1):
+        # Walking one tile over; lands at once on flat ground, otherwise
+        # falls off the edge still holding the direction or letting go
+        templates.append(trace_arc(0.0, direction * TILE, lambda step, s=direction * MOVE_SPEED: s))
+        templates.append(trace_arc(0.0, direction * TILE, lambda step: 0))
+    return tuple(dict.fromkeys(templates))  # drop duplicate arcs
+
+@functools.lru_cache(maxsize=None)
+def template_reach():
+    # How far (in tiles) any template can look from its start column
+    reach = 0
+    for requires, steps in arc_templates():
+        for cells, floors in steps:
+            for c, r in cells:
+                reach = max(reach, abs(c))
+    return reach + 1
+
+@functools.lru_cache(maxsize=8)
+def compiled_templates(stride):
+    # Templates as bit masks over a window of columns around the start, each
+    # column `stride` bits with bit row + ROW_BIAS set per cell (see
+    # analyze()), so testing a step against the level is a single AND
+    reach = template_reach()
+
+    def mask(cells):
+        bits = 0
+        for c, r in cells:
+            bits |= 1 << ((c + reach) * stride + r + ROW_BIAS)
+        return bits
+
+    compiled = []
+    for requires, steps in arc_templates():
+        out = []
+        for cells, floors in steps:
+            out.append((mask(cells),
+                        tuple((mask([cell for cell in cells if cell[1] < floor]),
+                               tuple((c, mask([(c, floor)])) for c in cols), floor)
+                              for floor, cols in floors),
+                        min(r for c, r in cells)))
+        compiled.append((mask(requires), tuple(out)))
+    return tuple(compiled)
+
+class LevelReport:
+    def __init__(self, start, goals, edges, elapsed):
+        self.start = start
+        self.goals = goals
+        self.elapsed = elapsed
+
+        # Forward BFS from the start, keeping parents for the route
+        parents = {start: None} if start is not None else {}
+        queue = deque(parents)
+        while queue:
+            node = queue.popleft()
+            for nxt in edges.get(node, ()):
+                if nxt not in parents:
+                    parents[nxt] = node
+                    queue.append(nxt)
+        self.reachable = frozenset(parents)
+
+        self.goal = None
+        self.route = []
+        reached_goals = [node for node in parents if node in goals]
+        if reached_goals:
+            # BFS order: the first goal found is the fewest moves away
+            self.goal = min(reached_goals, key=lambda node: self._depth(parents, node))
+            node = self.goal
+            while node is not None:
+                self.route.append(node)
+                node = parents[node]
+            self.route.reverse()
+
+        # Dead ends: reachable, but the flag can't be reached from there
+        incoming = {}
+        for node in self.reachable:
+            for nxt in edges.get(node, ()):
+                incoming.setdefault(nxt, []).append(node)
+        finishers = set(reached_goals)
+        queue = deque(finishers)
+        while queue:
+            node = queue.popleft()
+            for prev in incoming.get(node, ()):
+                if prev not in finishers:
+                    finishers.add(prev)
+                    queue.append(prev)
+        self.dead_ends = frozenset(self.reachable - finishers) if goals else frozenset()
+
+    def _depth(self, parents, node):
+        depth = 0
+        while parents[node] is not None:
+            node = parents[node]
+            depth += 1
+        return depth
+
+    @property
+    def solvable(self):
+        return self.goal is not None
+
+    def summary(self):
+        if self.start is None:
+            return "No start position"
+        if not self.goals:
+            return "No flag"
+        if not self.solvable:
+            return f"Flag unreachable ({len(self.reachable)} spots reachable)"
+        return f"Solvable in {len(self.route) - 1} moves, {len(self.dead_ends)} dead-end spots"
+
+class ReachabilityCache:
+    def __init__(self, max_size=REPORT_CACHE_SIZE, max_edges=EDGE_CACHE_SIZE):
+        self.max_size = max_size
+        self.max_edges = max_edges
+        self.reports = OrderedDict()  # level content hash -> LevelReport
+        self.edges = OrderedDict()    # neighbourhood -> relative landings
+
+    def content_key(self, level_data):
+        digest = hashlib.blake2b(digest_size=16)
+        for row in level_data:
+            digest.update(b"\n")
+            digest.update(row.encode())
+        return digest.hexdigest()
+
+    def analyze(self, level_data):
+        key = self.content_key(level_data)
+        report = self.reports.get(key)
+        if report is not None:
+            self.reports.move_to_end(key)
+            return report
+
+        started = time.perf_counter()
+        rows = list(level_data)
+        height = len(rows)
+        width = len(rows[0]) if rows else 0  # same bounds as TileGrid
+        solid = [[c < len(row) and row[c] in TILE_SHAPES for c in range(width)] for row in rows]
+
+        def is_solid(col, row):
+            return 0 <= row < height and 0 <= col < width and solid[row][col]
+
+        def standable(col, row):
+            return 0 <= col < width and 0 <= row < height and not solid[row][col] and is_solid(col, row + 1)
+
+        # The whole level as one int, column by column, `stride` bits per
+        # column with bit row + ROW_BIAS set for solid tiles. Shifting it
+        # gives the window a template is tested against.
+        reach = template_reach()
+        stride = height + ROW_BIAS + 1
+        level_bits = 0
+        for r in range(height):
+            for c in range(width):
+                if solid[r][c]:
+                    level_bits |= 1 << ((c + reach) * stride + r + ROW_BIAS)
+
+        start = None
+        goals = set()
+        for r, row in enumerate(rows):
+            for c, char in enumerate(row[:width]):
+                if char == "S" and start is None:
+                    start = self.drop(c, r, height, is_solid)
+                elif char == "F":
+                    goals.add((c, r))
+
+        edges = {}
+        for r in range(height):
+            for c in range(width):
+                if standable(c, r):
+                    lo, hi = max(0, c - reach), min(width, c + reach + 1)
+                    hood = (r, c - lo, hi - lo, tuple(row[lo:hi] for row in rows))
+                    landings = self.edges.get(hood)
+                    if landings is None:
+                        landings = self.landings(level_bits >> (c * stride), stride, r, height)
+                        self.edges[hood] = landings
+                        if len(self.edges) > self.max_edges:
+                            self.edges.popitem(last=False)
+                    else:
+                        self.edges.move_to_end(hood)
+                    edges[(c, r)] = [(c + dc, r + dr) for dc, dr in landings]
+
+        report = LevelReport(start, goals, edges, time.perf_counter() - started)
+        self.reports[key] = report
+        if len(self.reports) > self.max_size:
+            self.reports.popitem(last=False)
+        return report
+
+    def drop(self, col, row, height, is_solid):
+        # Where something placed at (col, row) comes to rest
+        while row < height:
+            if is_solid(col, row + 1):
+                return (col, row)
+            row += 1
+        return None
+
+    def landings(self, window, stride, row, height):
+        # window: the level bits shifted so the start column lines up with
+        # the templates; see analyze()
+        found = set()
+        for requires, steps in compiled_templates(stride):
+            if requires and not window & requires << row:
+                continue
+            for bits, floors, top in steps:
+                landed = blocked = False
+                for above, cols, floor in floors:
+                    # The body has to get past everything above this floor first
+                    if window & above << row:
+                        blocked = True
+                        break
+                    stand = next((c for c, floor_bits in cols if window & floor_bits << row), None)
+                    if stand is not None:
+                        if (stand, floor) != (0, 1):  # not back where it started
+                            found.add((stand, floor - 1))
+                        landed = True
+                        break
+                if landed or blocked or window & bits << row:
+                    break
+                if row + top >= height:
+                    break  # fell out of the level
+        return tuple(sorted(found))
+
+    def clear(self):
+        self.reports.clear()
+        self.edges.clear()
+
+ANALYSIS = ReachabilityCache()
+
+def gap_level(gap):
+    # Flat ground with a pit `gap` tiles wide between the start and the flag
+    return ["                    ",
+            "                    ",
+            "                    ",
+            "  S            F    ",
+            "GGGGGG" + " " * gap + "G" * (14 - gap)]
+
+# (name, level rows, solvable) pinned down against Player.update, which
+# clears three tiles jumping from the last steps on the ledge but not four
+SELF_CHECKS = (
+    ("2-tile gap", gap_level(2), True),
+    ("3-tile gap", gap_level(3), True),
+    ("4-tile gap", gap_level(4), False),
+)
+
+def self_check():
+    failures = 0
+    for name, rows, solvable in SELF_CHECKS:
+        report = ReachabilityCache().analyze(rows)
+        ok = report.solvable == solvable
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':>5}  {name:<12} {report.summary()}")
+    return failures
+
+def main(argv=None):
+    from .levels import LEVELS
+
+    parser = argparse.ArgumentParser(description="Check which levels can be finished")
+    parser.add_argument("levels", nargs="*", help="level ids (default: all)")
+    parser.add_argument("--level-seed", type=int, default=None)
+    parser.add_argument("--self-check", action="store_true", help="check the analysis against known levels")
+    args = parser.parse_args(argv)
+
+    if args.self_check:
+        return 1 if self_check() else 0
+
+    if args.level_seed is not None:
+        LEVELS.set_seed(args.level_seed)
+    level_ids = args.levels or list(LEVELS.keys())
+    failures = 0
+    for level_id in level_ids:
+        report = ANALYSIS.analyze(LEVELS[level_id])
+        failures += not report.solvable
+        print(f"{level_id:>5}  {report.summary():<45} {report.elapsed * 1000:6.1f} ms")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
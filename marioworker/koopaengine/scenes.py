@@ -0,0 +1,755 @@
+import math
+import random
+
+import pygame
+from pygame.locals import *
+
+from . import editor
+from .assets import get_font
+from .catalog import get_catalog
+from .constants import WIDTH, HEIGHT, TILE, SIM_HZ, NES_PALETTE, WORLD_THEMES
+from .blocks import BlockTable, holds_mushroom
+from .enemies import spawn_enemy, group_by_kind, update_enemies
+from .entities import Player, Mushroom, draw_sprite
+from .levels import LEVELS
+from .overworld import OverworldRenderer, TILE_COLORS
+from .pathgraph import graph_for
+from .snapshot import SnapshotRing, save_level, restore_level, REWIND_SECONDS
+from .state import state, push, pop, Scene, SCENES
+from .streaming import ChunkStream, StreamingTileMap, CHUNK_COLS, GROUND_ROW
+from .thumbnails import THUMBNAILS
+from .tilemap import TileMap
+from .widgets import Hud, Label
+
+# Scenes
+class TitleScreen(Scene):
+    def __init__(self):
+        self.timer = 0
+        self.animation_frame = 0
+        self.logo_y = -50
+        self.logo_target_y = HEIGHT // 2 - 60
+        
+    def handle(self, events, keys):
+        for e in events:
+            if e.type == KEYDOWN and e.key == K_RETURN:
+                push(FileSelect())
+            elif e.type == KEYDOWN and e.key == K_e:
+                state.editor_mode = True
+                push(editor.OverworldEditor())
+            elif e.type == KEYDOWN and e.key == K_r:
+                push(EndlessScene(state.world))
+                
+    def update(self, dt):
+        self.timer += dt
+        if self.timer > 0.1:
+            self.timer = 0
+            self.animation_frame = (self.animation_frame + 1) % 4
+            
+        # Animate logo coming down
+        if self.logo_y < self.logo_target_y:
+            self.logo_y += 3
+            
+    def draw(self, surf):
+        # Background
+        surf.fill(NES_PALETTE[27])
+        
+        # Koopa Engine Box
+        box_width, box_height = 240, 100
+        box_x = (WIDTH - box_width) // 2
+        box_y = self.logo_y
+        
+        # Draw box with border
+        pygame.draw.rect(surf, NES_PALETTE[0], (box_x-4, box_y-4, box_width+8, box_height+8))
+        pygame.draw.rect(surf, NES_PALETTE[33], (box_x, box_y, box_width, box_height))
+        
+        # Title inside box
+        title_font = get_font(32)
+        title = title_font.render("KOOPA ENGINE 1.0A", True, NES_PALETTE[39])
+        surf.blit(title, (box_x + (box_width - title.get_width()) // 2, box_y + 15))
+        
+        subtitle_font = get_font(16)
+        subtitle = subtitle_font.render("8 Worlds Edition", True, NES_PALETTE[21])
+        surf.blit(subtitle, (box_x + (box_width - subtitle.get_width()) // 2, box_y + 50))
+        
+        # Copyright
+        copyright_font = get_font(14)
+        copyright = copyright_font.render("[C] Team Flames 20XX [1985] - Nintendo", True, NES_PALETTE[0])
+        surf.blit(copyright, (WIDTH//2 - copyright.get_width()//2, box_y + box_height + 20))
+        
+        # Mario and enemies
+        mario_x = WIDTH//2 - 100
+        mario_y = box_y + box_height + 50
+        pygame.draw.rect(surf, NES_PALETTE[33], (mario_x+4, mario_y+8, 8, 16))
+        pygame.draw.rect(surf, NES_PALETTE[39], (mario_x+4, mario_y+4, 8, 4))
+        pygame.draw.rect(surf, NES_PALETTE[33], (mario_x+2, mario_y, 12, 4))
+        pygame.draw.rect(surf, NES_PALETTE[39], (mario_x, mario_y+10, 4, 6))
+        pygame.draw.rect(surf, NES_PALETTE[39], (mario_x+16, mario_y+10, 4, 6))
+        pygame.draw.rect(surf, NES_PALETTE[21], (mario_x+2, mario_y+24, 4, 8))
+        pygame.draw.rect(surf, NES_PALETTE[21], (mario_x+10, mario_y+24, 4, 8))
+        
+        # Goomba
+        goomba_x = WIDTH//2 + 30
+        goomba_y = mario_y + 20
+        pygame.draw.ellipse(surf, NES_PALETTE[21], (goomba_x+2, goomba_y+4, 12, 12))
+        pygame.draw.rect(surf, NES_PALETTE[21], (goomba_x+2, goomba_y+14, 4, 2))
+        pygame.draw.rect(surf, NES_PALETTE[21], (goomba_x+10, goomba_y+14, 4, 2))
+        pygame.draw.rect(surf, NES_PALETTE[0], (goomba_x+4, goomba_y+6, 2, 2))
+        pygame.draw.rect(surf, NES_PALETTE[0], (goomba_x+10, goomba_y+6, 2, 2))
+        
+        # Koopa
+        koopa_x = WIDTH//2 + 70
+        koopa_y = mario_y + 20
+        pygame.draw.ellipse(surf, NES_PALETTE[14], (koopa_x+2, koopa_y+4, 12, 12))
+        pygame.draw.rect(surf, NES_PALETTE[39], (koopa_x+4, koopa_y, 8, 4))
+        pygame.draw.rect(surf, NES_PALETTE[14], (koopa_x+2, koopa_y+14, 4, 2))
+        pygame.draw.rect(surf, NES_PALETTE[14], (koopa_x+10, koopa_y+14, 4, 2))
+        
+        # Press Start
+        if self.logo_y >= self.logo_target_y and int(self.timer * 10) % 2 == 0:
+            font = get_font(24)
+            text = font.render("PRESS ENTER", True, NES_PALETTE[39])
+            surf.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT - 30))
+            
+            # Editor hint
+            font = get_font(16)
+            text = font.render("Press E for Editor  R for Endless Run", True, NES_PALETTE[21])
+            surf.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT - 60))
+
+class FileSelect(Scene):
+    def __init__(self):
+        self.offset = 0
+        self.selected = 0
+        
+    def handle(self, evts, keys):
+        for e in evts:
+            if e.type == KEYDOWN:
+                if e.key in (K_1, K_2, K_3):
+                    self.selected = e.key - K_1
+                elif e.key == K_RETURN:
+                    state.slot = self.selected
+                    state.world = state.progress[state.slot]["world"]
+                    push(WorldMapScene())
+                elif e.key == K_ESCAPE:
+                    push(TitleScreen())
+                    
+    def update(self, dt):
+        self.offset += dt
+        
+    def draw(self, s):
+        s.fill(NES_PALETTE[27])
+        
+        # Title
+        font = get_font(30)
+        title = font.render("SELECT PLAYER", True, NES_PALETTE[33])
+        s.blit(title, (WIDTH//2 - title.get_width()//2, 20))
+        
+        # Draw file slots
+        for i in range(3):
+            x = 50 + i * 100
+            y = 90 + 5 * math.sin(self.offset * 3 + i)
+            
+            # Slot background
+            pygame.draw.rect(s, NES_PALETTE[21], (x-5, y-5, 50, 70))
+            pygame.draw.rect(s, NES_PALETTE[33], (x, y, 40, 60))
+            
+            # Slot number
+            slot_font = get_font(20)
+            slot_text = slot_font.render(f"{i+1}", True, NES_PALETTE[39])
+            s.blit(slot_text, (x+18, y+5))
+            
+            # Selection indicator
+            if i == self.selected:
+                pygame.draw.rect(s, NES_PALETTE[39], (x-2, y-2, 44, 64), 2)
+                
+            # World preview
+            if state.progress[i]:
+                world = state.progress[i]["world"]
+                world_font = get_font(16)
+                world_text = world_font.render(f"WORLD {world}", True, NES_PALETTE[39])
+                s.blit(world_text, (x+20 - world_text.get_width()//2, y+50))
+                
+                # Draw thumbnail
+                thumb = THUMBNAILS.get(f"{world}-1")
+                s.blit(thumb, (x+4, y+20))
+
+class WorldMapScene(Scene):
+    # Mario walks the overworld's paths between nodes (see pathgraph.py)
+    TILE_SIZE = 24
+    STEP_TIME = 0.08
+
+    def __init__(self):
+        self.world = state.overworld_map
+        self.graph = graph_for(self.world)
+        self.renderer = OverworldRenderer(TILE_COLORS, self.TILE_SIZE)
+        self.pos = state.map_pos if state.map_pos in self.graph.nodes else self.start_node()
+        self.prev_pos = self.pos
+        self.walk = []  # cells still to walk
+        self.walk_timer = 0
+        self.info = {}  # level id -> catalog row
+        self.cursor_timer = 0
+
+    def start_node(self):
+        nodes = self.graph.nodes
+        starts = [node for node in nodes if self.world.type_at(*node) == "start"]
+        return min(starts or nodes or [(0, 0)], key=lambda node: (node[1], node[0]))
+
+    def level_here(self):
+        return self.world.level_at(*self.pos) if self.world.type_at(*self.pos) == "level" else None
+
+    def level_info(self, level):
+        # Catalog metrics, looked up once per level while the map is open
+        if level not in self.info:
+            catalog = get_catalog(create=False)
+            self.info[level] = catalog.info(level) if catalog is not None else None
+        return self.info[level]
+
+    def next_level(self):
+        # The next level node after this one, in map order
+        levels = [(x, y) for x, y, level in self.world.levels()]
+        if not levels:
+            return None
+        later = [node for node in levels if (node[1], node[0]) > (self.pos[1], self.pos[0])]
+        return min(later or levels, key=lambda node: (node[1], node[0]))
+        
+    def handle(self, evts, keys):
+        for e in evts:
+            if e.type != KEYDOWN:
+                continue
+            if e.key == K_ESCAPE:
+                push(FileSelect())
+            elif self.walk:
+                continue  # finish walking first
+            elif e.key in (K_LEFT, K_RIGHT, K_UP, K_DOWN):
+                direction = {K_LEFT: (-1, 0), K_RIGHT: (1, 0), K_UP: (0, -1), K_DOWN: (0, 1)}[e.key]
+                cells = self.graph.step(self.pos, direction)
+                if cells:
+                    self.walk = list(cells[1:])
+            elif e.key == K_TAB:
+                target = self.next_level()
+                route = self.graph.route(self.pos, target) if target else None
+                if route:
+                    self.walk = route[1:]
+            elif e.key == K_RETURN:
+                level = self.level_here()
+                if level in LEVELS:
+                    world = int(level.split("-")[0])
+                    if world <= max(state.unlocked_worlds):
+                        state.world = world
+                        state.progress[state.slot]["world"] = world
+                        push(LevelScene(level))
+                    
+    def overworld_changed(self):
+        # Edited on disk (hotreload.py); the graph patches itself, but a
+        # resized map is a new Overworld
+        if self.world is not state.overworld_map:
+            self.world = state.overworld_map
+            self.graph = graph_for(self.world)
+            self.walk = []
+        if self.pos not in self.graph.nodes:
+            self.walk = []
+            self.pos = self.prev_pos = self.start_node()
+
+    def update(self, dt):
+        self.cursor_timer += dt
+        if self.walk:
+            self.walk_timer += dt
+            while self.walk and self.walk_timer >= self.STEP_TIME:
+                self.walk_timer -= self.STEP_TIME
+                self.prev_pos = self.pos
+                self.pos = self.walk.pop(0)
+            if not self.walk:
+                self.walk_timer = 0
+                state.map_pos = self.pos
+        
+    def draw(self, s):
+        s.fill(NES_PALETTE[27])
+        ts = self.TILE_SIZE
+
+        # Camera centred on Mario, easing between cells while walking
+        t = min(1.0, self.walk_timer / self.STEP_TIME) if self.walk else 1.0
+        mx = (self.prev_pos[0] + (self.pos[0] - self.prev_pos[0]) * t) * ts
+        my = (self.prev_pos[1] + (self.pos[1] - self.prev_pos[1]) * t) * ts
+        cam_x = int(max(0, min(mx - WIDTH // 2, self.world.width * ts - WIDTH)))
+        cam_y = int(max(0, min(my - HEIGHT // 2, self.world.height * ts - HEIGHT)))
+        self.renderer.draw(s, self.world, cam_x, cam_y)
+
+        # Draw Mario
+        bob = math.sin(self.cursor_timer * 5) * 2
+        mario_x = int(mx - cam_x) + ts // 2 - 4
+        mario_y = int(my - cam_y) + ts // 2 - 12 + int(bob)
+        pygame.draw.rect(s, NES_PALETTE[33], (mario_x, mario_y+8, 8, 8))
+        pygame.draw.rect(s, NES_PALETTE[39], (mario_x, mario_y, 8, 8))
+        
+        # Title
+        font = get_font(30)
+        title = font.render("WORLD MAP", True, NES_PALETTE[33])
+        s.blit(title, (WIDTH//2 - title.get_width()//2, 20))
+
+        # Level under Mario
+        level = self.level_here()
+        if level and not self.walk:
+            world = int(level.split("-")[0])
+            name_font = get_font(14)
+            locked = world > max(state.unlocked_worlds)
+            label = f"{level}  {WORLD_THEMES[world]['name']}" + ("  (LOCKED)" if locked else "")
+            name_text = name_font.render(label, True, NES_PALETTE[39])
+            s.blit(name_text, (WIDTH//2 - name_text.get_width()//2, HEIGHT - 40))
+            info = self.level_info(level)
+            if info is not None:
+                info_text = name_font.render(f"Difficulty {info['difficulty']:.2f}  {info['enemies']} enemies",
+                                             True, NES_PALETTE[39])
+                s.blit(info_text, (WIDTH//2 - info_text.get_width()//2, HEIGHT - 56))
+            if level in LEVELS:
+                s.blit(THUMBNAILS.get(level), (WIDTH - 42, 10))
+        
+        # Draw instructions
+        font = get_font(14)
+        text = font.render("Arrows: Walk  Tab: Next level  Enter: Play  Esc: Back", True, NES_PALETTE[39])
+        s.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT - 20))
+        
+        # Draw unlocked worlds indicator
+        unlocked_text = font.render(f"Unlocked Worlds: {max(state.unlocked_worlds)}/8", True, NES_PALETTE[39])
+        s.blit(unlocked_text, (10, HEIGHT - 20))
+
+def interpolate_view(camera, alpha):
+    # (prev_cam, cam, prev_cam_y, cam_y) -> camera position to draw at
+    prev_cam, cam, prev_cam_y, cam_y = camera
+    return prev_cam + (cam - prev_cam) * alpha, prev_cam_y + (cam_y - prev_cam_y) * alpha
+
+class LevelScene(Scene):
+    def __init__(self, level_id):
+        self.setup(level_id, TileMap(LEVELS[level_id], level_id), Player(50, 100))
+        
+        # Player start and mushrooms from the tiles, enemies from the
+        # level's entity layer
+        level = LEVELS[level_id]
+        for y, row in enumerate(level):
+            for x, char in enumerate(row):
+                if char == "S":
+                    self.player.x = x * TILE
+                    self.player.y = y * TILE
+        for char, x, y in level.entities:
+            enemy = spawn_enemy(char, x * TILE, y * TILE)
+            if enemy is not None:
+                self.enemies.append(enemy)
+        self.enemy_groups = group_by_kind(self.enemies)
+        self.player.remember_position()
+        self.entities = [self.player] + self.enemies
+        self.place_mushrooms()
+
+    def setup(self, level_id, tilemap, player):
+        # What every level scene starts with, wherever its tiles come from
+        self.map = tilemap
+        self.player = player
+        self.enemies = []
+        self.enemy_groups = {}
+        self.entities = [player]
+        self.cam = 0.0
+        self.prev_cam = 0.0
+        self.cam_y = 0.0
+        self.prev_cam_y = 0.0
+        self.level_id = level_id
+        self.time = 300
+        self.coins = 0
+        self.end_level = False
+        self.end_timer = 0
+        self.mushrooms = []
+        self.mushroom_at = {}  # (col, row) of its ? block -> Mushroom
+        self.hud = None
+        world = int(level_id.split("-")[0])
+        self.theme = WORLD_THEMES[world]
+
+        # ? blocks and bricks; the grid tells us when one is hit from below
+        self.blocks = BlockTable(self.map)
+        self.map.grid.bump_listeners.append(self.on_bump)
+
+        # Snapshots: F5 quicksave, F9 quickload, hold BACKSPACE to rewind
+        self.history = SnapshotRing(REWIND_SECONDS * SIM_HZ)
+        self.quicksave = None
+        self.rewinding = False
+    
+    def level_changed(self, level_id, changes):
+        # Tiles only: the player and enemies carry on where they are
+        if level_id != self.level_id:
+            return
+        if changes is None:
+            # Resized: bumped blocks, mushrooms and snapshots all belong to
+            # the old layout
+            self.map = TileMap(LEVELS[level_id], level_id)
+            self.map.grid.bump_listeners.append(self.on_bump)
+            self.blocks = BlockTable(self.map)
+            self.place_mushrooms()
+            self.history.clear()
+            self.quicksave = None
+        else:
+            # Edited rows show the file as saved, bumped blocks included
+            self.map.patch(changes)
+            rows = {y for y, text in changes}
+            for key in [key for key in self.blocks.changes if key[1] in rows]:
+                del self.blocks.changes[key]
+                del self.blocks.original[key]
+
+    def handle(self, evts, keys):
+        for e in evts:
+            if e.type == KEYDOWN and e.key == K_ESCAPE:
+                push(WorldMapScene())
+            elif e.type == KEYDOWN and e.key == K_F5:
+                self.quicksave = save_level(self, self.quicksave)
+            elif e.type == KEYDOWN and e.key == K_F9 and self.quicksave is not None:
+                restore_level(self, self.quicksave)
+                self.history.clear()
+        self.rewinding = keys[K_BACKSPACE]
+
+    def place_mushrooms(self):
+        # An inactive mushroom for every ? block holding one, made up front
+        # so snapshots stay one size; replaces the ones there were
+        old = self.mushrooms
+        self.mushrooms = []
+        self.mushroom_at = {}
+        for y, row in enumerate(LEVELS[self.level_id]):
+            for x, char in enumerate(row):
+                if char == "?" and holds_mushroom(x, y):
+                    self.add_mushroom(x, y)
+        self.entities = [entity for entity in self.entities if entity not in old] + self.mushrooms
+
+    def add_mushroom(self, col, row):
+        mushroom = Mushroom(col * TILE, row * TILE)
+        mushroom.active = False
+        self.mushrooms.append(mushroom)
+        self.mushroom_at[col, row] = mushroom
+        return mushroom
+
+    def on_bump(self, col, row, entity):
+        if not isinstance(entity, Player):
+            return
+        event = self.blocks.bump(col, row, entity.size == "big")
+        if event == "coin":
+            self.coins += 1
+            state.coins += 1
+            state.score += 200
+            if state.coins >= 100:
+                state.coins -= 100
+                state.lives += 1
+        elif event == "mushroom":
+            mushroom = self.mushroom_at.get((col, row)) or self.add_mushroom(col, row)
+            mushroom.emerge()
+        elif event == "break":
+            state.score += 50
+
+    def update_mushrooms(self, dt, players):
+        for mushroom in self.mushrooms:
+            if not mushroom.active:
+                continue
+            mushroom.remember_position()
+            mushroom.update(self.map.grid, dt)
+            if mushroom.y > self.map.height:
+                mushroom.active = False
+            for player in players:
+                if mushroom.active and player.check_collision(mushroom):
+                    mushroom.active = False
+                    state.mario_size = "big"
+                    state.score += 1000
+
+    def snapshot_entities(self):
+        return self.entities
+                
+    def update(self, dt):
+        if self.rewinding:
+            snapshot = self.history.pop()
+            if snapshot is not None:
+                restore_level(self, snapshot)
+            return
+        self.history.push(self)
+
+        # Update time
+        self.time -= dt
+
+        # Keep the previous step around for render interpolation
+        self.prev_cam = self.cam
+        self.prev_cam_y = self.cam_y
+        self.player.remember_position()
+        for enemy in self.enemies:
+            enemy.remember_position()
+        
+        # Update player
+        self.player.update(self.map.grid, dt, self.enemies)
+        
+        # Update enemies, a kind at a time
+        update_enemies(self.enemy_groups, self.map.grid, dt)
+        self.update_mushrooms(dt, [self.player])
+        
+        self.follow_camera()
+        
+        # Check for end of level
+        if self.player.x > self.map.width - 100 and not self.end_level:
+            self.end_level = True
+            self.end_timer = 3  # 3 seconds to show end sequence
+            
+        if self.end_level:
+            self.end_timer -= dt
+            if self.end_timer <= 0:
+                # Advance to next level
+                next_level = self.next_level_id()
+                if next_level is not None:
+                    push(LevelScene(next_level))
+                else:
+                    # World completed (or nothing after this level here)
+                    world = int(self.level_id.split("-")[0])
+                    if world < 8 and (world + 1) not in state.unlocked_worlds:
+                        state.unlocked_worlds.append(world + 1)
+                    
+                    # Return to world map
+                    push(WorldMapScene())
+
+    def next_level_id(self):
+        # "3-2" -> "3-3" up to the world's fourth level; other ids (catalog
+        # and imported packs, "3-c1042") go on to the next id of the same
+        # world and pack in the catalog. None at the end, or if that level
+        # isn't there
+        world, name = self.level_id.split("-", 1)
+        next_level = None
+        if name.isdigit():
+            if int(name) < 4:
+                next_level = f"{world}-{int(name) + 1}"
+        else:
+            catalog = get_catalog(create=False)
+            info = catalog.info(self.level_id) if catalog is not None else None
+            if info is not None:
+                next_level = catalog.neighbour(self.level_id, 1, world=int(world), pack=info["pack"])
+                if next_level is not None and next_level <= self.level_id:
+                    next_level = None  # wrapped around to the first
+        return next_level if next_level in LEVELS else None
+        
+    def follow_camera(self):
+        # Camera follow player; it only scrolls vertically in levels taller
+        # than the screen
+        target = self.player.x - WIDTH // 2
+        self.cam += (target - self.cam) * 0.1
+        self.cam = max(0, min(self.cam, self.map.width - WIDTH))
+        target = self.player.y - HEIGHT // 2
+        self.cam_y += (target - self.cam_y) * 0.1
+        self.cam_y = max(0, min(self.cam_y, self.map.height - HEIGHT))
+
+    def view(self):
+        # Camera position interpolated for drawing
+        return interpolate_view((self.prev_cam, self.cam, self.prev_cam_y, self.cam_y), self.alpha)
+
+    def render_state(self):
+        # Everything draw needs, captured between sim steps: the map with
+        # the tile changes made since the last frame (TileMap.render_state),
+        # the camera's last two positions, sprites in drawing order
+        # (enemies, mushrooms, player) and the HUD values
+        sprites = [entity.render_state() for entity in self.enemies]
+        sprites += [mushroom.render_state() for mushroom in self.mushrooms]
+        sprites.append(self.player.render_state())
+        return (self.map.render_state(), (self.prev_cam, self.cam, self.prev_cam_y, self.cam_y), tuple(sprites),
+                (state.score, state.coins, self.level_id, self.time, state.lives))
+
+    def draw(self, s):
+        self.draw_state(s, self.render_state(), self.alpha)
+
+    def draw_state(self, s, frame, alpha):
+        (level_map, stamp), camera, sprites, hud = frame
+        cam, cam_y = interpolate_view(camera, alpha)
+
+        # Draw map, then enemies, mushrooms and the player
+        level_map.draw(s, cam, cam_y, stamp)
+        for sprite in sprites:
+            draw_sprite(s, sprite, cam, alpha, cam_y)
+        
+        # Draw HUD; built on first draw, so headless scenes never render text
+        if self.hud is None:
+            self.hud = Hud(self.theme["name"])
+        self.hud.update(*hud)
+        self.hud.draw(s)
+
+class RunnerPlayer(Player):
+    __slots__ = ("checkpoint",)
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.checkpoint = (x, y)
+
+    def respawn(self, x, y):
+        # The level start is long gone; go back to the last safe spot
+        super().respawn(*self.checkpoint)
+        self.invincible = 2
+
+class EndlessScene(LevelScene):
+    # Endless run over streamed chunks; see streaming.py. Enemies come and
+    # go with their chunks, so there is no rewind or quicksave here.
+    def __init__(self, world, seed=None, threaded=True):
+        if seed is None:
+            seed = random.randrange(1 << 30)
+        self.stream = ChunkStream(world, WORLD_THEMES[world], seed, threaded)
+        self.setup(f"{world}-E", StreamingTileMap(self.stream), RunnerPlayer(3 * TILE, (GROUND_ROW - 1) * TILE))
+        self.time = 0  # counts up
+        self.distance = 0
+        self.distance_label = Label((10, 24))
+        self.stream_chunks()
+
+    def handle(self, evts, keys):
+        for e in evts:
+            if e.type == KEYDOWN and e.key == K_ESCAPE:
+                self.close()
+                pop()
+                push(WorldMapScene())
+
+    def close(self):
+        self.stream.close()
+
+    def stream_chunks(self):
+        loaded, evicted = self.stream.update(self.cam)
+        for chunk in loaded:
+            for char, col, row in chunk.spawns:
+                enemy = spawn_enemy(char, col * TILE, row * TILE)
+                if enemy is not None:
+                    self.enemies.append(enemy)
+        if evicted:
+            left = min(self.stream.chunks) * CHUNK_COLS * TILE
+            self.enemies = [enemy for enemy in self.enemies if enemy.x >= left]
+            self.mushrooms = [mushroom for mushroom in self.mushrooms if mushroom.x >= left]
+            self.mushroom_at = {key: m for key, m in self.mushroom_at.items() if m in self.mushrooms}
+        if loaded or evicted:
+            self.entities = [self.player] + self.enemies
+            self.enemy_groups = group_by_kind(self.enemies)
+
+    def update(self, dt):
+        self.time += dt
+        self.prev_cam = self.cam
+        self.prev_cam_y = self.cam_y
+        self.player.remember_position()
+        for enemy in self.enemies:
+            enemy.remember_position()
+
+        self.player.update(self.map.grid, dt, self.enemies)
+        update_enemies(self.enemy_groups, self.map.grid, dt)
+        for enemy in self.enemies:
+            if enemy.y > self.map.height:
+                enemy.active = False
+        self.update_mushrooms(dt, [self.player])
+
+        player = self.player
+        if player.y > self.map.height:
+            # Fell down a gap: that costs a life whatever size Mario is
+            state.mario_size = "small"
+            player.hurt()
+        elif player.on_ground:
+            player.checkpoint = (player.x, player.y)
+        self.distance = max(self.distance, int(player.x // TILE))
+
+        # The camera only moves forward; the player can't go back past it
+        target = player.x - WIDTH // 3
+        self.cam = max(self.cam, self.cam + (target - self.cam) * 0.1)
+        if player.x < self.cam:
+            player.x = self.cam
+        self.stream_chunks()
+
+        if state.lives <= 0:
+            # Game over (Player.hurt pushed the screen for it): the run ends
+            # here, and the game over screen goes back to what started it
+            self.close()
+            if self in SCENES:
+                SCENES.remove(self)
+
+    def render_state(self):
+        return super().render_state(), self.distance
+
+    def draw_state(self, s, frame, alpha):
+        level_frame, distance = frame
+        super().draw_state(s, level_frame, alpha)
+        self.distance_label.set(f"DISTANCE {distance}")
+        self.distance_label.draw(s)
+
+class GameOverScene(Scene):
+    def __init__(self):
+        self.timer = 3
+        
+    def update(self, dt):
+        self.timer -= dt
+        if self.timer <= 0:
+            pop()  # Back to file select
+            state.lives = 3
+            state.score = 0
+            
+    def draw(self, s):
+        s.fill(NES_PALETTE[0])
+        font = get_font(40)
+        text = font.render("GAME OVER", True, NES_PALETTE[33])
+        s.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - 20))
+        
+        font = get_font(20)
+        text = font.render(f"FINAL SCORE: {state.score}", True, NES_PALETTE[39])
+        s.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 + 20))
+
+class WinScreen(Scene):
+    def __init__(self):
+        self.timer = 5
+        self.fireworks = []
+        
+    def update(self, dt):
+        self.timer -= dt
+        
+        # Add fireworks
+        if random.random() < 0.2:
+            self.fireworks.append({
+                "x": random.randint(50, WIDTH-50),
+                "y": HEIGHT,
+                "size": random.randint(20, 40),
+                "color": random.choice([NES_PALETTE[33], NES_PALETTE[39], NES_PALETTE[31]]),
+                "particles": []
+            })
+            
+        # Update fireworks
+        for fw in self.fireworks[:]:
+            fw["y"] -= 3
+            if fw["y"] < HEIGHT//3:
+                # Explode
+                for i in range(20):
+                    angle = random.uniform(0, math.pi*2)
+                    speed = random.uniform(2, 5)
+                    fw["particles"].append({
+                        "x": fw["x"],
+                        "y": fw["y"],
+                        "vx": math.cos(angle) * speed,
+                        "vy": math.sin(angle) * speed,
+                        "life": 1.0
+                    })
+                self.fireworks.remove(fw)
+                
+        # Update particles
+        for fw in self.fireworks:
+            for p in fw["particles"][:]:
+                p["x"] += p["vx"]
+                p["y"] += p["vy"]
+                p["vy"] += 0.1
+                p["life"] -= 0.02
+                if p["life"] <= 0:
+                    fw["particles"].remove(p)
+                    
+        if self.timer <= 0:
+            push(TitleScreen())
+            
+    def draw(self, s):
+        s.fill(NES_PALETTE[0])
+        
+        # Draw fireworks
+        for fw in self.fireworks:
+            pygame.draw.circle(s, NES_PALETTE[39], (int(fw["x"]), int(fw["y"])), 3)
+            for p in fw["particles"]:
+                alpha = int(p["life"] * 255)
+                color = (min(255, fw["color"][0]), min(255, fw["color"][1]), min(255, fw["color"][2]))
+                pygame.draw.circle(s, color, (int(p["x"]), int(p["y"])), 2)
+        
+        # Text
+        font = get_font(40)
+        text = font.render("CONGRATULATIONS!", True, NES_PALETTE[33])
+        s.blit(text, (WIDTH//2 - text.get_width()//2, 50))
+        
+        font = get_font(30)
+        text = font.render("YOU SAVED THE PRINCESS!", True, NES_PALETTE[39])
+        s.blit(text, (WIDTH//2 - text.get_width()//2, 100))
+        
+        font = get_font(24)
+        text = font.render(f"FINAL SCORE: {state.score}", True, NES_PALETTE[31])
+        s.blit(text, (WIDTH//2 - text.get_width()//2, 150))
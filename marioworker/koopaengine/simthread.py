@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+
+from .constants import SIM_HZ
+from .state import SCENES
+from .timing import MAX_FRAME_TIME
+
+# Simulation thread
+# With --sim-thread, scenes are handled and updated on their own thread at
+# a fixed tick while the main thread, which has to own the display, only
+# pumps events and draws. After every step the sim publishes a frame,
+# (scene, time, scene.render_state()), into a two-slot buffer: it fills
+# the back slot and flips which one is the front, and the main thread
+# draws whatever is in front. A render state is plain values and
+# references that later steps don't change (entity positions, camera, HUD
+# values, sprites; see LevelScene.render_state). The map is the one thing
+# both sides hold, and it is split in two: steps change its collision grid
+# and drawing only reads its own copy of the tiles and its baked chunks,
+# which catch up with the tile changes a frame carries when that frame is
+# drawn (TileMap.render_state). So the main thread can draw a frame while
+# the next step runs, and the two overlap wherever pygame lets go of the
+# GIL (blits, fills, display flips). Scenes with no render state (menus,
+# the editor) are drawn live, holding the lock that every step holds; the
+# same lock covers anything else on the main thread that touches scenes,
+# such as hot reload.
+class SimThread:
+    def __init__(self, hz=SIM_HZ):
+        self.dt = 1 / hz
+        self.lock = threading.Lock()
+        self.frames = [None, None]
+        self.front = 0
+        self.events = queue.SimpleQueue()
+        self.keys = None
+        self.running = False
+        self.thread = None
+        self.error = None
+
+    def start(self, keys):
+        self.keys = keys
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="sim", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+
+    def post(self, events, keys):
+        # Main thread: input for the next step
+        for event in events:
+            self.events.put(event)
+        self.keys = keys
+
+    def publish(self, scene):
+        back = 1 - self.front
+        self.frames[back] = (scene, time.perf_counter(), scene.render_state())
+        self.front = back
+
+    def latest(self):
+        # The newest frame, or None before the first step
+        return self.frames[self.front]
+
+    def alpha(self, stamp):
+        # How far drawing is between the frame's last two steps; the frame
+        # is shown a step late so there is always a step to move towards
+        return min(1.0, (time.perf_counter() - stamp) / self.dt)
+
+    def run(self):
+        try:
+            self.loop()
+        except BaseException as e:
+            self.error = e  # raised again on the main thread
+        finally:
+            self.running = False
+
+    def loop(self):
+        next_step = time.perf_counter()
+        while self.running:
+            with self.lock:
+                if not SCENES:
+                    break
+                events = []
+                while not self.events.empty():
+                    events.append(self.events.get())
+                SCENES[-1].handle(events, self.keys)
+                if SCENES:
+                    SCENES[-1].update(self.dt)
+                if SCENES:
+                    self.publish(SCENES[-1])
+            next_step += self.dt
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -MAX_FRAME_TIME:
+                next_step = time.perf_counter()  # too far behind: drop the lag
@@ -0,0 +1,130 @@
+import struct
+
+from .state import state
+
+# Level snapshots
+# A running LevelScene is packed into one flat bytearray: a scene header
+# followed by a fixed-size record per entity, in the order given by
+# scene.snapshot_entities() (players first, then enemies in spawn order).
+# Floats are stored as doubles so a restore is bit-exact, which rollback
+# needs. Saving/restoring ~100 entities takes well under a millisecond and
+# reuses the caller's buffer when it is big enough. Scenes with a BlockTable
+# (blocks.py) add its tail, one record per bumped tile, after the entities.
+#
+# header: cam, prev_cam, cam_y, prev_cam_y, time, end_timer,
+#         score, state.coins, lives, scene coins, end_level, mario_size
+# entity: x, y, vx, vy, prev_x, prev_y, two class timers, frame, flags
+SCENE_RECORD = struct.Struct("<6d4i2B")
+CAMERA_SIZE = 32  # the leading camera doubles
+ENTITY_RECORD = struct.Struct("<8dBB")
+
+ON_GROUND = 1
+FACING_RIGHT = 2
+ACTIVE = 4
+
+MARIO_SIZES = ("small", "big")
+
+def entities_size(scene):
+    return SCENE_RECORD.size + ENTITY_RECORD.size * len(scene.snapshot_entities())
+
+def snapshot_size(scene):
+    blocks = getattr(scene, "blocks", None)
+    return entities_size(scene) + (blocks.size() if blocks is not None else 0)
+
+def pack_entity(entity, buf, offset):
+    timers = entity.SNAPSHOT_TIMERS
+    t0 = getattr(entity, timers[0]) if len(timers) > 0 else 0.0
+    t1 = getattr(entity, timers[1]) if len(timers) > 1 else 0.0
+    flags = ((ON_GROUND if entity.on_ground else 0)
+             | (FACING_RIGHT if entity.facing_right else 0)
+             | (ACTIVE if entity.active else 0))
+    ENTITY_RECORD.pack_into(buf, offset, entity.x, entity.y, entity.vx, entity.vy,
+                            entity.prev_x, entity.prev_y, t0, t1,
+                            getattr(entity, "animation_frame", 0), flags)
+
+def unpack_entity(entity, buf, offset):
+    (entity.x, entity.y, entity.vx, entity.vy, entity.prev_x, entity.prev_y,
+     t0, t1, frame, flags) = ENTITY_RECORD.unpack_from(buf, offset)
+    timers = entity.SNAPSHOT_TIMERS
+    if len(timers) > 0:
+        setattr(entity, timers[0], t0)
+    if len(timers) > 1:
+        setattr(entity, timers[1], t1)
+    if hasattr(entity, "animation_frame"):
+        entity.animation_frame = frame
+    entity.on_ground = bool(flags & ON_GROUND)
+    entity.facing_right = bool(flags & FACING_RIGHT)
+    entity.active = bool(flags & ACTIVE)
+
+def save_level(scene, buf=None):
+    size = snapshot_size(scene)
+    if buf is None or len(buf) != size:
+        buf = bytearray(size)
+    SCENE_RECORD.pack_into(buf, 0, scene.cam, scene.prev_cam, scene.cam_y, scene.prev_cam_y,
+                           scene.time, scene.end_timer,
+                           state.score, state.coins, state.lives, scene.coins,
+                           scene.end_level, MARIO_SIZES.index(state.mario_size))
+    offset = SCENE_RECORD.size
+    for entity in scene.snapshot_entities():
+        pack_entity(entity, buf, offset)
+        offset += ENTITY_RECORD.size
+    if getattr(scene, "blocks", None) is not None:
+        scene.blocks.pack_into(buf, offset)
+    return buf
+
+def restore_level(scene, buf):
+    # The tiles in the tail can differ from the scene's; the entities can't
+    end = entities_size(scene)
+    blocks = getattr(scene, "blocks", None)
+    tail = blocks.saved_size(buf, end) if blocks is not None else 0
+    if tail is None or len(buf) != end + tail:
+        raise ValueError("Snapshot does not match this level's entities")
+    (scene.cam, scene.prev_cam, scene.cam_y, scene.prev_cam_y, scene.time, scene.end_timer,
+     state.score, state.coins, state.lives, scene.coins,
+     end_level, size) = SCENE_RECORD.unpack_from(buf, 0)
+    scene.end_level = bool(end_level)
+    state.mario_size = MARIO_SIZES[size]
+    offset = SCENE_RECORD.size
+    for entity in scene.snapshot_entities():
+        unpack_entity(entity, buf, offset)
+        offset += ENTITY_RECORD.size
+    if blocks is not None:
+        blocks.restore(buf, offset)
+
+# Ring buffer of recent snapshots; slots are reused, so recording a step
+# doesn't allocate once the ring is full.
+REWIND_SECONDS = 10
+
+class SnapshotRing:
+    def __init__(self, capacity):
+        self.slots = [None] * capacity
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+
+    def push(self, scene):
+        capacity = len(self.slots)
+        i = (self.start + self.count) % capacity
+        self.slots[i] = save_level(scene, self.slots[i])
+        if self.count < capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % capacity
+
+    def get(self, back=0):
+        # back=0 is the newest snapshot
+        if back >= self.count:
+            return None
+        return self.slots[(self.start + self.count - 1 - back) % len(self.slots)]
+
+    def pop(self):
+        buf = self.get(0)
+        if buf is not None:
+            self.count -= 1
+        return buf
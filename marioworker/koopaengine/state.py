@@ -0,0 +1,58 @@
+from .overworld import Overworld
+
+# Game State
+class GameState:
+    def __init__(self):
+        self.slot = 0
+        self.progress = [{"world": 1}, {"world": 1}, {"world": 1}]
+        self.score = 0
+        self.coins = 0
+        self.lives = 3
+        self.world = 1  # Current world (1-8)
+        self.level = 1  # Current level (1-4)
+        self.time = 300
+        self.mario_size = "small"  # "small" or "big"
+        self.unlocked_worlds = [1]  # Which worlds are unlocked
+        self.editor_mode = False
+        self.editing_level = None
+        self.editing_world = None
+        self.selected_tool = "ground"
+        self.selected_tile = "G"
+        self.show_grid = True
+        self.overworld_map = self.create_default_overworld()
+        self.map_pos = None  # where Mario stands on the overworld
+        
+    def create_default_overworld(self):
+        # Create a simple 8x8 overworld map
+        overworld = Overworld(8, 8)
+
+        # Place some default paths and castles
+        for col in [1, 2, 3, 4, 5]:
+            overworld.set_type(col, 3, "path")
+        overworld.set_type(0, 3, "start")
+        overworld.set_type(6, 3, "castle")
+        overworld.set_level(6, 3, "castle")
+        for (col, row), level in {(2, 2): "1-1", (2, 4): "1-2", (4, 2): "1-3", (4, 4): "1-4"}.items():
+            overworld.set_type(col, row, "level")
+            overworld.set_level(col, row, level)
+        return overworld
+
+state = GameState()
+
+# Scene management
+SCENES = []
+
+def push(scene): SCENES.append(scene)
+def pop(): SCENES.pop()
+
+class Scene:
+    alpha = 1.0  # how far rendering is between the last two sim steps
+
+    def handle(self, events, keys): ...
+    def update(self, dt): ...
+    def draw(self, surf): ...
+    def render_state(self): ...  # None: drawn live; see simthread.py
+    def draw_state(self, surf, frame, alpha): ...
+    def level_changed(self, level_id, changes): ...  # see hotreload.py
+    def overworld_changed(self): ...
+    def close(self): ...  # leaving for good (or quitting): stop its threads
@@ -0,0 +1,244 @@
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .atlas import TILE_ATLAS
+from .collision import TileGrid, TILE_SHAPES, shape_table
+from .constants import TILE, WIDTH, NES_PALETTE
+from .tilemap import bake_tiles, draw_animated, repaint_tile
+
+# Endless levels
+# The level is a stream of fixed-width column chunks. Each chunk comes from
+# a pipeline of generator stages seeded by (seed, world, chunk index), so a
+# run is reproducible and any chunk can be rebuilt on its own. Chunks are
+# generated and baked (tile surface, spawns) a few screens ahead
+# of the camera, on a worker thread when threaded, and dropped once they are
+# behind it, so memory stays flat however far the player runs.
+CHUNK_COLS = 16
+CHUNK_ROWS = 20
+GROUND_ROW = 15
+CHUNKS_BEHIND = 1
+CHUNKS_AHEAD = 2
+SAFE_CHUNKS = 2  # flat ground to start on
+
+# Generator stages; each edits the chunk's rows (lists of chars) in place
+# before the chunk is baked
+def stage_ground(rng, chunk, difficulty):
+    for col in range(CHUNK_COLS):
+        chunk.rows[GROUND_ROW][col] = "G"
+        for row in range(GROUND_ROW + 1, CHUNK_ROWS):
+            chunk.rows[row][col] = "B"
+
+def stage_gaps(rng, chunk, difficulty):
+    # At most two columns wide, which a running jump clears
+    if rng.random() < 0.3 + 0.4 * difficulty:
+        start = rng.randint(3, CHUNK_COLS - 5)
+        for col in range(start, start + rng.randint(1, 2)):
+            for row in range(GROUND_ROW, CHUNK_ROWS):
+                chunk.rows[row][col] = " "
+
+def stage_steps(rng, chunk, difficulty):
+    # A one-tile step up and back down; the player can only jump one tile
+    if rng.random() < 0.4:
+        start = rng.randint(2, CHUNK_COLS - 8)
+        length = rng.randint(2, 5)
+        if all(chunk.rows[GROUND_ROW][col] == "G" for col in range(start - 1, start + length + 1)):
+            for col in range(start, start + length):
+                chunk.rows[GROUND_ROW - 1][col] = "B"
+
+def stage_pipes(rng, chunk, difficulty):
+    if rng.random() < 0.3:
+        col = rng.randint(2, CHUNK_COLS - 4)
+        if all(chunk.rows[GROUND_ROW][c] == "G" and chunk.rows[GROUND_ROW - 1][c] == " "
+               for c in range(col - 1, col + 3)):
+            chunk.rows[GROUND_ROW - 1][col] = "T"
+            chunk.rows[GROUND_ROW - 1][col + 1] = "T"
+
+def stage_blocks(rng, chunk, difficulty):
+    # Bumpable from the ground; never over a step or pipe, where they
+    # would leave too little headroom to climb it
+    for i in range(rng.randint(0, 3)):
+        col = rng.randint(1, CHUNK_COLS - 2)
+        if all(chunk.rows[GROUND_ROW - 1][c] == " " for c in range(col - 1, col + 2)):
+            chunk.rows[GROUND_ROW - 3][col] = "?" if rng.random() > 0.5 else "B"
+
+def stage_enemies(rng, chunk, difficulty):
+    for i in range(rng.randint(0, 1 + int(2 * difficulty))):
+        col = rng.randint(2, CHUNK_COLS - 1)
+        row = next((r for r in range(GROUND_ROW - 2, CHUNK_ROWS - 1)
+                    if chunk.rows[r][col] == " " and chunk.rows[r + 1][col] in TILE_SHAPES), None)
+        if row is not None:
+            chunk.spawns.append((chunk.theme["enemy"], chunk.col + col, row))
+
+CHUNK_STAGES = (stage_ground, stage_gaps, stage_steps, stage_pipes, stage_blocks, stage_enemies)
+SAFE_STAGES = (stage_ground,)
+
+class Chunk:
+    def __init__(self, index, theme):
+        self.index = index
+        self.col = index * CHUNK_COLS  # first tile column
+        self.theme = theme
+        self.rows = [[" "] * CHUNK_COLS for _ in range(CHUNK_ROWS)]
+        self.grid = None
+        self.drawn = None
+        self.spawns = []  # (enemy char, tile col, tile row)
+        self.surface = None
+        self.animated = {}  # (x, y) in pixels -> animated tile char
+
+    def bake(self):
+        # The rows become the chunk's TileGrid, plus the copy drawing keeps
+        # (see TileMap); tiles are painted once into the chunk's own 8-bit
+        # surface so drawing a chunk is a single blit (plus one per animated
+        # tile)
+        rows = ["".join(row) for row in self.rows]
+        self.grid = TileGrid(rows)
+        self.drawn = TileGrid(rows)
+        self.rows = None
+        self.surface = bake_tiles(self.drawn, 0, 0, CHUNK_COLS, CHUNK_ROWS, self.theme, self.animated)
+
+def generate_chunk(world, theme, seed, index):
+    rng = random.Random(f"{seed}:{world}:{index}")
+    chunk = Chunk(index, theme)
+    difficulty = min(1.0, index / 64)
+    for stage in (SAFE_STAGES if index < SAFE_CHUNKS else CHUNK_STAGES):
+        stage(rng, chunk, difficulty)
+    chunk.bake()
+    return chunk
+
+class StreamGrid(TileGrid):
+    # TileGrid over whatever chunks are loaded (each has its own grid);
+    # unloaded columns are empty
+    def __init__(self, chunks, shapes=TILE_SHAPES):
+        self.chunks = chunks
+        self.shapes = shapes
+        self.table = shape_table(shapes)
+        self.cells = None
+        self.height = CHUNK_ROWS
+        self.width = None
+        self.bump_listeners = []
+
+    def shape(self, col, row):
+        if 0 <= row < CHUNK_ROWS:
+            chunk = self.chunks.get(col // CHUNK_COLS)
+            if chunk is not None:
+                return self.table[chunk.grid.cells[row * CHUNK_COLS + col % CHUNK_COLS]]
+        return None
+
+    def tile(self, col, row):
+        chunk = self.chunks.get(col // CHUNK_COLS)
+        return chunk.grid.tile(col % CHUNK_COLS, row) if chunk is not None else " "
+
+    def set_row(self, row, text):
+        # The row from column 0, as TileGrid.set_row; only loaded chunks
+        # take their piece of it, and past the text the row is empty
+        if 0 <= row < CHUNK_ROWS:
+            for index, chunk in self.chunks.items():
+                start = index * CHUNK_COLS
+                chunk.grid.set_row(row, text[start:start + CHUNK_COLS])
+
+    def set_tile(self, col, row, char):
+        chunk = self.chunks.get(col // CHUNK_COLS)
+        if chunk is not None and 0 <= row < CHUNK_ROWS:
+            chunk.grid.set_tile(col % CHUNK_COLS, row, char)
+
+class ChunkStream:
+    def __init__(self, world, theme, seed=0, threaded=True):
+        self.world = world
+        self.theme = theme
+        self.seed = seed
+        self.chunks = {}   # index -> Chunk, only the window around the camera
+        self.pending = {}  # index -> Future
+        self.loaded = []   # ready since the last update()
+        self.executor = ThreadPoolExecutor(max_workers=1) if threaded else None
+
+    def request(self, index):
+        if index in self.chunks or index in self.pending:
+            return
+        if self.executor is None:
+            self.add(generate_chunk(self.world, self.theme, self.seed, index))
+        else:
+            self.pending[index] = self.executor.submit(generate_chunk, self.world, self.theme, self.seed, index)
+
+    def add(self, chunk):
+        self.chunks[chunk.index] = chunk
+        self.loaded.append(chunk)
+
+    def update(self, cam):
+        # Returns (loaded, evicted) chunks so the scene can add and drop spawns
+        span = CHUNK_COLS * TILE
+        first = int(cam // span)
+        last = int((cam + WIDTH) // span)
+        for index in range(max(0, first - CHUNKS_BEHIND), last + CHUNKS_AHEAD + 1):
+            self.request(index)
+
+        for index, future in list(self.pending.items()):
+            # Anything on screen has to be there now, even if it means waiting
+            if future.done() or index <= last:
+                del self.pending[index]
+                self.add(future.result())
+
+        evicted = [self.chunks.pop(index) for index in list(self.chunks) if index < first - CHUNKS_BEHIND]
+        loaded, self.loaded = self.loaded, []
+        return loaded, evicted
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+class StreamingTileMap:
+    # The TileMap interface over a ChunkStream
+    def __init__(self, stream):
+        self.stream = stream
+        self.theme = stream.theme
+        self.grid = StreamGrid(stream.chunks)
+        self.changes = []  # (row, col, char) since the last frame
+        self.published = deque()  # (stamp, changes) not drawn yet
+        self.stamp = 0
+        self.width = float("inf")
+        self.height = CHUNK_ROWS * TILE
+
+    def tile(self, col, row):
+        return self.grid.tile(col, row)
+
+    def set_tile(self, col, row, char):
+        # Collision now, and the chunk's drawn copy and baked surface for
+        # just this tile when its frame is drawn (as TileMap.set_tile)
+        self.grid.set_tile(col, row, char)
+        self.changes.append((row, col, char))
+
+    def render_state(self):
+        # As TileMap.render_state
+        self.stamp += 1
+        if self.changes:
+            self.published.append((self.stamp, self.changes))
+            self.changes = []
+        return self, self.stamp
+
+    def repaint(self, stamp=None):
+        while self.published and (stamp is None or self.published[0][0] <= stamp):
+            for row, col, char in self.published.popleft()[1]:
+                chunk = self.stream.chunks.get(col // CHUNK_COLS)
+                if chunk is not None and 0 <= row < CHUNK_ROWS:
+                    chunk.drawn.set_tile(col % CHUNK_COLS, row, char)
+                    repaint_tile(chunk.surface, chunk.drawn, col % CHUNK_COLS, row, 0, 0, chunk.animated)
+
+    def draw(self, surf, cam, cam_y=0, stamp=None):
+        self.repaint(stamp)
+        surf.fill(NES_PALETTE[self.theme["sky"]])
+        atlas = TILE_ATLAS.use(self.theme)
+
+        # Clouds wrap around the screen rather than the (endless) level
+        cloud = TILE_ATLAS.rects["cloud"]
+        for i in range(10):
+            x = (i * 80 + int(cam / 3)) % (WIDTH + 200) - 100
+            y = 30 + (i % 3) * 20
+            surf.blit(atlas, (x, y - 5), cloud)
+
+        span = CHUNK_COLS * TILE
+        frames = TILE_ATLAS.frame_rects()
+        for index in range(int(cam // span), int((cam + WIDTH) // span) + 1):
+            chunk = self.stream.chunks.get(index)
+            if chunk is not None:
+                x, y = index * span - int(cam), -int(cam_y)
+                surf.blit(chunk.surface, (x, y))
+                draw_animated(surf, atlas, chunk.animated, x, y, frames)
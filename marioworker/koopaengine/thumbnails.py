@@ -0,0 +1,137 @@
+import hashlib
+from collections import OrderedDict
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:  # surfarray paths fall back to plain pygame calls
+    np = None
+
+from .atlas import theme_colour
+from .constants import NES_PALETTE, WORLD_THEMES
+from .levels import LEVELS
+
+# Level thumbnails
+# Rendered on demand (one pixel per tile, then scaled down) and memoized in a
+# small LRU keyed by the level content hash, so nothing is built at import time
+# and edited levels get a fresh preview automatically.
+THUMB_SIZE = (32, 24)
+THUMB_CACHE_SIZE = 64
+
+class ThumbnailCache:
+    def __init__(self, max_size=THUMB_CACHE_SIZE):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.keys = {}  # level_id -> last content key, used for invalidation
+        self.bundle = None
+        self.baked = {}  # level_id -> thumbnail shipped in the bundle
+        self.edited = set()  # levels whose baked thumbnail is out of date
+        self.missing = None  # shown for ids LEVELS doesn't have
+
+    def content_key(self, level_id, level_data):
+        world = level_id.split("-")[0]
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(world.encode())
+        for row in level_data:
+            digest.update(b"\n")
+            digest.update(row.encode())
+        return digest.hexdigest()
+
+    def tile_colors(self, theme):
+        return {
+            "G": NES_PALETTE[theme["ground"]],
+            "B": NES_PALETTE[theme["block"]],
+            "P": NES_PALETTE[theme["ground"]],
+            "T": NES_PALETTE[theme["pipe"]],
+            "?": NES_PALETTE[theme["block"]],
+            "~": NES_PALETTE[theme_colour(theme, "water")],
+            "L": NES_PALETTE[theme_colour(theme, "lava")],
+            "F": NES_PALETTE[31],
+        }
+
+    def render(self, level_id, level_data):
+        world = int(level_id.split("-")[0])
+        theme = WORLD_THEMES[world]
+        colors = self.tile_colors(theme)
+        rows = len(level_data)
+        cols = max((len(row) for row in level_data), default=0)
+        if not rows or not cols:
+            thumb = pygame.Surface(THUMB_SIZE)
+            thumb.fill(NES_PALETTE[theme["sky"]])
+            return thumb
+
+        # One pixel per tile
+        full = pygame.Surface((cols, rows))
+        full.fill(NES_PALETTE[theme["sky"]])
+        if np is not None:
+            lut = np.zeros((256, 3), dtype=np.uint8)
+            lut[:] = NES_PALETTE[theme["sky"]]
+            for char, color in colors.items():
+                lut[ord(char)] = color
+            grid = np.frombuffer(
+                "".join(row.ljust(cols)[:cols] for row in level_data).encode("latin-1", "replace"),
+                dtype=np.uint8,
+            ).reshape(rows, cols)
+            pygame.surfarray.blit_array(full, lut[grid].transpose(1, 0, 2))
+        else:
+            # Fill horizontal runs of the same tile instead of setting pixels
+            for y, row in enumerate(level_data):
+                x = 0
+                while x < len(row):
+                    char = row[x]
+                    end = x + 1
+                    while end < len(row) and row[end] == char:
+                        end += 1
+                    if char in colors:
+                        full.fill(colors[char], (x, y, end - x, 1))
+                    x = end
+
+        return pygame.transform.smoothscale(full, THUMB_SIZE)
+
+    def attach(self, bundle):
+        # Use the bundle's pre-rendered thumbnails until a level is edited
+        self.bundle = bundle
+        self.baked.clear()
+        self.edited.clear()
+
+    def get(self, level_id, level_data=None):
+        if level_data is None and self.bundle is not None and level_id not in self.edited:
+            thumb = self.baked.get(level_id)
+            if thumb is None:
+                thumb = self.bundle.thumbnail(level_id)
+            if thumb is not None:
+                self.baked[level_id] = thumb
+                return thumb
+        if level_data is None:
+            level_data = LEVELS.get(level_id)
+            if level_data is None:
+                # Not a level here (say, "1-1" with a catalog attached)
+                if self.missing is None:
+                    self.missing = pygame.Surface(THUMB_SIZE)
+                    self.missing.fill(NES_PALETTE[0])
+                return self.missing
+        key = self.content_key(level_id, level_data)
+        thumb = self.cache.get(key)
+        if thumb is not None:
+            self.cache.move_to_end(key)
+        else:
+            thumb = self.render(level_id, level_data)
+            self.cache[key] = thumb
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        self.keys[level_id] = key
+        return thumb
+
+    def invalidate(self, level_id):
+        self.baked.pop(level_id, None)
+        self.edited.add(level_id)
+        key = self.keys.pop(level_id, None)
+        if key is not None:
+            self.cache.pop(key, None)
+
+    def clear(self):
+        self.cache.clear()
+        self.keys.clear()
+
+THUMBNAILS = ThumbnailCache()
@@ -0,0 +1,174 @@
+from collections import OrderedDict, deque
+
+import pygame
+
+from .atlas import ANIMATED_TILES, ATLAS_CELLS, KEY_INDEX, paint_tile, theme_palette, TILE_ATLAS
+from .collision import TileGrid
+from .constants import TILE, WIDTH, HEIGHT, NES_PALETTE, WORLD_THEMES
+
+# Tiles are drawn from baked chunks of CHUNK x CHUNK tiles. Only the chunks
+# overlapping the view are baked (on first sight) and blitted, so drawing a
+# level costs the same whatever its size; baked chunks live in a small LRU.
+# Animated tiles are left out of the bake: each chunk keeps where its
+# animated cells are, and only those get the current frame drawn over the
+# chunk, so animation costs one blit per visible animated tile.
+CHUNK = 16
+CHUNK_CACHE_SIZE = 48
+TALL_ROWS = max(h for w, h in ATLAS_CELLS.values()) // TILE - 1  # rows a tile can hang below its cell
+
+def bake_tiles(grid, col0, row0, cols, nrows, theme, animated=None):
+    # Paints the tiles of a TileGrid in cols x nrows from (col0, row0) into
+    # an 8-bit surface, including tall tiles (the flag) that start in the
+    # rows above. With an animated dict, animated tiles are put in it
+    # ((x, y) in pixels -> char) instead of being painted
+    surf = pygame.Surface((cols * TILE, nrows * TILE), 0, 8)
+    surf.set_palette(theme_palette(theme))
+    surf.fill(KEY_INDEX)
+    surf.set_colorkey(KEY_INDEX)
+    for y in range(max(0, row0 - TALL_ROWS), min(grid.height, row0 + nrows)):
+        for x, char in enumerate(grid.row_text(y, col0, col0 + cols)):
+            if char == " " or (y < row0 and ATLAS_CELLS.get(char, (0, 0))[1] <= TILE):
+                continue
+            if animated is not None and char in ANIMATED_TILES:
+                if y >= row0:
+                    animated[x * TILE, (y - row0) * TILE] = char
+            else:
+                paint_tile(surf, char, x * TILE, (y - row0) * TILE)
+    return surf
+
+def repaint_tile(surf, grid, col, row, col0, row0, animated=None):
+    # Repaints the cell of tile (col, row) on a surface bake_tiles made with
+    # its origin at (col0, row0), including tall tiles hanging into it from
+    # above, and keeps the chunk's animated cells up to date. Only the cell
+    # is touched, so a tile that is itself tall (the flag) is never changed
+    # this way
+    x, y = (col - col0) * TILE, (row - row0) * TILE
+    surf.set_clip((x, y, TILE, TILE))
+    surf.fill(KEY_INDEX)
+    if animated is not None:
+        animated.pop((x, y), None)
+    for r in range(max(0, row - TALL_ROWS), row + 1):
+        char = grid.tile(col, r)
+        if char == " " or (r < row and ATLAS_CELLS.get(char, (0, 0))[1] <= (row - r) * TILE):
+            continue
+        if r == row and animated is not None and char in ANIMATED_TILES:
+            animated[x, y] = char
+        else:
+            paint_tile(surf, char, x, (r - row0) * TILE)
+    surf.set_clip(None)
+
+def draw_animated(surf, atlas, animated, x, y, frames):
+    # The current frame of each animated cell of a chunk drawn at (x, y)
+    if animated:
+        surf.blits([(atlas, (x + ax, y + ay), frames[char]) for (ax, ay), char in animated.items()], False)
+
+class TileMap:
+    # Two sides, which may be two threads (see simthread.py): play changes
+    # `grid` through set_tile and patch, and drawing owns `drawn`, a copy of
+    # the tiles, and the baked chunks. Changes cross over only through
+    # render_state(), stamped with the frame they belong to, and drawing a
+    # frame first applies the changes up to its stamp.
+    def __init__(self, level_data, level_id):
+        self.rows = level_data  # shared with LEVELS
+        self.width = len(level_data[0]) * TILE
+        self.height = len(level_data) * TILE
+        self.level_id = level_id
+        world = int(level_id.split("-")[0])
+        self.theme = WORLD_THEMES[world]
+        self.grid = TileGrid(level_data)
+        self.drawn = TileGrid(level_data)
+        self.chunks = OrderedDict()  # (chunk col, chunk row) -> (baked surface, animated cells)
+        self.changes = []  # (row, col, char), or (row, None, text) for a whole row, since the last frame
+        self.published = deque()  # (stamp, changes) not drawn yet
+        self.stamp = 0
+
+    def chunk(self, cx, cy):
+        baked = self.chunks.get((cx, cy))
+        if baked is None:
+            animated = {}
+            surf = bake_tiles(self.drawn, cx * CHUNK, cy * CHUNK, CHUNK, CHUNK, self.theme, animated)
+            baked = self.chunks[cx, cy] = (surf, animated)
+            if len(self.chunks) > CHUNK_CACHE_SIZE:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end((cx, cy))
+        return baked
+
+    def tile(self, col, row):
+        return self.grid.tile(col, row)
+
+    def set_tile(self, col, row, char):
+        # One tile changed in play (a bumped block). The level rows stay as
+        # they are; the grid changes now and the cached chunk drawing it is
+        # patched in place when it is next drawn, which costs the same
+        # whatever the level's size
+        self.grid.set_tile(col, row, char)
+        self.changes.append((row, col, char))
+        if len(self.changes) > self.grid.height:
+            # Nothing is drawing (headless): keep whole rows instead
+            self.changes = [(y, None, self.grid.row_text(y)) for y in range(self.grid.height)]
+
+    def patch(self, changes):
+        # changes: [(row, text)]; the rows are edited in place
+        for y, text in changes:
+            self.rows[y] = text
+            self.grid.set_row(y, text)
+            self.changes.append((y, None, text))
+
+    def render_state(self):
+        # Play side: hands the changes so far to drawing. Returns what
+        # draw() needs, (map, stamp)
+        self.stamp += 1
+        if self.changes:
+            self.published.append((self.stamp, self.changes))
+            self.changes = []
+        return self, self.stamp
+
+    def repaint(self, stamp=None):
+        # Drawing side: the drawn tiles and baked chunks brought up to the
+        # frame with this stamp (everything published, without one)
+        while self.published and (stamp is None or self.published[0][0] <= stamp):
+            for row, col, text in self.published.popleft()[1]:
+                if col is None:
+                    self.redraw_row(row, text)
+                else:
+                    self.drawn.set_tile(col, row, text)
+                    baked = self.chunks.get((col // CHUNK, row // CHUNK))
+                    if baked is not None:
+                        repaint_tile(baked[0], self.drawn, col, row, col - col % CHUNK, row - row % CHUNK, baked[1])
+
+    def redraw_row(self, y, text):
+        # Drops only the baked chunks that draw a changed tile (tall tiles
+        # hang into the rows below)
+        was = self.drawn.row_text(y)
+        self.drawn.set_row(y, text)
+        now = self.drawn.row_text(y)
+        for x in range(len(now)):
+            if was[x] != now[x]:
+                for cy in range(y // CHUNK, (y + TALL_ROWS) // CHUNK + 1):
+                    self.chunks.pop((x // CHUNK, cy), None)
+
+    def draw(self, surf, cam, cam_y=0, stamp=None):
+        self.repaint(stamp)
+
+        # Draw sky
+        surf.fill(NES_PALETTE[self.theme["sky"]])
+        atlas = TILE_ATLAS.use(self.theme)
+
+        # Draw clouds
+        cloud = TILE_ATLAS.rects["cloud"]
+        for i in range(10):
+            x = (i * 80 + int(cam/3)) % (self.width + 200) - 100
+            y = 30 + (i % 3) * 20
+            surf.blit(atlas, (x, y-5), cloud)
+
+        # Draw the chunks in view, then their animated tiles
+        span = CHUNK * TILE
+        cam, cam_y = int(cam), int(cam_y)
+        frames = TILE_ATLAS.frame_rects()
+        for cy in range(max(0, cam_y // span), (min(self.height, cam_y + HEIGHT) - 1) // span + 1):
+            for cx in range(max(0, cam // span), (min(self.width, cam + WIDTH) - 1) // span + 1):
+                chunk, animated = self.chunk(cx, cy)
+                x, y = cx * span - cam, cy * span - cam_y
+                surf.blit(chunk, (x, y))
+                draw_animated(surf, atlas, animated, x, y, frames)
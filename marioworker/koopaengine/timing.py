@@ -0,0 +1,68 @@
+import pygame
+
+from .constants import FPS, SIM_HZ
+
+# Frame timers
+# All return the real time since the previous call in seconds.
+#   tick  - Clock.tick(FPS), sleeps (cheap, a little jittery)
+#   busy  - Clock.tick_busy_loop(FPS), spins for accurate pacing
+#   vsync - no limiter, display.flip() blocks on the vertical blank
+TIMING_MODES = ("tick", "busy", "vsync")
+
+class FrameTimer:
+    def __init__(self, mode="tick", fps=FPS):
+        if mode not in TIMING_MODES:
+            raise ValueError(f"Unknown timing mode: {mode}")
+        self.mode = mode
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+
+    def tick(self):
+        if self.mode == "busy":
+            ms = self.clock.tick_busy_loop(self.fps)
+        elif self.mode == "vsync":
+            ms = self.clock.tick()
+        else:
+            ms = self.clock.tick(self.fps)
+        return ms / 1000
+
+# Fixed-step accumulator
+# Simulation always advances in steps of 1/SIM_HZ. A frame runs at most
+# max_catch_up steps; if that still isn't enough the frame is not drawn
+# (up to max_frame_skip frames in a row), and past that the remaining lag
+# is dropped so a slow machine runs slower instead of spiralling.
+MAX_CATCH_UP = 5
+MAX_FRAME_SKIP = 2
+MAX_FRAME_TIME = 0.25  # ignore longer stalls (window drag, breakpoint...)
+
+class FixedStep:
+    def __init__(self, hz=SIM_HZ, max_catch_up=MAX_CATCH_UP, max_frame_skip=MAX_FRAME_SKIP):
+        self.dt = 1 / hz
+        self.max_catch_up = max_catch_up
+        self.max_frame_skip = max_frame_skip
+        self.accumulator = 0.0
+        self.skipped = 0
+
+    def add_time(self, frame_time):
+        self.accumulator += min(frame_time, MAX_FRAME_TIME)
+
+    def steps(self):
+        # Number of sim steps to run this frame
+        steps = min(int(self.accumulator / self.dt), self.max_catch_up)
+        self.accumulator -= steps * self.dt
+        return steps
+
+    def should_render(self):
+        behind = self.accumulator >= self.dt
+        if behind and self.skipped < self.max_frame_skip:
+            self.skipped += 1
+            return False
+        if behind:
+            # Still behind after skipping: drop the lag we can't catch up
+            self.accumulator %= self.dt
+        self.skipped = 0
+        return True
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
@@ -0,0 +1,277 @@
+import argparse
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+from .constants import TILE, SIM_HZ
+from .enemies import update_enemies
+from .entities import Player
+from .levels import LEVELS
+from .scenes import LevelScene
+from .snapshot import save_level, restore_level
+from .state import state
+
+# Batched headless environments for training agents
+#
+# K independent levels are stepped in lockstep with no rendering. Actions
+# are player button bitmasks (entities.BUTTON_*, 0-7). Each step returns:
+#   tiles   (K, OBS_ROWS, OBS_COLS) uint8  tile codes around the player
+#   enemies (K, MAX_ENEMIES, 3) float32    dx, dy in tiles, 1 if present
+#   rewards (K,) float32                   score gained / 100 + tiles of new progress
+#   dones   (K,) bool                      episode ended (env already reset)
+# VecEnv shards the envs over worker processes; with workers=0 everything
+# runs in the calling process.
+OBS_ROWS = 13
+OBS_COLS = 17
+MAX_ENEMIES = 8
+MAX_STEPS = 60 * SIM_HZ
+
+DEATH_REWARD = -1.0
+FLAG_REWARD = 10.0
+
+# Tile char -> observation code; everything else (empty, the start
+# marker) is 0
+TILE_CODES = np.zeros(256, dtype=np.uint8)
+for char, code in (("G", 1), ("B", 1), ("P", 1), ("T", 2), ("?", 3), ("F", 4), ("L", 5),
+                   ("U", 6), ("~", 7)):
+    TILE_CODES[ord(char)] = code
+
+class AgentPlayer(Player):
+    __slots__ = ("dead",)
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.dead = False
+
+    def hurt(self):
+        # Same rules as Player, but dying ends the episode instead of
+        # touching lives or the scene stack
+        if state.mario_size == "big":
+            state.mario_size = "small"
+            self.invincible = 2
+        else:
+            self.dead = True
+
+class LevelEnv:
+    def __init__(self, level_id, max_steps=MAX_STEPS):
+        self.level_id = level_id
+        self.max_steps = max_steps
+        self.dt = 1 / SIM_HZ
+
+        scene = LevelScene(level_id)
+        scene.player = AgentPlayer(scene.player.x, scene.player.y)
+        scene.entities[0] = scene.player
+        self.scene = scene
+
+        # The tiles as they are now (bumped, used and broken blocks
+        # included): a view over the collision grid's cells, never a copy
+        grid = scene.map.grid
+        self.cells = np.frombuffer(grid.cells, dtype=np.uint8).reshape(grid.height, grid.width)
+        self.pad_r, self.pad_c = OBS_ROWS // 2, OBS_COLS // 2
+
+        # Globals this env owns; swapped into `state` around each step
+        self.globals = (0, 0, 3, "small")
+        state.score, state.coins, state.lives, state.mario_size = self.globals
+        self.initial = save_level(scene)
+        self.reset()
+
+    def swap_in(self):
+        state.score, state.coins, state.lives, state.mario_size = self.globals
+
+    def swap_out(self):
+        self.globals = (state.score, state.coins, state.lives, state.mario_size)
+
+    def reset(self):
+        restore_level(self.scene, self.initial)
+        self.swap_out()
+        self.scene.player.dead = False
+        self.steps = 0
+        self.best_x = self.scene.player.x
+
+    def step(self, action):
+        scene = self.scene
+        player = scene.player
+        self.swap_in()
+        score = state.score
+
+        player.update(scene.map.grid, self.dt, scene.enemies, action)
+        update_enemies(scene.enemy_groups, scene.map.grid, self.dt)
+        scene.update_mushrooms(self.dt, [player])
+        scene.time -= self.dt
+        self.steps += 1
+
+        reward = (state.score - score) / 100
+        if player.x > self.best_x:
+            reward += (player.x - self.best_x) / TILE
+            self.best_x = player.x
+
+        done = False
+        if player.dead or player.y > scene.map.height:
+            reward += DEATH_REWARD
+            done = True
+        elif player.x > scene.map.width - 100:
+            reward += FLAG_REWARD
+            done = True
+        elif scene.time <= 0 or self.steps >= self.max_steps:
+            done = True
+
+        self.swap_out()
+        if done:
+            self.reset()
+        return reward, done
+
+    def observe(self, tiles, enemies):
+        player = self.scene.player
+        # Window centred on the player's tile; whatever of it lies outside
+        # the level is 0
+        height, width = self.cells.shape
+        top = int(player.y + player.height / 2) // TILE - self.pad_r
+        left = int(player.x + player.width / 2) // TILE - self.pad_c
+        r0, c0 = min(max(top, 0), height), min(max(left, 0), width)
+        r1, c1 = max(min(top + OBS_ROWS, height), r0), max(min(left + OBS_COLS, width), c0)
+        tiles[:] = 0
+        tiles[r0 - top:r1 - top, c0 - left:c1 - left] = TILE_CODES[self.cells[r0:r1, c0:c1]]
+
+        enemies[:] = 0
+        n = 0
+        for enemy in self.scene.enemies:
+            if not enemy.active:
+                continue
+            dx = (enemy.x - player.x) / TILE
+            dy = (enemy.y - player.y) / TILE
+            if abs(dx) <= self.pad_c and abs(dy) <= self.pad_r:
+                enemies[n, 0] = dx
+                enemies[n, 1] = dy
+                enemies[n, 2] = 1
+                n += 1
+                if n == MAX_ENEMIES:
+                    break
+
+class EnvBatch:
+    # A group of envs stepped in one process, writing into shared arrays
+    def __init__(self, level_ids, max_steps=MAX_STEPS):
+        self.envs = [LevelEnv(level_id, max_steps) for level_id in level_ids]
+        k = len(self.envs)
+        self.tiles = np.zeros((k, OBS_ROWS, OBS_COLS), dtype=np.uint8)
+        self.enemies = np.zeros((k, MAX_ENEMIES, 3), dtype=np.float32)
+        self.rewards = np.zeros(k, dtype=np.float32)
+        self.dones = np.zeros(k, dtype=bool)
+
+    def observe(self):
+        for i, env in enumerate(self.envs):
+            env.observe(self.tiles[i], self.enemies[i])
+
+    def reset(self):
+        for env in self.envs:
+            env.reset()
+        self.observe()
+        return self.tiles, self.enemies
+
+    def step(self, actions):
+        for i, env in enumerate(self.envs):
+            self.rewards[i], self.dones[i] = env.step(int(actions[i]))
+        self.observe()
+        return self.tiles, self.enemies, self.rewards, self.dones
+
+def worker(conn, level_ids, max_steps, level_seed):
+    if not LEVELS.loaded:
+        LEVELS.set_seed(level_seed)
+    batch = EnvBatch(level_ids, max_steps)
+    while True:
+        cmd, data = conn.recv()
+        if cmd == "step":
+            conn.send(batch.step(data))
+        elif cmd == "reset":
+            conn.send(batch.reset())
+        elif cmd == "close":
+            conn.close()
+            return
+
+class VecEnv:
+    def __init__(self, num_envs, level_ids=None, workers=None, level_seed=0, max_steps=MAX_STEPS):
+        if level_ids is None:
+            level_ids = [f"{w}-{l}" for w in range(1, 9) for l in range(1, 5)]
+        ids = [level_ids[i % len(level_ids)] for i in range(num_envs)]
+        if workers is None:
+            workers = min(num_envs, multiprocessing.cpu_count())
+        self.num_envs = num_envs
+
+        if workers == 0:
+            if not LEVELS.loaded:
+                LEVELS.set_seed(level_seed)
+            self.local = EnvBatch(ids, max_steps)
+            self.conns = []
+            return
+
+        self.local = None
+        self.conns = []
+        self.procs = []
+        self.slices = []
+        per = (num_envs + workers - 1) // workers
+        for start in range(0, num_envs, per):
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=worker, args=(child, ids[start:start + per], max_steps, level_seed),
+                                           daemon=True)
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+            self.slices.append(slice(start, min(start + per, num_envs)))
+
+        self.tiles = np.zeros((num_envs, OBS_ROWS, OBS_COLS), dtype=np.uint8)
+        self.enemies = np.zeros((num_envs, MAX_ENEMIES, 3), dtype=np.float32)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+
+    def reset(self):
+        if self.local is not None:
+            return self.local.reset()
+        for conn in self.conns:
+            conn.send(("reset", None))
+        for conn, part in zip(self.conns, self.slices):
+            self.tiles[part], self.enemies[part] = conn.recv()
+        return self.tiles, self.enemies
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.uint8)
+        if self.local is not None:
+            return self.local.step(actions)
+        for conn, part in zip(self.conns, self.slices):
+            conn.send(("step", actions[part]))
+        for conn, part in zip(self.conns, self.slices):
+            self.tiles[part], self.enemies[part], self.rewards[part], self.dones[part] = conn.recv()
+        return self.tiles, self.enemies, self.rewards, self.dones
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(("close", None))
+        for proc in getattr(self, "procs", []):
+            proc.join(timeout=1)
+        self.conns = []
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the batched level environments")
+    parser.add_argument("--envs", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="0 runs in this process")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--level-seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    env = VecEnv(args.envs, workers=args.workers, level_seed=args.level_seed)
+    env.reset()
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    episodes = 0
+    for _ in range(args.steps):
+        tiles, enemies, rewards, dones = env.step(rng.integers(0, 8, args.envs))
+        episodes += int(dones.sum())
+    elapsed = time.perf_counter() - start
+    env.close()
+    total = args.envs * args.steps
+    print(f"{total} env-steps in {elapsed:.2f}s: {total / elapsed:.0f} steps/s, {episodes} episodes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
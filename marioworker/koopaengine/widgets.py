@@ -0,0 +1,142 @@
+import pygame
+
+from .assets import get_font
+from .constants import WIDTH, HEIGHT, NES_PALETTE
+
+# Retained-mode widgets
+# A widget keeps its rendered surface and only re-renders when set() is
+# given a different value. A Panel composes its children onto its own
+# surface and, when some change, repaints just the areas they covered and
+# now cover, so a frame where nothing changed costs a single blit.
+class Widget:
+    def __init__(self):
+        self.surface = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.old_rect = None  # where it was drawn before the last change
+
+    def changed(self, surface, rect):
+        if self.old_rect is None:
+            self.old_rect = self.rect
+        self.surface = surface
+        self.rect = rect
+
+    def draw(self, surf, offset=(0, 0)):
+        if self.surface is not None:
+            surf.blit(self.surface, self.rect.move(offset))
+
+class Label(Widget):
+    # Text anchored at pos (any pygame.Rect point name, e.g. "midtop")
+    def __init__(self, pos, text="", size=16, color=NES_PALETTE[39], anchor="topleft"):
+        super().__init__()
+        self.pos = pos
+        self.size = size
+        self.anchor = anchor
+        self.text = None
+        self.color = None
+        self.set(text, color)
+
+    def set(self, text, color=None):
+        color = self.color if color is None else color
+        if text == self.text and color == self.color:
+            return
+        self.text, self.color = text, color
+        surface = get_font(self.size).render(text, True, color)
+        self.changed(surface, surface.get_rect(**{self.anchor: self.pos}))
+
+class Image(Widget):
+    # A surface painted once by paint(surface)
+    def __init__(self, rect, paint):
+        super().__init__()
+        surface = pygame.Surface(pygame.Rect(rect).size, pygame.SRCALPHA)
+        paint(surface)
+        self.changed(surface, pygame.Rect(rect))
+
+class Panel(Widget):
+    def __init__(self, rect, background=NES_PALETTE[0], border=None, border_width=3):
+        super().__init__()
+        self.rect = pygame.Rect(rect)
+        self.background = background
+        self.border = border
+        self.border_width = border_width
+        self.children = []
+        self.surface = None
+
+    def add(self, widget):
+        self.children.append(widget)
+        return widget
+
+    def paint(self, area):
+        # Background and every child overlapping area (panel coordinates)
+        self.surface.set_clip(area)
+        self.surface.fill(self.background)
+        for child in self.children:
+            if child.rect.colliderect(area):
+                child.draw(self.surface)
+        if self.border is not None:
+            pygame.draw.rect(self.surface, self.border, self.surface.get_rect(), self.border_width)
+        self.surface.set_clip(None)
+
+    def compose(self):
+        if self.surface is None:
+            self.surface = pygame.Surface(self.rect.size)
+            self.paint(self.surface.get_rect())
+            for child in self.children:
+                child.old_rect = None
+            return
+        for child in self.children:
+            if child.old_rect is not None:
+                self.paint(child.old_rect.union(child.rect))
+                child.old_rect = None
+
+    def draw(self, surf, offset=(0, 0)):
+        self.compose()
+        surf.blit(self.surface, self.rect.move(offset))
+
+class Menu(Panel):
+    # Title, options (the selected one highlighted) and a hint line
+    def __init__(self, title, options, center=(WIDTH // 2, HEIGHT // 2),
+                 hint="UP/DOWN: Navigate  ENTER: Select"):
+        height = 40 + len(options) * 25 + 40
+        width = max([200] + [get_font(18).size(text)[0] + 20 for text in list(options) + [hint]])
+        rect = pygame.Rect(0, 0, width, height)
+        rect.center = center
+        super().__init__(rect, NES_PALETTE[21], NES_PALETTE[33])
+        self.add(Label((width // 2, 10), title, 24, NES_PALETTE[39], "midtop"))
+        self.options = [self.add(Label((width // 2, 40 + i * 25), option, 18, NES_PALETTE[0], "midtop"))
+                        for i, option in enumerate(options)]
+        self.add(Label((width // 2, height - 30), hint, 18, NES_PALETTE[0], "midtop"))
+        self.selected = None
+
+    def select(self, index):
+        if index != self.selected:
+            for i, label in enumerate(self.options):
+                label.set(label.text, NES_PALETTE[39] if i == index else NES_PALETTE[0])
+            self.selected = index
+
+# The level HUD: a bar along the top and the theme name along the bottom
+class Hud:
+    def __init__(self, theme_name):
+        self.bar = Panel((0, 0, WIDTH, 20))
+        self.score = self.bar.add(Label((10, 4)))
+        self.coins = self.bar.add(Label((WIDTH // 2, 4), anchor="midtop"))
+        self.world = self.bar.add(Label((WIDTH - 10, 4), anchor="topright"))
+        self.time = self.bar.add(Label((WIDTH // 2, 4), anchor="midtop"))
+        self.lives = self.bar.add(Label((WIDTH - 60, 4)))
+        self.bar.add(Image((WIDTH - 80, 2, 8, 12), self.paint_mario))
+        self.theme = Label((WIDTH // 2, HEIGHT - 20), theme_name, anchor="midtop")
+
+    def paint_mario(self, surf):
+        # Small Mario for the lives indicator
+        pygame.draw.rect(surf, NES_PALETTE[33], (0, 4, 8, 8))
+        pygame.draw.rect(surf, NES_PALETTE[39], (0, 0, 8, 8))
+
+    def update(self, score, coins, level_id, time, lives):
+        self.score.set(f"SCORE {score:06d}")
+        self.coins.set(f"COINS {coins:02d}")
+        self.world.set(f"WORLD {level_id}")
+        self.time.set(f"TIME {int(time):03d}")
+        self.lives.set(f"x{lives}")
+
+    def draw(self, surf):
+        self.bar.draw(surf)
+        self.theme.draw(surf)